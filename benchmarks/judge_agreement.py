@@ -0,0 +1,61 @@
+"""How the lexical fast path would have done on the judge's cached verdicts, for a grid of thresholds.
+
+uv run benchmarks/judge_agreement.py --accept 0.8 --accept 0.85 --reject 0.05 --reject 0.1
+
+For each JUDGE_LEXICAL_ACCEPT x JUDGE_LEXICAL_REJECT it prints the share of cached pairs the fast path settles (the
+hit rate) and how many of those it settles the way the model did. Only cache entries written since the cache keeps
+the strings are used.
+"""
+
+import json
+from pathlib import Path
+
+import typer
+
+from dream_factory_evals.df_judge import STRINGS_SIMILARITY_CACHE
+from dream_factory_evals.df_lexical import lexical_verdict
+
+app = typer.Typer()
+
+
+def load_verdicts(cache: Path, model: str | None) -> list[tuple[str, str, bool]]:
+    verdicts: dict[str, tuple[str, str, bool]] = {}
+    for line in cache.read_text().splitlines() if cache.exists() else []:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "pair" in entry and (model is None or entry["model"] == model):
+            verdicts[entry["key"]] = (*entry["pair"], entry["same"])
+    return list(verdicts.values())
+
+
+@app.command()
+def main(
+    cache: Path = typer.Option(STRINGS_SIMILARITY_CACHE, help="Strings similarity cache (jsonl)"),
+    model: str | None = typer.Option(None, help="Only the verdicts of this judge model"),
+    accept: list[float] = typer.Option([0.8, 0.85, 0.9, 0.95], help="Accept thresholds to try"),
+    reject: list[float] = typer.Option([-1, 0.05, 0.1], help="Reject thresholds to try; below 0 rejects nothing"),
+):
+    "Print the fast path's hit rate and agreement with the cached verdicts for every threshold pair."
+    verdicts = load_verdicts(cache, model)
+    if not verdicts:
+        typer.echo(f"No cached verdicts with their strings in {cache}")
+        raise typer.Exit(1)
+    same = sum(v for *_, v in verdicts)
+    typer.echo(f"{len(verdicts)} cached verdicts in {cache}: {same} same, {len(verdicts) - same} different")
+    typer.echo(f"{'accept':>7} {'reject':>7} {'settled':>8} {'hit rate':>9} {'agreed':>7} {'agreement':>10}")
+    for acc in accept:
+        for rej in reject:
+            settled = agreed = 0
+            for a, b, judged in verdicts:
+                if (fast := lexical_verdict(a, b, accept=acc, reject=rej)) is not None:
+                    settled += 1
+                    agreed += fast == judged
+            hit_rate = settled / len(verdicts)
+            agreement = f"{agreed / settled:.1%}" if settled else "n/a"
+            typer.echo(f"{acc:>7} {rej:>7} {settled:>8} {hit_rate:>9.1%} {agreed:>7} {agreement:>10}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,143 @@
+"""Harness throughput with the oracle model, and a check that every expected trajectory reproduces its answer.
+
+uv run benchmarks/oracle_throughput.py --role hr --role ops --level 1 --level 2 --min-cases-per-second 5
+
+Needs a DreamFactory (or the local stand-in, `src/dream_factory_evals/df_local.py`). Exits with 1 when a case fails an
+assertion or the run is slower than --min-cases-per-second.
+"""
+
+import asyncio
+import io
+from dataclasses import dataclass, field
+from time import perf_counter
+
+import typer
+from dotenv import load_dotenv
+from pydantic_evals.reporting import EvaluationReport
+from rich.console import Console
+
+from dream_factory_evals.df_agent import Role, TaskConfig, df_credentials, prepare_evaluation, task
+from dream_factory_evals.df_matrix import load_dataset
+from dream_factory_evals.df_mcp import aclose_http_client, result_cache
+from dream_factory_evals.df_oracle import ORACLE_MODEL, oracle_stats, register_oracle_cases
+from dream_factory_evals.mcp_pool import mcp_server_pool
+
+load_dotenv()
+
+app = typer.Typer()
+
+
+@dataclass
+class Phases:
+    "Wall seconds per harness phase, summed over every role x level."
+
+    load: float = 0.0
+    prepare: float = 0.0
+    evaluate: float = 0.0
+    report: float = 0.0
+    task: float = 0.0
+    "Sum of case task durations (cases run concurrently, so this can exceed `evaluate`)."
+    evaluators: float = 0.0
+    cases: int = 0
+    failures: list[str] = field(default_factory=list)
+
+
+def check_report(report: EvaluationReport, phases: Phases) -> None:
+    for case in report.cases:
+        phases.cases += 1
+        phases.task += case.task_duration
+        phases.evaluators += case.total_duration - case.task_duration
+        failed = [
+            f"{name}: {result.reason or result.value}"
+            for name, result in case.assertions.items()
+            if not result.value
+        ]
+        if case.output.error is not None:
+            failed.insert(0, f"error: {case.output.error}")
+        if failed:
+            phases.failures.append(f"{report.name} {case.name}: " + "; ".join(failed))
+
+
+async def run_level(role: Role, level: int, config: TaskConfig, phases: Phases) -> None:
+    start = perf_counter()
+    dataset = load_dataset(role.value, level)
+    register_oracle_cases(dataset)
+    phases.load += perf_counter() - start
+
+    start = perf_counter()
+    mcp_settings = await prepare_evaluation(config)
+    phases.prepare += perf_counter() - start
+
+    start = perf_counter()
+    keys = [df_credentials(config)] if config.mcp_transport == "stdio" else []
+    async with mcp_server_pool(keys=keys, enabled=config.pool_mcp_servers, server_env=mcp_settings):
+        report = await dataset.evaluate(
+            task=lambda inputs: task(inputs, config), name=f"oracle-{role.value}-level-{level}", progress=False
+        )
+    phases.evaluate += perf_counter() - start
+
+    start = perf_counter()
+    # the table evaluate prints, rendered to a buffer so the benchmark output stays readable
+    table = report.console_table(
+        include_input=True,
+        include_output=True,
+        include_expected_output=True,
+        include_durations=True,
+        include_total_duration=True,
+        include_averages=True,
+    )
+    Console(file=io.StringIO(), width=200).print(table)
+    phases.report += perf_counter() - start
+    check_report(report, phases)
+
+
+def print_phases(phases: Phases, wall: float) -> None:
+    cases = max(phases.cases, 1)
+    typer.echo(f"{phases.cases} cases in {wall:.2f}s: {phases.cases / wall:.1f} cases/s")
+    for name, seconds in (
+        ("load datasets", phases.load),
+        ("prepare (catalog, schemas)", phases.prepare),
+        ("evaluate (wall)", phases.evaluate),
+        ("  task (per case)", phases.task / cases),
+        ("    oracle model (per case)", oracle_stats.seconds / cases),
+        ("  evaluators (per case)", phases.evaluators / cases),
+        ("print report", phases.report),
+    ):
+        typer.echo(f"  {name:<30} {seconds * 1000:>10.1f}ms")
+    typer.echo(f"  {oracle_stats.summary()}")
+    typer.echo(f"  {result_cache.stats.summary()}")
+
+
+@app.command()
+def main(
+    role: list[str] = typer.Option(["hr", "finance", "ops"], help="Roles to run"),
+    level: list[int] = typer.Option([1, 2, 3, 4], help="Levels to run"),
+    mcp_transport: str = typer.Option("in_process", help="stdio or in_process"),
+    min_cases_per_second: float = typer.Option(0.0, help="Fail when throughput drops below this"),
+):
+    "Run every role x level with the oracle model and report cases/s, per-phase timings and failed cases."
+    phases = Phases()
+
+    async def run_all() -> float:
+        start = perf_counter()
+        for r in role:
+            config = TaskConfig(user_role=Role(r), model=ORACLE_MODEL, mcp_transport=mcp_transport)  # type: ignore
+            for lvl in level:
+                await run_level(Role(r), lvl, config, phases)
+        wall = perf_counter() - start
+        await aclose_http_client()
+        return wall
+
+    wall = asyncio.run(run_all())
+    print_phases(phases, wall)
+    for failure in phases.failures:
+        typer.echo(f"FAILED {failure}")
+    throughput = phases.cases / wall
+    if throughput < min_cases_per_second:
+        typer.echo(f"Throughput regression: {throughput:.1f} < {min_cases_per_second} cases/s")
+    if phases.failures or throughput < min_cases_per_second:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
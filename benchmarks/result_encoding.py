@@ -0,0 +1,65 @@
+"""Tool-return tokens of each result encoding, over the expected data calls of every level.
+
+uv run benchmarks/result_encoding.py [--new]
+
+Calls run against the local snapshot of the fixtures, so this needs no DreamFactory or model.
+"""
+
+import importlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, get_args
+
+import typer
+
+from dream_factory_evals.df_calls import canonical_call, snapshot
+from dream_factory_evals.df_encoding import ResultEncoding, encode_result
+from dream_factory_evals.df_local import DreamFactoryError
+from dream_factory_evals.df_tokens import estimate_tokens
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+ROLES = ("hr", "finance", "ops")
+ENCODINGS: tuple[ResultEncoding, ...] = get_args(ResultEncoding.__value__)
+
+app = typer.Typer()
+
+
+def return_tokens(payload: Any) -> int:
+    "Tokens of the tool return as the model sees it: strings as-is, everything else as JSON."
+    return estimate_tokens(payload if isinstance(payload, str) else json.dumps(payload))
+
+
+def level_payloads(level: int, new: bool) -> list[dict[str, Any]]:
+    payloads: list[dict[str, Any]] = []
+    for role in ROLES:
+        dataset = getattr(importlib.import_module(f"evals.level{level}.{role}.evals"), f"{role}_dataset")
+        for case in dataset.cases:
+            for tool_call in case.expected_output.tool_calls if case.expected_output else []:
+                call = canonical_call(tool_call.tool_name, tool_call.params)
+                if call is None:
+                    continue
+                try:
+                    payloads.append(snapshot(new=new).records(call.table_name, call.params()))
+                except DreamFactoryError:
+                    continue
+    return payloads
+
+
+@app.command()
+def main(new: bool = typer.Option(False, help="Use new_data/ instead of data/")):
+    typer.echo(f"{'level':<6}{'calls':>6}" + "".join(f"{e:>12}" for e in ENCODINGS))
+    for level in range(1, 5):
+        payloads = level_payloads(level, new)
+        tokens = {e: sum(return_tokens(encode_result(p, e)) for p in payloads) for e in ENCODINGS}
+        cells = "".join(
+            f"{tokens[e]:>12}" if e == "json" else f"{tokens[e]:>7} {1 - tokens[e] / max(tokens['json'], 1):>4.0%}"
+            for e in ENCODINGS
+        )
+        typer.echo(f"{level:<6}{len(payloads):>6}{cells}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,74 @@
+"""Prompt tokens vs model turns and wall time, with and without the inlined schema digest.
+
+uv run benchmarks/schema_inlining.py "openai:gpt-4.1-mini" hr --level 1 --level 2
+"""
+
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+
+import typer
+from dotenv import load_dotenv
+from pydantic_evals.reporting import EvaluationReport
+
+from dream_factory_evals.df_agent import ReportInfo, Role, TaskConfig, evaluate
+
+load_dotenv()
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+app = typer.Typer()
+
+
+def averages(report: EvaluationReport) -> dict[str, float]:
+    aggregate = report.averages()
+    return aggregate.metrics | {
+        "task_duration": aggregate.task_duration,
+        "assertions": aggregate.assertions or 0.0,
+    }
+
+
+async def run_level(model: str, role: Role, level: int, base_config: TaskConfig) -> dict[bool, dict[str, float]]:
+    dataset = getattr(importlib.import_module(f"evals.level{level}.{role.value}.evals"), f"{role.value}_dataset")
+    results: dict[bool, dict[str, float]] = {}
+    for inline in (False, True):
+        config = base_config.model_copy(update={"inline_schemas": inline})
+        name = f"{model}-{role.value}-level-{level}{'-inline-schemas' if inline else ''}"
+        report = await evaluate(
+            ReportInfo(name=name, model=model, user_role=role, level=level),  # type: ignore
+            dataset=dataset,
+            task_config=config,
+        )
+        results[inline] = averages(report)
+    return results
+
+
+def print_tradeoff(level: int, results: dict[bool, dict[str, float]]) -> None:
+    base, inline = results[False], results[True]
+    typer.echo(f"level {level}")
+    for metric in ("schema_digest_tokens", "input_tokens", "requests", "task_duration", "assertions"):
+        before, after = base.get(metric, 0.0), inline.get(metric, 0.0)
+        typer.echo(f"  {metric:<22} {before:>10.2f} -> {after:>10.2f}  ({after - before:+.2f})")
+
+
+@app.command()
+def main(
+    model: str = typer.Argument(help="Model to evaluate"),
+    role: str = typer.Argument(help="Role to evaluate"),
+    level: list[int] = typer.Option([1, 2, 3, 4], help="Levels to compare"),
+    mcp_transport: str = typer.Option("stdio", help="stdio or in_process"),
+):
+    "Per-case averages per level, without and with --inline-schemas."
+    config = TaskConfig(user_role=Role(role), model=model, mcp_transport=mcp_transport)  # type: ignore
+
+    async def run_all() -> None:
+        for lvl in level:
+            print_tradeoff(lvl, await run_level(model, Role(role), lvl, config))
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,113 @@
+"""Per-tool-call latency of df_mcp over stdio vs the same tools called in-process.
+
+Both transports time uncached DreamFactory round trips: the stdio server runs with its result cache disabled, and
+the in-process result cache is cleared before every call.
+
+uv run benchmarks/transport_latency.py --role hr --table hr_employees --calls 50
+"""
+
+import asyncio
+import inspect
+import os
+import statistics
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from typing import Any
+
+import anyio
+import typer
+from dotenv import load_dotenv
+
+from dream_factory_evals.df_mcp import DF_TOOLS, dream_factory_credentials, result_cache
+from dream_factory_evals.mcp_pool import df_mcp_server
+
+load_dotenv()
+
+app = typer.Typer()
+
+TOOLS_BY_NAME = {tool.__name__: tool for tool in DF_TOOLS}
+
+
+def bench_calls(table: str) -> list[tuple[str, dict[str, Any]]]:
+    return [
+        ("calculate_sum", {"values": [float(i) for i in range(100)]}),
+        ("get_table_schema", {"table_name": table}),
+        ("get_table_records", {"table_name": table, "limit": 10}),
+    ]
+
+
+async def time_calls(
+    call: Callable[[str, dict[str, Any]], Awaitable[Any]],
+    tool_name: str,
+    args: dict[str, Any],
+    n: int,
+    reset: Callable[[], None] = lambda: None,
+) -> list[float]:
+    "`reset` runs untimed before every call, e.g. to clear a cache."
+    reset()
+    await call(tool_name, args)  # warm up
+    durations: list[float] = []
+    for _ in range(n):
+        reset()
+        start = perf_counter()
+        await call(tool_name, args)
+        durations.append(perf_counter() - start)
+    return durations
+
+
+async def call_in_process(tool_name: str, args: dict[str, Any]) -> Any:
+    tool = TOOLS_BY_NAME[tool_name]
+    if inspect.iscoroutinefunction(tool):
+        return await tool(**args)
+    # pydantic_ai runs sync tools in a worker thread, so do the same here
+    return await anyio.to_thread.run_sync(lambda: tool(**args))
+
+
+def summarize(durations: list[float]) -> str:
+    ms = sorted(d * 1000 for d in durations)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"mean {statistics.fmean(ms):8.2f}ms  p50 {statistics.median(ms):8.2f}ms  p95 {p95:8.2f}ms"
+
+
+async def run_benchmark(base_url: str, api_key: str, table: str, calls: int) -> None:
+    results: dict[tuple[str, str], list[float]] = {}
+    no_cache = {"DREAM_FACTORY_RESULT_CACHE_SIZE": "0"}
+    async with df_mcp_server(base_url=base_url, dream_factory_api_key=api_key, env=no_cache) as server:
+        for tool_name, args in bench_calls(table):
+            results["stdio", tool_name] = await time_calls(
+                lambda name, kwargs: server.call_tool(name, kwargs), tool_name, args, calls
+            )
+    with dream_factory_credentials(base_url=base_url, dream_factory_api_key=api_key):
+        for tool_name, args in bench_calls(table):
+            results["in_process", tool_name] = await time_calls(
+                call_in_process, tool_name, args, calls, reset=result_cache.clear
+            )
+
+    for tool_name, _ in bench_calls(table):
+        stdio, in_process = results["stdio", tool_name], results["in_process", tool_name]
+        typer.echo(f"{tool_name}")
+        typer.echo(f"  stdio       {summarize(stdio)}")
+        typer.echo(f"  in_process  {summarize(in_process)}")
+        typer.echo(f"  saved per call: {(statistics.fmean(stdio) - statistics.fmean(in_process)) * 1000:.2f}ms")
+
+
+@app.command()
+def main(
+    role: str = typer.Option("hr", help="Role whose API key the tools use"),
+    table: str = typer.Option("hr_employees", help="Table used for the schema and records calls"),
+    calls: int = typer.Option(50, help="Timed calls per tool and transport"),
+    new: bool = typer.Option(False, help="Use the NEW_DREAM_FACTORY_* instance"),
+):
+    prefix = "NEW_DREAM_FACTORY" if new else "DREAM_FACTORY"
+    asyncio.run(
+        run_benchmark(
+            base_url=os.environ[f"{prefix}_BASE_URL"],
+            api_key=os.environ[f"{prefix}_{role.upper()}_API_KEY"],
+            table=table,
+            calls=calls,
+        )
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -5,6 +5,7 @@ from pydantic_evals import Case, Dataset
 
 from dream_factory_evals.df_agent import (
     EvaluateResult,
+    EvaluateToolCallResults,
     EvaluateToolCalls,
     Query,
     QueryResult,
@@ -142,5 +143,5 @@ finance_dataset = Dataset[Query[ResultT], QueryResult[ResultT]](
             ),
         ),
     ],
-    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT]()],
+    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT](), EvaluateToolCallResults[ResultT]()],
 )
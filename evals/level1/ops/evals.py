@@ -5,6 +5,7 @@ from pydantic_evals import Case, Dataset
 
 from dream_factory_evals.df_agent import (
     EvaluateResult,
+    EvaluateToolCallResults,
     EvaluateToolCalls,
     Query,
     QueryResult,
@@ -117,5 +118,5 @@ ops_dataset = Dataset[Query[ResultT], QueryResult[ResultT]](
             ),
         ),
     ],
-    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT]()],
+    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT](), EvaluateToolCallResults[ResultT]()],
 )
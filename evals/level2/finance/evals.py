@@ -8,6 +8,7 @@ from pydantic_evals import Case, Dataset
 
 from dream_factory_evals.df_agent import (
     EvaluateResult,
+    EvaluateToolCallResults,
     EvaluateToolCalls,
     Query,
     QueryResult,
@@ -157,7 +158,7 @@ finance_dataset = Dataset[Query[ResultT], QueryResult[ResultT]](
             ),
         ),
     ],
-    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT]()],
+    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT](), EvaluateToolCallResults[ResultT]()],
 )
 
 
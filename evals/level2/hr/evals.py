@@ -8,6 +8,7 @@ from pydantic_evals import Case, Dataset
 
 from dream_factory_evals.df_agent import (
     EvaluateResult,
+    EvaluateToolCallResults,
     EvaluateToolCalls,
     Query,
     QueryResult,
@@ -210,7 +211,7 @@ hr_dataset = Dataset[Query[ResultT], QueryResult[ResultT]](
             ),
         ),
     ],
-    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT]()],
+    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT](), EvaluateToolCallResults[ResultT]()],
 )
 
 
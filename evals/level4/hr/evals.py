@@ -6,7 +6,9 @@ import logfire
 from pydantic_evals import Case, Dataset
 
 from dream_factory_evals.df_agent import (
+    EvaluateFields,
     EvaluateResult,
+    EvaluateToolCallResults,
     EvaluateToolCalls,
     Query,
     QueryResult,
@@ -416,5 +418,10 @@ hr_dataset = Dataset[Query[ResultT], QueryResult[ResultT]](
             ),
         ),
     ],
-    evaluators=[EvaluateResult[ResultT](), EvaluateToolCalls[ResultT]()],
+    evaluators=[
+        EvaluateResult[ResultT](),
+        EvaluateFields[ResultT](),
+        EvaluateToolCalls[ResultT](),
+        EvaluateToolCallResults[ResultT](),
+    ],
 )
@@ -41,19 +41,26 @@ def save_scores(report_name: str) -> pd.DataFrame:
         accuracy = 2 * int(case["assertions"]["EvaluateResult"]["value"])
         correct_tool_calls = int(case["assertions"]["EvaluateToolCalls"]["value"])
         incorrect_tool_calls_reason = case["assertions"]["EvaluateToolCalls"]["reason"]
-        score = accuracy + correct_tool_calls
+        # reports from before EvaluateToolCallResults existed don't have it
+        tool_results = case["assertions"].get("EvaluateToolCallResults", {})
+        correct_tool_results = int(tool_results.get("value", correct_tool_calls))
+        # by the rows the calls return, so an aggregate call can stand in for a fetch and calculate_* calls
+        score = accuracy + correct_tool_results
         output = case["output"]
         expected_output = case["expected_output"]
         cases_metrics.append(
             {
                 "evaluation_name": evaluation_name,
                 "case_name": case["name"],
-                "duration": case["task_duration"],
+                # a resumed case's task ran in an earlier run
+                "duration": case.get("metrics", {}).get("resumed_task_duration", case["task_duration"]),
                 "accuracy": accuracy,
                 "expected_output": expected_output.get("result", expected_output.get("output", "")),
                 "output": output.get("result", output.get("output", "")),
                 "correct_tool_calls": correct_tool_calls,
                 "incorrect_tool_calls_reason": incorrect_tool_calls_reason,
+                "correct_tool_results": correct_tool_results,
+                "incorrect_tool_results_reason": tool_results.get("reason"),
                 "score": score,
             }
         )
@@ -96,6 +103,7 @@ def create_leaderboard(leaderboard_name: str, report_names: list[str]) -> None:
                 avg_score=("score", "mean"),
                 avg_accuracy=("accuracy", "mean"),
                 avg_tool_calls=("correct_tool_calls", "mean"),
+                avg_tool_results=("correct_tool_results", "mean"),
                 avg_duration=("duration", "mean"),
                 total_score=("score", "sum"),
                 query_count=("case_name", "count"),
@@ -1,26 +1,74 @@
+import asyncio
 import os
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from enum import StrEnum
+from functools import lru_cache
 from pathlib import Path
-from typing import Annotated, Any, TypeGuard, TypeVar, get_args
+from time import perf_counter
+from typing import Annotated, Any, Literal, TypeGuard, TypeVar, get_args
 
 import logfire
 from dotenv import load_dotenv
 from loguru import logger
-from pydantic import AfterValidator, BaseModel
+from pydantic import AfterValidator, BaseModel, TypeAdapter
 from pydantic_ai import Agent
-from pydantic_ai.mcp import MCPServerStdio
-from pydantic_ai.messages import ToolCallPart
+from pydantic_ai.mcp import MCPServer
+from pydantic_ai.messages import ToolCallPart, ToolReturnPart
 from pydantic_ai.models import KnownModelName, Model
 from pydantic_ai.models.fallback import FallbackModel
 from pydantic_ai.models.openai import OpenAIModel, OpenAIModelName
 from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai.providers.openrouter import OpenRouterProvider
 from pydantic_evals import Dataset
+from pydantic_evals.dataset import increment_eval_metric, set_eval_attribute
 from pydantic_evals.evaluators import EvaluationReason, Evaluator, EvaluatorContext
-from tenacity import AsyncRetrying, stop_after_attempt, wait_random
-
-from dream_factory_evals.df_mcp import list_table_names
+from pydantic_evals.reporting import EvaluationReport
+from tenacity import AsyncRetrying, retry_if_not_exception_type, stop_after_attempt, wait_random
+
+from dream_factory_evals.df_calls import canonical_call, execute_call, same_rows
+from dream_factory_evals.df_cassette import CassetteMode, current_cassette, use_cassette
+from dream_factory_evals.df_checkpoint import (
+    Checkpoint,
+    data_version,
+    prompt_hash,
+    record_metric,
+    record_usage,
+    recording_metrics,
+)
+from dream_factory_evals.df_completions import (
+    CompletionMissError,
+    CompletionsMode,
+    RecordedModel,
+    completion_store,
+    completion_summaries,
+)
+from dream_factory_evals.df_diff import structured_diff
+from dream_factory_evals.df_encoding import ResultEncoding
+from dream_factory_evals.df_judge import are_strings_similar as judge_strings_similar
+from dream_factory_evals.df_judge import judge_summaries, judged_equal
+from dream_factory_evals.df_local import data_dir
+from dream_factory_evals.df_mcp import (
+    DF_TOOLS,
+    MAX_RESULT_BYTES,
+    MAX_RESULT_ROWS,
+    aclose_http_client,
+    dream_factory_cassette,
+    dream_factory_credentials,
+    record_stats,
+    result_budget,
+    result_cache,
+    result_encoding,
+    table_catalog,
+    warm_schema_snapshot,
+)
+from dream_factory_evals.df_oracle import ORACLE_MODEL, oracle_model, oracle_stats, register_oracle_cases
+from dream_factory_evals.df_paging import ResultBudget
+from dream_factory_evals.df_ratelimit import RateLimitedModel, limiter_summaries, provider_of
+from dream_factory_evals.df_schema import schema_digest
+from dream_factory_evals.df_tokens import estimate_tokens
+from dream_factory_evals.mcp_pool import df_mcp_server, mcp_server_pool, mcp_session
 
 load_dotenv()
 logfire.configure()
@@ -30,9 +78,11 @@ MODULE_DIR = Path(__file__).parent
 
 RETRIES = 3
 MAX_TOOL_CALLS = 20
+UNEXPECTED_ERROR = "Unexpected error"
 STRINGS_SIMILARITY_MODEL = "google-gla:gemini-2.5-flash"
 
 type ModelT = KnownModelName | str
+type MCPTransport = Literal["stdio", "in_process"]
 
 
 class ToolCall(BaseModel):
@@ -83,12 +133,25 @@ class MarkdownResponse(BaseModel):
 
 @dataclass
 class EvaluateResult(Evaluator[Query[ResultT], QueryResult[ResultT]]):
-    def evaluate(self, ctx: EvaluatorContext[Query[ResultT], QueryResult[ResultT]]) -> bool:
+    async def evaluate(self, ctx: EvaluatorContext[Query[ResultT], QueryResult[ResultT]]) -> bool:
         if ctx.expected_output is None:
             return True
         if ctx.output.error is not None:
             return False
-        return ctx.output.result == ctx.expected_output.result
+        return await judged_equal(ctx.output.result, ctx.expected_output.result)
+
+
+@dataclass
+class EvaluateFields(Evaluator[Query[ResultT], QueryResult[ResultT]]):
+    "Partial credit: the share of the expected result's fields the output gets right, with the mismatches as reason."
+
+    async def evaluate(self, ctx: EvaluatorContext[Query[ResultT], QueryResult[ResultT]]) -> EvaluationReason:
+        if ctx.expected_output is None:
+            return EvaluationReason(value=1.0)
+        if ctx.output.error is not None:
+            return EvaluationReason(value=0.0, reason=ctx.output.error)
+        diff = await structured_diff(ctx.output.result, ctx.expected_output.result)
+        return EvaluationReason(value=diff.score, reason=diff.summary())
 
 
 @dataclass
@@ -114,10 +177,45 @@ class EvaluateToolCalls(Evaluator[Query[ResultT], QueryResult[ResultT]]):
         return EvaluationReason(value=True)
 
 
+@dataclass
+class EvaluateToolCallResults(Evaluator[Query[ResultT], QueryResult[ResultT]]):
+    """Data calls are judged by the rows they return, not by how their params are spelled.
+
+    Every expected `get_table_records*` call must be matched by an actual call that returns the same rows from the
+    local snapshot of the fixtures. Columns the expected call didn't return are ignored.
+
+    The snapshot is the one the run's `TaskConfig.new` selects, from the case's `new_data` attribute; `new` is
+    only used for tasks that don't set it.
+    """
+
+    new: bool = False
+
+    def evaluate(self, ctx: EvaluatorContext[Query[ResultT], QueryResult[ResultT]]) -> EvaluationReason:
+        if ctx.expected_output is None:
+            return EvaluationReason(value=True)
+        new = bool(ctx.attributes.get("new_data", self.new))
+        actual_calls = [c for c in (canonical_call(t.tool_name, t.params) for t in ctx.output.tool_calls) if c]
+        reason = ""
+        for tool_num, expected_tool_call in enumerate(ctx.expected_output.tool_calls, start=1):
+            expected_call = canonical_call(expected_tool_call.tool_name, expected_tool_call.params)
+            if expected_call is None or expected_call in actual_calls:
+                continue
+            expected_rows = execute_call(expected_call, new=new)
+            if not any(same_rows(expected_rows, execute_call(c, new=new)) for c in actual_calls):
+                reason += (
+                    f"No tool call returned the rows of expected tool number {tool_num}: "
+                    f"{expected_tool_call.tool_name}({expected_tool_call.params})\n"
+                )
+        if reason:
+            return EvaluationReason(value=False, reason=reason)
+        return EvaluationReason(value=True)
+
+
 class Task[ResultT](BaseModel):
     query: Query[ResultT]
     user_role: Role
     available_tables: list[str]
+    schema_digest: str = ""
 
     @property
     def prompt(self) -> str:
@@ -126,6 +224,8 @@ class Task[ResultT](BaseModel):
             f"<user_role>\n{self.user_role}\n</user_role>\n\n"
             f"<available_tables>\n{'\n'.join(f'- {t}' for t in self.available_tables).strip()}\n</available_tables>"
         )
+        if self.schema_digest:
+            res += f"\n\n<table_schemas>\n{self.schema_digest}\n</table_schemas>"
         return res.strip()
 
 
@@ -137,6 +237,28 @@ class TaskConfig(BaseModel):
     max_tool_calls: int = MAX_TOOL_CALLS
     think: bool = False
     new: bool = False
+    pool_mcp_servers: bool = True
+    mcp_transport: MCPTransport = "stdio"
+    warm_schemas: bool = False
+    "Load the schema of every available table before the first case, in parallel."
+    schemas_from_fixtures: bool = False
+    "Take warmed schemas from `data/` or `new_data/` instead of fetching them."
+    inline_schemas: bool = False
+    "Put a schema digest of the available tables in the task prompt."
+    result_encoding: ResultEncoding = "json"
+    "How df_mcp encodes record results for the model."
+    max_result_rows: int = MAX_RESULT_ROWS
+    "Rows one get_table_records call returns before it truncates and hands out a continuation token."
+    max_result_bytes: int = MAX_RESULT_BYTES
+    "Same, in bytes of compact JSON."
+    max_concurrency: int | None = None
+    "Cases run at once; None runs them all and leaves model requests to the per-provider rate limiter."
+    cassette: str = ""
+    "Directory to record DreamFactory responses to, or replay them from, depending on `cassette_mode`."
+    cassette_mode: CassetteMode = "replay"
+    completions: str = ""
+    "Directory to record model completions to, or replay them from, depending on `completions_mode`."
+    completions_mode: CompletionsMode = "replay"
 
 
 def think(title: str, thought: str, action: str | None = None, confidence: float = 0.8) -> str:
@@ -179,7 +301,11 @@ def is_known_model_name(model: ModelT) -> TypeGuard[KnownModelName]:
     return model in known_model_names
 
 
+@lru_cache
 def setup_model(model_name: ModelT) -> Model | KnownModelName:
+    "Cached: every case, run and chat in the process shares one client, and its provider's rate limiter, per model."
+    if model_name == ORACLE_MODEL:
+        return oracle_model()
     if is_known_model_name(model_name):
         try:
             open_router_model_map: dict[KnownModelName, OpenAIModelName] = {
@@ -188,71 +314,153 @@ def setup_model(model_name: ModelT) -> Model | KnownModelName:
                 "google-gla:gemini-2.5-flash": "google/gemini-2.5-flash",
             }
             return FallbackModel(
-                OpenAIModel(
-                    model_name=open_router_model_map[model_name],
-                    provider=OpenRouterProvider(),
+                RateLimitedModel(
+                    OpenAIModel(
+                        model_name=open_router_model_map[model_name],
+                        provider=OpenRouterProvider(),
+                    ),
+                    provider="openrouter",
                 ),
-                model_name,
+                RateLimitedModel(model_name, provider=provider_of(model_name)),
             )
         except Exception as e:
             logger.warning(f"Failed to set up model through open router {model_name}: {e}")
-            return model_name
-    return sglang_model(os.environ["SG_LANG_BASE_URL"], model_name)
-
-
-def setup_task_and_agent(query: Query[ResultT], config: TaskConfig) -> tuple[Task[ResultT], Agent]:
-    available_tables = [
-        t["name"]
-        for t in list_table_names(
-            base_url=os.environ["DREAM_FACTORY_BASE_URL"],
-            dream_factory_api_key=os.environ["DREAM_FACTORY_CEO_API_KEY"],
-        )["resource"]
-    ]
-
-    if config.user_role != Role.CEO:
-        available_tables = [t for t in available_tables if t.startswith(config.user_role.value)]
-
-    task = Task(query=query, user_role=config.user_role, available_tables=available_tables)
-    url_key = "DREAM_FACTORY_BASE_URL" if not config.new else "NEW_DREAM_FACTORY_BASE_URL"
-    api_key_key = (
-        f"DREAM_FACTORY_{config.user_role.upper()}_API_KEY"
-        if not config.new
-        else f"NEW_DREAM_FACTORY_{config.user_role.upper()}_API_KEY"
+            return RateLimitedModel(model_name, provider=provider_of(model_name))
+    return RateLimitedModel(sglang_model(os.environ["SG_LANG_BASE_URL"], model_name), provider="sglang")
+
+
+def task_model(config: TaskConfig) -> Model | KnownModelName:
+    "`setup_model`'s model, recording to or replaying from the completion store when `config.completions` is set."
+    model = setup_model(config.model)
+    if not config.completions:
+        return model
+    return RecordedModel(
+        model, store=completion_store(config.completions, config.completions_mode), model_name=config.model
+    )
+
+
+def available_tables(role: Role) -> list[str]:
+    "Tables `role` can see, from the cached CEO catalog filtered by the role's table prefix."
+    catalog = table_catalog(
+        base_url=os.environ["DREAM_FACTORY_BASE_URL"],
+        dream_factory_api_key=os.environ["DREAM_FACTORY_CEO_API_KEY"],
     )
-    tables_mcp_server = MCPServerStdio(
-        command="uv",
-        args=["run", str(MODULE_DIR / "df_mcp.py")],
-        env={
-            "DREAM_FACTORY_BASE_URL": os.environ[url_key],
-            "DREAM_FACTORY_API_KEY": os.environ[api_key_key],
-        },
+    if role == Role.CEO:
+        return list(catalog.table_names)
+    return catalog.tables_with_prefix(role.value)
+
+
+def df_credentials(config: TaskConfig) -> tuple[str, str]:
+    "(base URL, role API key) the df_mcp server should use for this config."
+    prefix = "NEW_DREAM_FACTORY" if config.new else "DREAM_FACTORY"
+    return os.environ[f"{prefix}_BASE_URL"], os.environ[f"{prefix}_{config.user_role.upper()}_API_KEY"]
+
+
+def df_mcp_settings(config: TaskConfig) -> dict[str, str]:
+    "df_mcp env for this config: result encoding and budget and, with `warm_schemas`, the schema snapshot to warm."
+    settings = {
+        "DREAM_FACTORY_RESULT_ENCODING": config.result_encoding,
+        "DREAM_FACTORY_MAX_RESULT_ROWS": str(config.max_result_rows),
+        "DREAM_FACTORY_MAX_RESULT_BYTES": str(config.max_result_bytes),
+    }
+    if config.cassette:
+        settings["DREAM_FACTORY_CASSETTE"] = str(Path(config.cassette).resolve())
+        settings["DREAM_FACTORY_CASSETTE_MODE"] = config.cassette_mode
+        settings["DREAM_FACTORY_ROLE"] = config.user_role.value
+    if not config.warm_schemas:
+        return settings
+    settings["DREAM_FACTORY_SCHEMA_WARM_TABLES"] = ",".join(available_tables(config.user_role))
+    if config.schemas_from_fixtures:
+        settings["DREAM_FACTORY_SCHEMA_DIR"] = str(data_dir(new=config.new))
+    if expected_hash := os.getenv("DREAM_FACTORY_SCHEMA_SHA256"):
+        settings["DREAM_FACTORY_SCHEMA_SHA256"] = expected_hash
+    return settings
+
+
+def setup_task_and_agent(
+    query: Query[ResultT], config: TaskConfig, mcp_server: MCPServer | None = None
+) -> tuple[Task[ResultT], Agent]:
+    tables = available_tables(config.user_role)
+    task = Task(
+        query=query,
+        user_role=config.user_role,
+        available_tables=tables,
+        schema_digest=schema_digest(tuple(tables), new=config.new) if config.inline_schemas else "",
     )
-    mcp_servers = [tables_mcp_server]
+    tools: list[Any] = [think] if config.think else []
+    if config.mcp_transport == "in_process":
+        # the caller binds credentials with `df_tools_session`
+        mcp_servers = []
+        tools += DF_TOOLS
+    else:
+        if mcp_server is None:
+            base_url, api_key = df_credentials(config)
+            mcp_server = df_mcp_server(base_url=base_url, dream_factory_api_key=api_key)
+        mcp_servers = [mcp_server]
     system_prompt = (MODULE_DIR / config.prompt_name).read_text()
     if config.think:
         system_prompt += "\nUse the think tool to reason about the task and work through it step-by-step."
+    if config.inline_schemas:
+        system_prompt += (
+            "\nThe <table_schemas> section lists each table's columns (name, type, PK, FK->table.column) and the "
+            "names to pass as `related`. Use it instead of calling get_table_schema."
+        )
     agent = Agent(
-        model=setup_model(config.model),
+        model=task_model(config),
         name="df_agent",
         system_prompt=system_prompt,
         mcp_servers=mcp_servers,
-        tools=[think] if config.think else [],
+        tools=tools,
         instrument=True,
         retries=config.retries,
     )
     return task, agent
 
 
+@asynccontextmanager
+async def df_tools_session(config: TaskConfig) -> AsyncIterator[MCPServer | None]:
+    "Lease a df_mcp server for stdio transport, or bind the role's credentials for in-process tools."
+    base_url, api_key = df_credentials(config)
+    if config.mcp_transport == "in_process":
+        with (
+            dream_factory_credentials(base_url=base_url, dream_factory_api_key=api_key),
+            result_encoding(config.result_encoding),
+            result_budget(ResultBudget(max_rows=config.max_result_rows, max_bytes=config.max_result_bytes)),
+        ):
+            yield None
+        return
+    async with mcp_session(base_url=base_url, dream_factory_api_key=api_key) as mcp_server:
+        yield mcp_server
+
+
 async def task(inputs: Query[ResultT], config: TaskConfig) -> QueryResult[ResultT]:
-    task, agent = setup_task_and_agent(query=inputs, config=config)
     tool_calls: list[ToolCall] = []
+    # reset by every attempt and recorded once, so a retried case doesn't count the tokens of its failed attempts
+    attempt_metrics: dict[str, float] = {}
     try:
-        async for attempt in AsyncRetrying(wait=wait_random(min=1, max=3), stop=stop_after_attempt(3)):
+        async for attempt in AsyncRetrying(
+            wait=wait_random(min=1, max=3),
+            stop=stop_after_attempt(3),
+            # a replayed completion that isn't recorded won't be on the next attempt either
+            retry=retry_if_not_exception_type(CompletionMissError),
+        ):
             with attempt:
-                async with agent.run_mcp_servers():
+                attempt_metrics = {}
+                async with df_tools_session(config) as mcp_server:
+                    task, agent = setup_task_and_agent(query=inputs, config=config, mcp_server=mcp_server)
+                    set_eval_attribute("inline_schemas", config.inline_schemas)
+                    set_eval_attribute("result_encoding", config.result_encoding)
+                    attempt_metrics["schema_digest_tokens"] = estimate_tokens(task.schema_digest)
+                    attempt_metrics["tool_return_tokens"] = 0
                     num_tool_calls = 0
                     async with agent.iter(user_prompt=task.prompt, output_type=inputs.output_type) as agent_run:
                         async for node in agent_run:
+                            if agent.is_model_request_node(node):
+                                attempt_metrics["tool_return_tokens"] += sum(
+                                    estimate_tokens(part.model_response_str())
+                                    for part in node.request.parts
+                                    if isinstance(part, ToolReturnPart)
+                                )
                             if agent.is_call_tools_node(node):
                                 for part in node.model_response.parts:
                                     if isinstance(part, ToolCallPart) and not any(
@@ -276,18 +484,23 @@ async def task(inputs: Query[ResultT], config: TaskConfig) -> QueryResult[Result
                                                 f"Too many tool calls: {num_tool_calls} > {config.max_tool_calls}"
                                             )
                                             logger.warning(error_msg)
+                                            record_usage(agent_run.usage())
                                             return QueryResult(
                                                 result=None,
                                                 tool_calls=tool_calls,
                                                 error=error_msg,
                                             )
+                    record_usage(agent_run.usage())
                     if agent_run.result is None:
                         return QueryResult(result=None, tool_calls=tool_calls, error="No result produced")
                     return QueryResult(result=agent_run.result.output, tool_calls=tool_calls)
     except Exception as e:
-        error_msg = f"Unexpected error: {str(e)}"
+        error_msg = f"{UNEXPECTED_ERROR}: {str(e)}"
         logger.exception(error_msg)
         return QueryResult(result=None, tool_calls=tool_calls, error=error_msg)
+    finally:
+        for name, value in attempt_metrics.items():
+            record_metric(name, value)
     logger.error(
         (
             "Internal Error: The 'task' function in df_agent.py reached an unexpected state "
@@ -302,6 +515,63 @@ async def task(inputs: Query[ResultT], config: TaskConfig) -> QueryResult[Result
     )
 
 
+def is_finished(result: QueryResult[Any]) -> bool:
+    "Whether a case ran to an answer (or a scored failure such as too many tool calls) rather than crashing."
+    return result.error is None or not result.error.startswith((UNEXPECTED_ERROR, "Internal Server Error"))
+
+
+def checkpointed[ResultT](
+    run_task: Callable[[Query[ResultT]], Awaitable[QueryResult[ResultT]]],
+    dataset: Dataset[Query[ResultT], QueryResult[ResultT]],
+    config: TaskConfig,
+    checkpoint: Checkpoint,
+    resume: bool = False,
+) -> Callable[[Query[ResultT]], Awaitable[QueryResult[ResultT]]]:
+    "Append each finished case to `checkpoint`; with `resume`, return checkpointed cases instead of running them."
+    case_names = {id(case.inputs): case.name for case in dataset.cases}
+    system_prompt = (MODULE_DIR / config.prompt_name).read_text()
+
+    async def run(inputs: Query[ResultT]) -> QueryResult[ResultT]:
+        case_name = case_names[id(inputs)]
+        # set on resumed cases too: EvaluateToolCallResults reads the fixtures of this data version
+        set_eval_attribute("new_data", config.new)
+        key = checkpoint.key(
+            case_name,
+            prompt_hash(
+                system_prompt,
+                inputs.query,
+                inputs.output_type.__name__,
+                config.think,
+                config.inline_schemas,
+                config.result_encoding,
+                config.max_tool_calls,
+                config.max_result_rows,
+                config.max_result_bytes,
+            ),
+        )
+        adapter = TypeAdapter(QueryResult[inputs.output_type])
+        if resume and (entry := checkpoint.get(key)) is not None:
+            set_eval_attribute("resumed", True)
+            increment_eval_metric("resumed_task_duration", entry["task_duration"])
+            for name, value in entry["metrics"].items():
+                increment_eval_metric(name, value)
+            return adapter.validate_python(entry["output"])
+        start = perf_counter()
+        with recording_metrics() as metrics:
+            result = await run_task(inputs)
+        if is_finished(result):
+            checkpoint.append(
+                key,
+                case_name=case_name,
+                output=adapter.dump_python(result, mode="json"),
+                task_duration=perf_counter() - start,
+                metrics=metrics,
+            )
+        return result
+
+    return run
+
+
 def sglang_model(base_url: str, model_name: ModelT) -> Model:
     return OpenAIModel(model_name, provider=OpenAIProvider(base_url=base_url, api_key="SG_LANG"))
 
@@ -313,14 +583,55 @@ class ReportInfo(BaseModel):
     level: int
 
 
+async def prepare_evaluation(task_config: TaskConfig) -> dict[str, str]:
+    "Warm the catalog (and in-process schema snapshot) before the first case; returns the df_mcp settings."
+    if task_config.cassette:
+        # the catalog and in-process tools go through this process's cassette; stdio servers open their own
+        use_cassette(dream_factory_cassette(task_config.cassette, task_config.cassette_mode))
+    # warm the catalog off the event loop so no case blocks on it
+    await asyncio.to_thread(available_tables, task_config.user_role)
+    mcp_settings = df_mcp_settings(task_config)
+    if task_config.warm_schemas and task_config.mcp_transport == "in_process":
+        base_url, api_key = df_credentials(task_config)
+        await warm_schema_snapshot(
+            table_names=available_tables(task_config.user_role),
+            base_url=base_url,
+            dream_factory_api_key=api_key,
+            schema_dir=mcp_settings.get("DREAM_FACTORY_SCHEMA_DIR"),
+            expected_hash=mcp_settings.get("DREAM_FACTORY_SCHEMA_SHA256", ""),
+        )
+    return mcp_settings
+
+
 async def evaluate(
     report_info: ReportInfo,
     dataset: Dataset[Query[ResultT], QueryResult[ResultT]],
     task_config: TaskConfig,
     # task: Callable[[Query[ResultT], TaskConfig], Awaitable[QueryResult[ResultT]]] = task
-):
+    resume: bool = False,
+) -> EvaluationReport:
     logger.info(f"Evaluating {report_info.name}")
-    report = await dataset.evaluate(task=lambda inputs: task(inputs, task_config), name=report_info.name)
+    checkpoint = Checkpoint(
+        report_name=report_info.name, model=task_config.model, data_version=data_version(task_config.new)
+    )
+    if resume:
+        logger.info(f"Resuming from {checkpoint.path}: {len(checkpoint)} finished cases")
+    keys = [df_credentials(task_config)] if task_config.mcp_transport == "stdio" else []
+    # per-run counters; stdio servers log their own when the pool closes them
+    result_cache.clear()
+    record_stats.clear()
+    mcp_settings = await prepare_evaluation(task_config)
+    if task_config.model == ORACLE_MODEL:
+        register_oracle_cases(dataset)
+    async with mcp_server_pool(keys=keys, enabled=task_config.pool_mcp_servers, server_env=mcp_settings) as pool:
+        report = await dataset.evaluate(
+            task=checkpointed(
+                lambda inputs: task(inputs, task_config), dataset, task_config, checkpoint, resume=resume
+            ),
+            name=report_info.name,
+            max_concurrency=task_config.max_concurrency,
+        )
+    await aclose_http_client()
     report.print(
         include_input=True,
         include_output=True,
@@ -329,13 +640,19 @@ async def evaluate(
         include_total_duration=True,
         include_averages=True,
     )
+    logger.info(pool.timings.summary())
+    for summary in limiter_summaries() + completion_summaries() + judge_summaries():
+        logger.info(summary)
+    if task_config.mcp_transport == "in_process":
+        logger.info(result_cache.stats.summary())
+        logger.info(record_stats.summary())
+    if (cassette := current_cassette()) is not None:
+        logger.info(cassette.stats.summary(cassette))
+    if task_config.model == ORACLE_MODEL:
+        logger.info(oracle_stats.summary())
+    return report
 
 
 def are_strings_similar(str1: str, str2: str, model: ModelT = STRINGS_SIMILARITY_MODEL) -> bool:
-    strings_similarity_agent = Agent(model=model, name="strings_similarity_agent", output_type=bool)
-    prompt = (
-        "The wording/structure/grammar may be different, but are these 2 strings saying the same thing?\n"
-        f"String 1: {str1}\n"
-        f"String 2: {str2}\n"
-    )
-    return strings_similarity_agent.run_sync(prompt).output
+    "Judged by `model`; inside `EvaluateResult` the judge calls are batched and run without blocking the loop."
+    return judge_strings_similar(str1, str2, model=model)
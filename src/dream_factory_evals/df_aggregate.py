@@ -0,0 +1,126 @@
+"""Group-by/aggregate over DreamFactory records with polars, for `df_mcp.aggregate_table_records`.
+
+Aggregations are written `fn(column)`: count, sum, mean, min, max and distinct_count. A bare `count` or
+`count(*)` counts rows. Each output column is named `fn_column`, or `count` for row counts.
+"""
+
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Literal, cast, get_args
+
+import polars as pl
+
+type AggregateFn = Literal["count", "sum", "mean", "min", "max", "distinct_count"]
+
+AGGREGATE_FNS: tuple[str, ...] = get_args(AggregateFn.__value__)
+NUMERIC_FNS = ("sum", "mean")
+ORDERED_FNS = ("sum", "mean", "min", "max")
+"Functions that compare or add values, so decimals returned as strings must be cast first."
+
+_SPEC = re.compile(r"\s*(\w+)\s*(?:\(\s*(\*|[\w.]+)?\s*\))?\s*")
+
+
+@dataclass(frozen=True, slots=True)
+class Aggregation:
+    fn: AggregateFn
+    column: str | None = None
+
+    @property
+    def name(self) -> str:
+        return self.fn if self.column is None else f"{self.fn}_{self.column}"
+
+
+def split_names(value: str | Sequence[str]) -> list[str]:
+    items = value.split(",") if isinstance(value, str) else value
+    return [v.strip() for v in items if v.strip()]
+
+
+def parse_aggregation(spec: str) -> Aggregation:
+    match = _SPEC.fullmatch(spec)
+    if match is None or match.group(1).lower() not in AGGREGATE_FNS:
+        raise ValueError(f"Invalid aggregation {spec!r}, expected one of {', '.join(AGGREGATE_FNS)} as fn(column)")
+    fn, column = cast(AggregateFn, match.group(1).lower()), match.group(2)
+    if column in (None, "*"):
+        if fn != "count":
+            raise ValueError(f"Aggregation {spec!r} needs a column")
+        return Aggregation(fn="count")
+    return Aggregation(fn=fn, column=column)
+
+
+def parse_aggregations(aggregations: str | Sequence[str]) -> list[Aggregation]:
+    parsed = [parse_aggregation(spec) for spec in split_names(aggregations)]
+    return parsed or [Aggregation(fn="count")]
+
+
+def source_fields(group_by: Sequence[str], aggregations: Sequence[Aggregation]) -> list[str]:
+    "Columns to fetch: the group keys and every aggregated column."
+    return list(dict.fromkeys([*group_by, *(a.column for a in aggregations if a.column)]))
+
+
+def cast_numeric_strings(df: pl.DataFrame, aggregations: Sequence[Aggregation]) -> pl.DataFrame:
+    """Cast the string columns of sum/mean/min/max whose values are all numbers to Float64.
+
+    DreamFactory returns some decimals as strings, which would otherwise compare as text ("10.5" < "2"). Other
+    strings (dates, names) keep text order for min/max; sum or mean of them is an error.
+    """
+    for column in dict.fromkeys(a.column for a in aggregations if a.column and a.fn in ORDERED_FNS):
+        dtype = df.schema[column]
+        if dtype.is_numeric() or dtype in (pl.Null, pl.Boolean):
+            continue
+        if dtype == pl.String:
+            try:
+                df = df.with_columns(pl.col(column).cast(pl.Float64))
+                continue
+            except pl.exceptions.InvalidOperationError:
+                pass
+        if fns := [a.fn for a in aggregations if a.column == column and a.fn in NUMERIC_FNS]:
+            values = df.get_column(column).drop_nulls()
+            bad = next((v for v in values if dtype != pl.String or not _is_number(v)), None)
+            raise ValueError(f"Can't {fns[0]} {column}: it has non-numeric values such as {bad!r}")
+    return df
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _expr(aggregation: Aggregation) -> pl.Expr:
+    if aggregation.column is None:
+        return pl.len().alias(aggregation.name)
+    col = pl.col(aggregation.column)
+    match aggregation.fn:
+        case "count":
+            expr = col.count()
+        case "sum":
+            expr = col.sum()
+        case "mean":
+            expr = col.mean()
+        case "min":
+            expr = col.min()
+        case "max":
+            expr = col.max()
+        case "distinct_count":
+            expr = col.drop_nulls().n_unique()
+    return expr.alias(aggregation.name)
+
+
+def aggregate_records(
+    records: list[dict[str, Any]], group_by: Sequence[str], aggregations: Sequence[Aggregation]
+) -> list[dict[str, Any]]:
+    "One row per group (or a single row without `group_by`), sorted by the group keys."
+    if not records:
+        if group_by:
+            return []
+        return [{a.name: 0 if a.fn in ("count", "distinct_count", "sum") else None for a in aggregations}]
+    df = pl.DataFrame(records, infer_schema_length=None)
+    if missing := [c for c in source_fields(group_by, aggregations) if c not in df.columns]:
+        raise ValueError(f"Unknown field(s): {', '.join(missing)}")
+    df = cast_numeric_strings(df, aggregations)
+    exprs = [_expr(a) for a in aggregations]
+    result = df.group_by(list(group_by)).agg(exprs).sort(list(group_by)) if group_by else df.select(exprs)
+    return result.to_dicts()
@@ -0,0 +1,152 @@
+"""Batched calculator for `df_mcp.calculate_batch`: many named expressions over named arrays in one call.
+
+Expressions are Python-like arithmetic (+ - * / and parentheses) over numbers, array names, earlier results
+and these functions:
+
+    sum(x) mean(x) median(x) percentile(x, q) min(x) max(x) count(x)
+    ratio(a, b) percent_change(old, new) difference(a, b) date_diff(start, end)
+
+Sums and means use `math.fsum`, so they are correctly rounded whatever the order of the values. Arithmetic on
+arrays is element-wise. `date_diff` takes ISO dates (or arrays of them) and returns days from `start` to `end`.
+"""
+
+import ast
+import math
+import operator
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import numpy as np
+
+type Value = float | np.ndarray
+
+
+def _numbers(x: Any) -> np.ndarray:
+    return np.atleast_1d(np.asarray(x, dtype=np.float64))
+
+
+def _nonempty(x: Any, fn: str) -> np.ndarray:
+    values = _numbers(x)
+    if values.size == 0:
+        raise ValueError(f"{fn}() of an empty array")
+    return values
+
+
+def _sum(x: Any) -> float:
+    return math.fsum(_numbers(x))
+
+
+def _mean(x: Any) -> float:
+    values = _nonempty(x, "mean")
+    return math.fsum(values) / values.size
+
+
+def _percentile(x: Any, q: float) -> float:
+    return float(np.percentile(_nonempty(x, "percentile"), q))
+
+
+def _ratio(a: Value, b: Value) -> Value:
+    if np.any(np.asarray(b) == 0):
+        raise ValueError("ratio() with a zero denominator")
+    return np.divide(a, b)
+
+
+def _percent_change(old: Value, new: Value) -> Value:
+    if np.any(np.asarray(old) == 0):
+        raise ValueError("percent_change() from zero")
+    return (np.subtract(new, old) / np.asarray(old, dtype=np.float64)) * 100
+
+
+def _dates(x: Any) -> np.ndarray:
+    return np.asarray(x, dtype="datetime64[D]")
+
+
+def _date_diff(start: Any, end: Any) -> Value:
+    return (_dates(end) - _dates(start)).astype(np.int64)
+
+
+FUNCTIONS: dict[str, Callable[..., Any]] = {
+    "sum": _sum,
+    "mean": _mean,
+    "median": lambda x: float(np.median(_nonempty(x, "median"))),
+    "percentile": _percentile,
+    "min": lambda x: float(np.min(_nonempty(x, "min"))),
+    "max": lambda x: float(np.max(_nonempty(x, "max"))),
+    "count": lambda x: np.asarray(x).size,
+    "ratio": _ratio,
+    "percent_change": _percent_change,
+    "difference": lambda a, b: np.subtract(b, a),
+    "date_diff": _date_diff,
+}
+
+OPERATORS: dict[type[ast.operator | ast.unaryop], Callable[..., Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+def _eval(node: ast.AST, names: Mapping[str, Any]) -> Any:
+    match node:
+        case ast.Expression(body=body):
+            return _eval(body, names)
+        case ast.Constant(value=value) if isinstance(value, int | float | str) and not isinstance(value, bool):
+            return value
+        case ast.Name(id=name):
+            if name not in names:
+                raise ValueError(f"Unknown name {name!r}")
+            return names[name]
+        case ast.List(elts=elts) | ast.Tuple(elts=elts):
+            return np.asarray([_eval(e, names) for e in elts])
+        case ast.UnaryOp(op=op, operand=operand) if type(op) in OPERATORS:
+            return OPERATORS[type(op)](_eval(operand, names))
+        case ast.BinOp(left=left, op=op, right=right) if type(op) in OPERATORS:
+            left_value, right_value = _eval(left, names), _eval(right, names)
+            if isinstance(op, ast.Div) and np.any(np.asarray(right_value) == 0):
+                raise ValueError("Division by zero")
+            return OPERATORS[type(op)](left_value, right_value)
+        case ast.Call(func=ast.Name(id=fn), args=args, keywords=[]) if fn in FUNCTIONS:
+            return FUNCTIONS[fn](*(_eval(a, names) for a in args))
+        case ast.Call(func=ast.Name(id=fn)):
+            raise ValueError(f"Unknown function {fn!r}, expected one of {', '.join(FUNCTIONS)}")
+    raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+def to_json(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return [to_json(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def evaluate(expression: str, names: Mapping[str, Any]) -> Any:
+    return _eval(ast.parse(expression.strip(), mode="eval"), names)
+
+
+def calculate(
+    expressions: Mapping[str, str], arrays: Mapping[str, list[Any]] | None = None
+) -> dict[str, dict[str, Any]]:
+    """Evaluate `expressions` in order; later ones can use earlier results by name.
+
+    A failing expression is reported under `errors` and doesn't stop the others, and so is an array that isn't all
+    numbers or all dates, under its own name.
+    """
+    names: dict[str, Any] = {}
+    results: dict[str, Any] = {}
+    errors: dict[str, str] = {}
+    for name, values in (arrays or {}).items():
+        try:
+            names[name] = np.asarray(values) if values and isinstance(values[0], str) else _numbers(values)
+        except (ValueError, TypeError) as e:
+            errors[name] = f"Array {name!r}: {e}"
+    for name, expression in expressions.items():
+        try:
+            names[name] = evaluate(expression, names)
+            results[name] = to_json(names[name])
+        except (ValueError, TypeError, SyntaxError, ArithmeticError) as e:
+            errors[name] = str(e)
+    return {"results": results, "errors": errors} if errors else {"results": results}
@@ -0,0 +1,138 @@
+"""Canonical DreamFactory tool calls and their execution against a local snapshot of the fixtures.
+
+Two calls that ask for the same data (same filter up to spelling and operand order, `fields` as a list or a
+comma string, ...) canonicalize to the same `CanonicalCall`, and each distinct call is executed once per process.
+"""
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from dream_factory_evals.df_filter import canonical_filter_or_raw
+from dream_factory_evals.df_local import DreamFactoryError, LocalDreamFactory, data_dir, role_api_keys
+
+AGGREGATE_TOOL = "aggregate_table_records"
+QUERY_TOOL = "query_tables"
+SUMMARY_TOOLS = (AGGREGATE_TOOL, "count_table_records", "get_distinct_values")
+DATA_TOOLS = ("get_table_records", "get_table_records_by_ids", *SUMMARY_TOOLS, QUERY_TOOL)
+EXECUTION_CACHE_SIZE = 8192
+
+
+@dataclass(frozen=True, slots=True)
+class CanonicalCall:
+    tool_name: str
+    table_name: str
+    filter: str = ""
+    fields: tuple[str, ...] = ("*",)
+    limit: int | None = None
+    offset: int = 0
+    order: str = ""
+    related: tuple[str, ...] = ()
+    ids: tuple[str, ...] = ()
+
+    def params(self) -> dict[str, str]:
+        "DreamFactory query params for this call."
+        params = {"fields": ",".join(self.fields)}
+        if self.ids:
+            params["ids"] = ",".join(self.ids)
+        if self.filter:
+            params["filter"] = self.filter
+        if self.limit:
+            params["limit"] = str(self.limit)
+        if self.offset:
+            params["offset"] = str(self.offset)
+        if self.order:
+            params["order"] = self.order
+        if self.related:
+            params["related"] = ",".join(self.related)
+        return params
+
+
+def _names(value: Any, lower: bool = False) -> tuple[str, ...]:
+    if value is None or value == "":
+        return ()
+    items = value.split(",") if isinstance(value, str) else [str(v) for v in value]
+    names = {(v.strip().lower() if lower else v.strip()) for v in items if str(v).strip()}
+    return tuple(sorted(names))
+
+
+def _order(order_field: str) -> str:
+    "Explicit directions; column order is kept because it matters for ORDER BY."
+    clauses = (part.strip().partition(" ") for part in order_field.split(","))
+    return ", ".join(f"{col} {direction.strip().upper() or 'ASC'}" for col, _, direction in clauses if col)
+
+
+def canonical_call(tool_name: str, params: dict[str, Any]) -> CanonicalCall | None:
+    "None for tools that don't read table data (schema lookups, calculators, think, ...) and continuation pages."
+    if tool_name not in DATA_TOOLS or "table_name" not in params:
+        return None
+    if params.get("continuation"):
+        # the next page of an earlier call, which is judged on its own
+        return None
+    if tool_name in SUMMARY_TOOLS:
+        # stands for the rows it summarizes, so it can replace a fetch followed by counting or calculate_* calls
+        return CanonicalCall(
+            tool_name=tool_name,
+            table_name=str(params["table_name"]).strip().lower(),
+            filter=canonical_filter_or_raw(str(params.get("filter") or "")),
+        )
+    if tool_name == QUERY_TOOL:
+        # the base rows with the joined relations nested, as `related=` would return them
+        return CanonicalCall(
+            tool_name=tool_name,
+            table_name=str(params["table_name"]).strip().lower(),
+            filter=canonical_filter_or_raw(str(params.get("filter") or "")),
+            related=_names(params.get("joins"), lower=True),
+        )
+    fields = _names(params.get("fields", "*"))
+    return CanonicalCall(
+        tool_name=tool_name,
+        table_name=str(params["table_name"]).strip().lower(),
+        filter=canonical_filter_or_raw(str(params.get("filter") or "")),
+        fields=("*",) if not fields or "*" in fields else fields,
+        limit=int(params["limit"]) if params.get("limit") else None,
+        offset=int(params.get("offset") or 0),
+        order=_order(str(params.get("order_field") or "")),
+        related=("*",) if "*" in _names(params.get("related")) else _names(params.get("related"), lower=True),
+        ids=_names(params.get("ids")),
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class CallResult:
+    rows: tuple[str, ...] = ()
+    "Rows as canonical JSON, sorted, so equal row multisets compare equal."
+    columns: frozenset[str] = frozenset()
+    error: str | None = None
+
+    def project(self, columns: frozenset[str]) -> tuple[str, ...]:
+        "The rows restricted to `columns`."
+        projected = (json.loads(row) for row in self.rows)
+        return tuple(sorted(json.dumps({k: r.get(k) for k in columns}, sort_keys=True) for r in projected))
+
+
+@lru_cache(maxsize=2)
+def snapshot(new: bool = False) -> LocalDreamFactory:
+    "The fixtures the evals were written against, loaded once per process."
+    return LocalDreamFactory.from_dir(data_dir(new=new), api_keys=role_api_keys(new=new))
+
+
+@lru_cache(maxsize=EXECUTION_CACHE_SIZE)
+def execute_call(call: CanonicalCall, new: bool = False) -> CallResult:
+    "Run a canonical call against the local snapshot. Each distinct call runs once per process."
+    try:
+        rows = snapshot(new=new).records(call.table_name, call.params())["resource"]
+    except (DreamFactoryError, ValueError) as e:
+        return CallResult(error=str(e))
+    columns = frozenset(k for row in rows for k in row)
+    return CallResult(rows=tuple(sorted(json.dumps(row, sort_keys=True) for row in rows)), columns=columns)
+
+
+def same_rows(expected: CallResult, actual: CallResult) -> bool:
+    "Whether `actual` returned the expected rows; extra columns in `actual` are ignored. Errors never match."
+    if expected.error is not None or actual.error is not None:
+        return False
+    if not expected.columns <= actual.columns and expected.rows:
+        return False
+    return expected.rows == actual.rows or expected.project(expected.columns) == actual.project(expected.columns)
@@ -0,0 +1,257 @@
+"""Record/replay of DreamFactory HTTP traffic, so runs can be repeated against exactly the same responses offline.
+
+A cassette is a directory:
+
+    requests.jsonl   one line per recorded request: key, method, URL, params, role, status, body sha256
+    blobs/ab/ab...gz response bodies, gzip-compressed and content-addressed by their sha256 (stored once each)
+    index.bin        open-addressing hash table from request key to (body sha256, status), built from requests.jsonl
+    misses.jsonl     requests replay found no recording for
+
+Requests are keyed by method, URL (without the query), canonical params and role rather than API key, so a
+cassette recorded with one set of role API keys replays with another. `index.bin` is
+memory-mapped on the first lookup and rebuilt when `requests.jsonl` has grown since, so a lookup is one hash probe
+and one blob read. Recording appends each line with a single `O_APPEND` write, so the df_mcp servers of a run can
+record into the same cassette at once.
+"""
+
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal
+
+import httpx
+from loguru import logger
+
+type CassetteMode = Literal["record", "replay"]
+type Canonicalize = Callable[[Mapping[str, str | int | None]], tuple[tuple[str, str], ...]]
+
+INDEX_MAGIC = b"DFCASS01"
+INDEX_HEADER = struct.Struct("<8sQQ")
+"magic, size of requests.jsonl the index was built from, slot count"
+INDEX_SLOT = struct.Struct("<16s32sH6x")
+"request key digest (all zeros: empty), body sha256, status"
+EMPTY_SLOT = bytes(16)
+GENERIC_KEY_VARS = ("DREAM_FACTORY_API_KEY", "NEW_DREAM_FACTORY_API_KEY")
+"Set for a single df_mcp server, so they name no role; DREAM_FACTORY_ROLE does."
+
+
+@lru_cache(maxsize=64)
+def role_of(dream_factory_api_key: str) -> str:
+    """The role an API key belongs to, from the DREAM_FACTORY_{ROLE}_API_KEY variables; a key hash if none match.
+
+    The role-specific variables are checked before the generic DREAM_FACTORY_API_KEY (with DREAM_FACTORY_ROLE), so
+    a role's key resolves to that role whatever the order of the environment.
+    """
+    for name, value in os.environ.items():
+        if value != dream_factory_api_key or not name.endswith("_API_KEY") or name in GENERIC_KEY_VARS:
+            continue
+        for prefix in ("NEW_DREAM_FACTORY_", "DREAM_FACTORY_"):
+            if name.startswith(prefix) and (role := name.removeprefix(prefix).removesuffix("_API_KEY")):
+                return role.lower()
+    if os.getenv("DREAM_FACTORY_API_KEY") == dream_factory_api_key and (role := os.getenv("DREAM_FACTORY_ROLE")):
+        return role.lower()
+    return "key:" + hashlib.sha256(dream_factory_api_key.encode()).hexdigest()[:12]
+
+
+@dataclass
+class CassetteStats:
+    recorded: int = 0
+    replayed: int = 0
+    misses: int = 0
+
+    def summary(self, cassette: "Cassette") -> str:
+        return (
+            f"DreamFactory cassette {cassette.directory} ({cassette.mode}): {self.recorded} recorded, "
+            f"{self.replayed} replayed, {self.misses} without a recording"
+        )
+
+
+@dataclass
+class Cassette:
+    directory: Path
+    mode: CassetteMode
+    canonicalize: Canonicalize
+    stats: CassetteStats = field(default_factory=CassetteStats)
+    _index: mmap.mmap | None = None
+    _slots: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def log_path(self) -> Path:
+        return self.directory / "requests.jsonl"
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / "index.bin"
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.directory / "blobs" / sha256[:2] / f"{sha256}.gz"
+
+    def request_key(self, request: httpx.Request) -> tuple[str, str, str, tuple[tuple[str, str], ...], str]:
+        "(digest, method, URL, canonical params, role)"
+        url = str(request.url.copy_with(query=None))
+        params = self.canonicalize(dict(request.url.params.multi_items()))
+        role = role_of(request.headers.get("X-DreamFactory-API-Key", ""))
+        digest = hashlib.sha256(json.dumps([request.method, url, params, role]).encode()).hexdigest()
+        return digest, request.method, url, params, role
+
+    def record(self, request: httpx.Request, status: int, body: bytes) -> None:
+        digest, method, url, params, role = self.request_key(request)
+        sha256 = hashlib.sha256(body).hexdigest()
+        blob = self.blob_path(sha256)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(gzip.compress(body, mtime=0))
+            tmp.replace(blob)
+        line = {
+            "key": digest,
+            "method": method,
+            "url": url,
+            "params": params,
+            "role": role,
+            "status": status,
+            "body": sha256,
+        }
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (json.dumps(line) + "\n").encode())
+        finally:
+            os.close(fd)
+        self.stats.recorded += 1
+
+    def build_index(self) -> None:
+        "Rebuild `index.bin` from `requests.jsonl`; a later recording of the same request wins."
+        data = self.log_path.read_bytes() if self.log_path.exists() else b""
+        entries: dict[bytes, tuple[bytes, int]] = {}
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[bytes.fromhex(entry["key"])[:16]] = (bytes.fromhex(entry["body"]), entry["status"])
+        slots = 16
+        while slots < 2 * len(entries):
+            slots *= 2
+        table = bytearray(INDEX_HEADER.size + slots * INDEX_SLOT.size)
+        INDEX_HEADER.pack_into(table, 0, INDEX_MAGIC, len(data), slots)
+        for key, (body, status) in entries.items():
+            slot = int.from_bytes(key[:8], "little") & (slots - 1)
+            while table[self._offset(slot) : self._offset(slot) + 16] != EMPTY_SLOT:
+                slot = (slot + 1) & (slots - 1)
+            INDEX_SLOT.pack_into(table, self._offset(slot), key, body, status)
+        tmp = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(table)
+        tmp.replace(self.index_path)
+        logger.info(f"Indexed {len(entries)} recorded requests in {self.index_path}")
+
+    @staticmethod
+    def _offset(slot: int) -> int:
+        return INDEX_HEADER.size + slot * INDEX_SLOT.size
+
+    def _load_index(self) -> mmap.mmap:
+        if self._index is not None:
+            return self._index
+        log_size = self.log_path.stat().st_size if self.log_path.exists() else 0
+        header = b""
+        if self.index_path.exists():
+            with self.index_path.open("rb") as f:
+                header = f.read(INDEX_HEADER.size)
+        if len(header) < INDEX_HEADER.size or INDEX_HEADER.unpack(header)[:2] != (INDEX_MAGIC, log_size):
+            self.build_index()
+        with self.index_path.open("rb") as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._slots = INDEX_HEADER.unpack_from(self._index)[2]
+        return self._index
+
+    def lookup(self, request: httpx.Request) -> tuple[int, bytes] | None:
+        "(status, body) recorded for `request`, or None."
+        digest = self.request_key(request)[0]
+        key = bytes.fromhex(digest)[:16]
+        with self._lock:
+            index = self._load_index()
+        slot = int.from_bytes(key[:8], "little") & (self._slots - 1)
+        while True:
+            slot_key, body, status = INDEX_SLOT.unpack_from(index, self._offset(slot))
+            if slot_key == EMPTY_SLOT:
+                return None
+            if slot_key == key:
+                return status, gzip.decompress(self.blob_path(body.hex()).read_bytes())
+            slot = (slot + 1) & (self._slots - 1)
+
+    def miss(self, request: httpx.Request) -> httpx.Response:
+        "Note a request with no recording and answer it with a DreamFactory-style error."
+        _, method, url, params, role = self.request_key(request)
+        self.stats.misses += 1
+        logger.warning(f"No recording in {self.directory} for {method} {url} {dict(params)} as {role}")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with (self.directory / "misses.jsonl").open("a") as f:
+            f.write(json.dumps({"method": method, "url": url, "params": params, "role": role}) + "\n")
+        message = f"No recording for {method} {url} in the DreamFactory cassette"
+        return httpx.Response(404, json={"error": {"code": 404, "message": message}}, request=request)
+
+    def replay(self, request: httpx.Request) -> httpx.Response:
+        if (recorded := self.lookup(request)) is None:
+            return self.miss(request)
+        self.stats.replayed += 1
+        status, body = recorded
+        return httpx.Response(status, content=body, headers={"Content-Type": "application/json"}, request=request)
+
+
+_cassette: Cassette | None = None
+
+
+def use_cassette(cassette: Cassette | None) -> None:
+    "Record or replay every DreamFactory request of this process through `cassette` (None: the network)."
+    global _cassette
+    if cassette is not None:
+        cassette.directory.mkdir(parents=True, exist_ok=True)
+        logger.info(f"DreamFactory requests: {cassette.mode} {cassette.directory}")
+    _cassette = cassette
+
+
+def current_cassette() -> Cassette | None:
+    return _cassette
+
+
+class CassetteTransport(httpx.AsyncBaseTransport, httpx.BaseTransport):
+    "Sends requests through `wrapped`, recording them, or replays them, depending on the current cassette."
+
+    def __init__(self, wrapped: httpx.AsyncBaseTransport | httpx.BaseTransport):
+        self.wrapped = wrapped
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        cassette = current_cassette()
+        if cassette is not None and cassette.mode == "replay":
+            return cassette.replay(request)
+        assert isinstance(self.wrapped, httpx.AsyncBaseTransport)
+        response = await self.wrapped.handle_async_request(request)
+        if cassette is not None:
+            cassette.record(request, response.status_code, await response.aread())
+        return response
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        cassette = current_cassette()
+        if cassette is not None and cassette.mode == "replay":
+            return cassette.replay(request)
+        assert isinstance(self.wrapped, httpx.BaseTransport)
+        response = self.wrapped.handle_request(request)
+        if cassette is not None:
+            cassette.record(request, response.status_code, response.read())
+        return response
+
+    async def aclose(self) -> None:
+        if isinstance(self.wrapped, httpx.AsyncBaseTransport):
+            await self.wrapped.aclose()
+
+    def close(self) -> None:
+        if isinstance(self.wrapped, httpx.BaseTransport):
+            self.wrapped.close()
@@ -10,6 +10,7 @@ from dream_factory_evals.df_agent import (
     TaskConfig,
     ToolCall,
     ToolCallResult,
+    df_tools_session,
     setup_task_and_agent,
 )
 
@@ -29,12 +30,12 @@ async def chat(
 ) -> ChatResult:
     inputs = Query(query=user_prompt, output_type=MarkdownResponse)
     task_config.new = False
-    task, agent = setup_task_and_agent(query=inputs, config=task_config)
     tool_calls: dict[str, dict[str, ToolCall | ToolCallResult]] = {}
     try:
         async for attempt in AsyncRetrying(wait=wait_random(min=1, max=3), stop=stop_after_attempt(3)):
             with attempt:
-                async with agent.run_mcp_servers():
+                async with df_tools_session(task_config) as mcp_server:
+                    task, agent = setup_task_and_agent(query=inputs, config=task_config, mcp_server=mcp_server)
                     num_tool_calls = 0
                     async with agent.iter(
                         user_prompt=task.prompt, output_type=inputs.output_type, message_history=message_history
@@ -0,0 +1,148 @@
+"""Append-only per-case checkpoints, so an interrupted run can resume without paying for finished cases again.
+
+Each report has a `CHECKPOINT_DIR/{report_name}.jsonl` file with one line per finished case: its key, the case
+name, the `QueryResult` as JSON, the task duration and the case's metrics. The key hashes the report name, case name,
+model, prompt hash and data version, so a case is only reused when none of them changed. Lines are flushed and
+fsynced as they are written; a torn last line (the process died mid-write) is ignored, and a later line for the same
+key wins.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+from pydantic_ai.usage import Usage
+from pydantic_evals.dataset import increment_eval_metric
+
+from dream_factory_evals.df_local import data_dir
+
+CHECKPOINT_DIR = Path(os.getenv("CHECKPOINT_DIR", "checkpoints"))
+
+_case_metrics: ContextVar[dict[str, float] | None] = ContextVar("checkpoint_case_metrics", default=None)
+
+
+def _sha256(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@lru_cache(maxsize=2)
+def data_version(new: bool = False) -> str:
+    "Hash of the fixtures (`data/` or `new_data/`) the DreamFactory service is loaded from."
+    digest = hashlib.sha256()
+    for path in sorted(data_dir(new=new).iterdir()):
+        if path.is_file():
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+    return f"{data_dir(new=new).name}:{digest.hexdigest()[:16]}"
+
+
+def prompt_hash(system_prompt: str, user_prompt: str, *settings: Any) -> str:
+    "Hash of everything the model is prompted with, plus settings that change the prompt or tools."
+    return _sha256(system_prompt, user_prompt, *settings)[:16]
+
+
+@contextmanager
+def recording_metrics() -> Iterator[dict[str, float]]:
+    "Collect the metrics `record_metric` and `record_usage` report inside the block, for the checkpoint."
+    metrics: dict[str, float] = {}
+    token = _case_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _case_metrics.reset(token)
+
+
+def record_metric(name: str, value: float) -> None:
+    "`increment_eval_metric` that is also kept in the case's checkpoint."
+    increment_eval_metric(name, value)
+    if (metrics := _case_metrics.get()) is not None:
+        metrics[name] = metrics.get(name, 0) + value
+
+
+def record_usage(usage: Usage) -> None:
+    """Keep an agent run's usage in the case's checkpoint.
+
+    pydantic_evals derives the usage metrics from the run's spans, so they are only restored on resume.
+    """
+    if (metrics := _case_metrics.get()) is None:
+        return
+    for name, value in (
+        ("requests", usage.requests),
+        ("input_tokens", usage.request_tokens),
+        ("output_tokens", usage.response_tokens),
+    ):
+        if value:
+            metrics[name] = metrics.get(name, 0) + value
+
+
+@dataclass
+class Checkpoint:
+    report_name: str
+    model: str
+    data_version: str
+    directory: Path = CHECKPOINT_DIR
+    _entries: dict[str, dict[str, Any]] | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f"{self.report_name}.jsonl"
+
+    def key(self, case_name: str, prompt_hash: str) -> str:
+        return _sha256(self.report_name, case_name, self.model, prompt_hash, self.data_version)
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                for number, line in enumerate(self.path.read_text().splitlines(), start=1):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping unreadable line {number} of {self.path}")
+                        continue
+                    self._entries[entry["key"]] = entry
+        return self._entries
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._load().get(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def append(
+        self, key: str, case_name: str, output: Any, task_duration: float, metrics: dict[str, float]
+    ) -> None:
+        "`output` must already be JSON-compatible."
+        entry = {
+            "key": key,
+            "case_name": case_name,
+            "output": output,
+            "task_duration": task_duration,
+            "metrics": metrics,
+        }
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            line = json.dumps(entry, default=str).encode() + b"\n"
+            with self.path.open("a+b") as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # end the torn line a killed run left, so this entry isn't glued onto it
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._entries is not None:
+                self._entries[key] = entry
@@ -0,0 +1,212 @@
+"""Record/replay of model completions, so a harness change can be re-scored without paying for the models again.
+
+`RecordedModel` wraps the model `setup_model` returns. Each request is keyed by the sha256 of the model name, the
+messages (without timestamps and usage), the function and output tools, the output mode and the model settings.
+In record mode the response is stored under that key; in replay mode it is served from the store and the wrapped
+model is never called. A store is a directory:
+
+    ab/ab...json.gz  the response of one request, gzip-compressed, content-addressed by the request key
+    requests.jsonl   one line per recorded request: key, model, conversation (hash of the first message), turn
+    misses.jsonl     requests replay found no recording for, and where they drifted
+
+A replayed response's tool call ids are the recorded ones, so the messages of the next turn match the recording
+too. Streaming requests always go to the wrapped model.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+
+from loguru import logger
+from pydantic import TypeAdapter
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models import KnownModelName, Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+type CompletionsMode = Literal["record", "replay"]
+
+VOLATILE_FIELDS = frozenset({"timestamp", "usage", "vendor_id", "vendor_details"})
+"Message fields that differ between identical requests."
+
+_parameters_adapter = TypeAdapter(ModelRequestParameters)
+
+
+class CompletionMissError(Exception):
+    "Replay found no recorded response for a request."
+
+
+def _stable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _stable(v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_stable(v) for v in value]
+    return value
+
+
+def _sha256(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class CompletionStats:
+    recorded: int = 0
+    replayed: int = 0
+    missed_keys: set[str] = field(default_factory=set)
+    drifted: int = 0
+    "Misses in a conversation that was recorded, i.e. the same first message but a different later turn."
+
+    def summary(self, store: "CompletionStore") -> str:
+        return (
+            f"Completion store {store.directory} ({store.mode}): {self.recorded} recorded, {self.replayed} replayed, "
+            f"{len(self.missed_keys)} requests without a recording ({self.drifted} drifted mid-conversation)"
+        )
+
+
+@dataclass
+class CompletionStore:
+    directory: Path
+    mode: CompletionsMode
+    stats: CompletionStats = field(default_factory=CompletionStats)
+    _conversations: dict[str, int] | None = None
+    "First-message hash -> most turns recorded, loaded on the first miss to tell drift from new prompts."
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json.gz"
+
+    def request_key(
+        self,
+        model_name: str,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> tuple[str, str]:
+        "(key, conversation): hashes of the whole request and of its first message."
+        dumped = _stable(ModelMessagesTypeAdapter.dump_python(messages, mode="json"))
+        request = {
+            "model": model_name,
+            "messages": dumped,
+            "parameters": _parameters_adapter.dump_python(model_request_parameters, mode="json"),
+            "settings": dict(model_settings or {}),
+        }
+        return _sha256(request), _sha256([model_name, dumped[:1]])
+
+    def get(self, key: str) -> ModelResponse | None:
+        path = self.path(key)
+        if not path.exists():
+            return None
+        response = ModelMessagesTypeAdapter.validate_json(gzip.decompress(path.read_bytes()))[0]
+        assert isinstance(response, ModelResponse)
+        self.stats.replayed += 1
+        return response
+
+    def put(self, key: str, conversation: str, turn: int, model_name: str, response: ModelResponse) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(gzip.compress(ModelMessagesTypeAdapter.dump_json([response]), mtime=0))
+        tmp.replace(path)
+        line = {"key": key, "model": model_name, "conversation": conversation, "turn": turn}
+        fd = os.open(self.directory / "requests.jsonl", os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (json.dumps(line) + "\n").encode())
+        finally:
+            os.close(fd)
+        self.stats.recorded += 1
+
+    def _recorded_turns(self, conversation: str) -> int:
+        with self._lock:
+            if self._conversations is None:
+                self._conversations = {}
+                index = self.directory / "requests.jsonl"
+                for line in index.read_text().splitlines() if index.exists() else []:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    turns = self._conversations.get(entry["conversation"], 0)
+                    self._conversations[entry["conversation"]] = max(turns, entry["turn"])
+            return self._conversations.get(conversation, 0)
+
+    def miss(self, key: str, conversation: str, turn: int, model_name: str) -> CompletionMissError:
+        "Note a request with no recording; the error to raise for it."
+        recorded_turns = self._recorded_turns(conversation)
+        if recorded_turns:
+            reason = f"the conversation was recorded ({recorded_turns} turns) but turn {turn} differs"
+        else:
+            reason = "no recorded conversation starts with this prompt"
+        if key not in self.stats.missed_keys:
+            self.stats.missed_keys.add(key)
+            self.stats.drifted += bool(recorded_turns)
+            logger.warning(f"No recorded completion for {model_name} in {self.directory}: {reason}")
+            with (self.directory / "misses.jsonl").open("a") as f:
+                f.write(json.dumps({"key": key, "model": model_name, "turn": turn, "reason": reason}) + "\n")
+        return CompletionMissError(f"No recorded completion for {model_name}: {reason}")
+
+
+_stores: dict[tuple[str, CompletionsMode], CompletionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def completion_store(directory: str, mode: CompletionsMode) -> CompletionStore:
+    "The process-wide store of `directory` in `mode`, so its stats cover every run in the process."
+    with _stores_lock:
+        if (directory, mode) not in _stores:
+            path = Path(directory)
+            path.mkdir(parents=True, exist_ok=True)
+            logger.info(f"Model completions: {mode} {path}")
+            _stores[(directory, mode)] = CompletionStore(directory=path, mode=mode)
+        return _stores[(directory, mode)]
+
+
+def completion_summaries() -> list[str]:
+    with _stores_lock:
+        return [store.stats.summary(store) for store in _stores.values()]
+
+
+class RecordedModel(WrapperModel):
+    "Records the wrapped model's responses to `store`, or replays them from it."
+
+    def __init__(self, wrapped: Model | KnownModelName, store: CompletionStore, model_name: str):
+        super().__init__(wrapped)
+        self.store = store
+        self.recorded_model_name = model_name
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        key, conversation = self.store.request_key(
+            self.recorded_model_name, messages, model_settings, model_request_parameters
+        )
+        turn = sum(isinstance(m, ModelResponse) for m in messages) + 1
+        if self.store.mode == "replay":
+            if (response := self.store.get(key)) is None:
+                raise self.store.miss(key, conversation, turn, self.recorded_model_name)
+            return response
+        response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+        self.store.put(key, conversation, turn, self.recorded_model_name, response)
+        return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        async with self.wrapped.request_stream(messages, model_settings, model_request_parameters) as stream:
+            yield stream
+
+    def __repr__(self) -> str:
+        return f"RecordedModel({self.wrapped!r}, store={str(self.store.directory)!r}, mode={self.store.mode!r})"
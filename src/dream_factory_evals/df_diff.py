@@ -0,0 +1,261 @@
+"""Field-level diff of a result against its expected result, for partial credit on large output models.
+
+`structured_diff` walks both values in one pass:
+
+- pydantic models field by field, dicts key by key;
+- lists order-insensitively: items are matched by a hash of their exact fields (ids, names, dates, counts), and
+  the items left over are paired by the most exact fields in common; ties, such as items made only of free text,
+  go to the pairs whose free text is lexically closest;
+- floats within DIFF_REL_TOLERANCE or DIFF_ABS_TOLERANCE;
+- free-text fields through the strings similarity judge, all of a result's pairs at once, so they share batched
+  calls (and the lexical fast path) instead of one `are_strings_similar` round trip per `__eq__` step.
+
+Free-text fields are the ones the output types' `__eq__` methods hand to `are_strings_similar`: the expected result
+is compared with a copy of itself while the judge collects pairs, and the fields holding those strings are judged.
+
+Every node gets a score: a leaf 1 or 0, a model, dict or list the mean of its children, where a missing or
+unexpected list item or dict key is a child scoring 0.
+"""
+
+import asyncio
+import copy
+import math
+import os
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import BaseModel
+
+from dream_factory_evals.df_judge import Pair, collecting_pairs, normalize, pair_of, similarity_judge
+from dream_factory_evals.df_lexical import lexical_similarity
+
+DIFF_REL_TOLERANCE = float(os.getenv("DIFF_REL_TOLERANCE", "0.01"))
+DIFF_ABS_TOLERANCE = float(os.getenv("DIFF_ABS_TOLERANCE", "0.01"))
+MAX_REASON_FIELDS = 10
+"Mismatched fields listed in an evaluation reason."
+
+MISSING: Any = object()
+
+type Fingerprint = frozenset[tuple[str, Any]]
+"(generic path, value) of the exact leaves of a list item."
+
+
+@dataclass
+class FieldDiff:
+    path: str
+    expected: Any
+    output: Any
+    score: float | None = None
+    "Set on leaves; None on branches, and on free-text leaves until the judge answers."
+    reason: str = ""
+    children: list["FieldDiff"] = field(default_factory=list)
+
+    def total(self) -> float:
+        if not self.children:
+            return self.score if self.score is not None else 0.0
+        return sum(child.total() for child in self.children) / len(self.children)
+
+    def walk(self) -> Iterator["FieldDiff"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+@dataclass
+class StructuredDiff:
+    root: FieldDiff
+
+    @property
+    def score(self) -> float:
+        return self.root.total()
+
+    def scores(self) -> dict[str, float]:
+        "Score of every field, nested ones included, by path."
+        return {node.path or "result": node.total() for node in self.root.walk()}
+
+    def mismatches(self) -> list[FieldDiff]:
+        return [node for node in self.root.walk() if not node.children and node.total() < 1]
+
+    def summary(self) -> str:
+        mismatches = self.mismatches()
+        leaves = sum(not node.children for node in self.root.walk())
+        lines = [f"{leaves - len(mismatches)}/{leaves} fields match, score {self.score:.2f}"]
+        lines += [f"{node.path}: {node.reason}" for node in mismatches[:MAX_REASON_FIELDS]]
+        if len(mismatches) > MAX_REASON_FIELDS:
+            lines.append(f"... and {len(mismatches) - MAX_REASON_FIELDS} more")
+        return "\n".join(lines)
+
+
+def _short(value: Any) -> str:
+    text = "missing" if value is MISSING else repr(value)
+    return text if len(text) <= 60 else text[:57] + "..."
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, int | float) and not isinstance(value, bool)
+
+
+def free_text_values(expected: Any) -> dict[str, str]:
+    "Normalized strings of `expected` its `__eq__` methods judge -> judge model."
+    with collecting_pairs() as collected:
+        # a copy, so that lists compare their items with `__eq__` rather than by identity
+        _ = expected == copy.deepcopy(expected)
+    asked = [*collected.pending, *collected.cached, *collected.settled]
+    return {text: model for model, pair in asked for text in pair}
+
+
+def _children(value: Any, path: str) -> Iterator[tuple[str, Any]]:
+    "(generic path, value) of the direct children of a model, dict or list."
+    if isinstance(value, BaseModel):
+        for name in type(value).model_fields:
+            yield f"{path}.{name}".lstrip("."), getattr(value, name)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield f"{path}{{}}", item
+    elif isinstance(value, list | tuple):
+        for item in value:
+            yield f"{path}[]", item
+
+
+def free_text_paths(expected: Any, values: dict[str, str], path: str = "") -> dict[str, str]:
+    "Generic paths (list indices and dict keys dropped) of the free-text fields of `expected` -> judge model."
+    if isinstance(expected, str):
+        model = values.get(normalize(expected))
+        return {path: model} if model else {}
+    paths: dict[str, str] = {}
+    for child_path, child in _children(expected, path):
+        paths |= free_text_paths(child, values, child_path)
+    return paths
+
+
+@dataclass
+class _Walker:
+    free_text: dict[str, str]
+    pending: list[tuple[FieldDiff, str, Pair]] = field(default_factory=list)
+
+    def fingerprint(self, value: Any, path: str = "") -> Fingerprint:
+        if isinstance(value, BaseModel | dict | list | tuple):
+            prints = [self.fingerprint(child, child_path) for child_path, child in _children(value, path)]
+            return frozenset().union(*prints)
+        if isinstance(value, float) or path in self.free_text:
+            return frozenset()
+        return frozenset({(path, value)})
+
+    def text(self, value: Any, path: str = "") -> str:
+        "The free-text fields of `value`, joined."
+        if isinstance(value, str):
+            return value if path in self.free_text else ""
+        return " ".join(
+            filter(None, (self.text(child, child_path) for child_path, child in _children(value, path)))
+        )
+
+    def leaf(self, node: FieldDiff, same: bool, reason: str = "") -> FieldDiff:
+        node.score = float(same)
+        if not same:
+            node.reason = reason or f"expected {_short(node.expected)}, got {_short(node.output)}"
+        return node
+
+    def walk(self, path: str, generic: str, expected: Any, output: Any) -> FieldDiff:
+        node = FieldDiff(path=path, expected=expected, output=output)
+        if expected is MISSING or output is MISSING:
+            return self.leaf(node, False)
+        if isinstance(expected, BaseModel):
+            if not isinstance(output, type(expected)):
+                return self.leaf(node, False, f"expected a {type(expected).__name__}, got {_short(output)}")
+            for name in type(expected).model_fields:
+                node.children.append(
+                    self.walk(
+                        f"{path}.{name}".lstrip("."),
+                        f"{generic}.{name}".lstrip("."),
+                        getattr(expected, name),
+                        getattr(output, name),
+                    )
+                )
+        elif isinstance(expected, dict):
+            if not isinstance(output, dict):
+                return self.leaf(node, False)
+            for key in [*expected, *(key for key in output if key not in expected)]:
+                node.children.append(
+                    self.walk(
+                        f"{path}[{key!r}]", f"{generic}{{}}", expected.get(key, MISSING), output.get(key, MISSING)
+                    )
+                )
+        elif isinstance(expected, list | tuple):
+            if not isinstance(output, list | tuple):
+                return self.leaf(node, False)
+            node.children = self.match_items(path, generic, list(expected), list(output))
+        elif generic in self.free_text and isinstance(output, str):
+            pair = pair_of(expected, output)
+            if pair[0] == pair[1]:
+                return self.leaf(node, True)
+            self.pending.append((node, self.free_text[generic], pair))
+            return node
+        elif _is_number(expected) and _is_number(output) and float in (type(expected), type(output)):
+            same = math.isclose(expected, output, rel_tol=DIFF_REL_TOLERANCE, abs_tol=DIFF_ABS_TOLERANCE)
+            return self.leaf(node, same)
+        else:
+            return self.leaf(node, expected == output)
+        if not node.children:
+            return self.leaf(node, True)
+        return node
+
+    def match_items(self, path: str, generic: str, expected: list[Any], output: list[Any]) -> list[FieldDiff]:
+        "Diffs of matched items in expected order, then one per unexpected output item."
+        if all(_is_number(v) for v in expected + output):
+            # numbers pair best by rank; sorting keeps the tolerance meaningful where equal keys would not
+            expected, output = sorted(expected), sorted(output)
+        item_path = f"{generic}[]"
+        expected_prints = [self.fingerprint(item, item_path) for item in expected]
+        output_prints = [self.fingerprint(item, item_path) for item in output]
+        expected_texts = [self.text(item, item_path) for item in expected]
+        output_texts = [self.text(item, item_path) for item in output]
+
+        def text_similarity(i: int, j: int) -> float:
+            return lexical_similarity(expected_texts[i], output_texts[j]) if expected_texts[i] else 0.0
+
+        by_print: dict[Fingerprint, tuple[list[int], list[int]]] = defaultdict(lambda: ([], []))
+        for i, fingerprint in enumerate(expected_prints):
+            by_print[fingerprint][0].append(i)
+        for j, fingerprint in enumerate(output_prints):
+            by_print[fingerprint][1].append(j)
+        matches: dict[int, int] = {}
+        for same_print, candidates in by_print.values():
+            matches |= _assign(same_print, candidates, text_similarity)
+        unmatched = [i for i in range(len(expected)) if i not in matches]
+        left = sorted(set(range(len(output))) - set(matches.values()))
+        matches |= _assign(
+            unmatched, left, lambda i, j: (len(expected_prints[i] & output_prints[j]), text_similarity(i, j))
+        )
+        left = sorted(set(left) - set(matches.values()))
+        diffs = [
+            self.walk(f"{path}[{i}]", f"{generic}[]", item, output[matches[i]] if i in matches else MISSING)
+            for i, item in enumerate(expected)
+        ]
+        for j in left:
+            node = FieldDiff(path=f"{path}[+{j}]", expected=MISSING, output=output[j])
+            diffs.append(self.leaf(node, False, f"unexpected item {_short(output[j])}"))
+        return diffs
+
+
+def _assign(expected: list[int], output: list[int], score: Callable[[int, int], Any]) -> dict[int, int]:
+    "Pair expected with output indices greedily, highest score first; equal scores pair in list order."
+    scored = sorted(((score(i, j), i, j) for i in expected for j in output), key=lambda s: s[0], reverse=True)
+    matches: dict[int, int] = {}
+    taken: set[int] = set()
+    for _, i, j in scored:
+        if i not in matches and j not in taken:
+            matches[i] = j
+            taken.add(j)
+    return matches
+
+
+async def structured_diff(output: Any, expected: Any) -> StructuredDiff:
+    "Diff `output` against `expected`, judging every free-text field pair concurrently."
+    walker = _Walker(free_text=free_text_paths(expected, free_text_values(expected)))
+    root = walker.walk("", "", expected, output)
+    verdicts = await asyncio.gather(*(similarity_judge(model).verdict(pair) for _, model, pair in walker.pending))
+    for (node, _, _), same in zip(walker.pending, verdicts):
+        walker.leaf(node, same, "not similar to the expected text")
+    return StructuredDiff(root=root)
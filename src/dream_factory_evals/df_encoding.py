@@ -0,0 +1,94 @@
+"""Compact encodings for DreamFactory record payloads sent back to the model.
+
+`json` is DreamFactory's `{"resource": [{...}, ...]}` as-is, which repeats every column name in every row.
+`columnar` sends the column names once plus row arrays:
+
+    {"format": "columnar", "columns": ["employee_id", "hr_departments_by_department_id"], "rows": [[1, 0], [2, 0]],
+     "related": {"hr_departments_by_department_id": {"columns": ["department_id", "name"], "rows": [[1, "Sales"]]}}}
+
+Columns that are null in every row are dropped. Related objects are stored once per relation and rows refer to them
+by row number. `csv`/`tsv` write the same tables as delimited text, with each related table after a `# related` line
+and any `meta` (such as a truncated result's continuation token) on a final `# meta` line.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Literal
+
+type ResultEncoding = Literal["json", "columnar", "csv", "tsv"]
+
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+
+
+def _is_record_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(v, dict) for v in value)
+
+
+def encode_columnar(records: list[dict[str, Any]]) -> dict[str, Any]:
+    related: dict[str, list[dict[str, Any]]] = {}
+    row_numbers: dict[str, dict[str, int]] = {}
+
+    def ref(relation: str, record: dict[str, Any]) -> int:
+        key = json.dumps(record, sort_keys=True, default=str)
+        numbers = row_numbers.setdefault(relation, {})
+        if key not in numbers:
+            numbers[key] = len(numbers)
+            related.setdefault(relation, []).append(record)
+        return numbers[key]
+
+    columns = [
+        c for c in dict.fromkeys(k for r in records for k in r) if any(r.get(c) is not None for r in records)
+    ]
+    rows: list[list[Any]] = []
+    for record in records:
+        row: list[Any] = []
+        for column in columns:
+            value = record.get(column)
+            if isinstance(value, dict):
+                value = ref(column, value)
+            elif _is_record_list(value):
+                value = [ref(column, v) for v in value]
+            row.append(value)
+        rows.append(row)
+    table: dict[str, Any] = {"columns": columns, "rows": rows}
+    if related:
+        table["related"] = {relation: encode_columnar(objs) for relation, objs in related.items()}
+    return table
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, list | dict):
+        return json.dumps(value)
+    return value
+
+
+def _write_delimited(out: io.StringIO, table: dict[str, Any], delimiter: str, name: str = "") -> None:
+    if name:
+        out.write(f"\n# related {name} (referenced by row number, from 0)\n")
+    writer = csv.writer(out, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(table["columns"])
+    writer.writerows([_cell(v) for v in row] for row in table["rows"])
+    for relation, related_table in table.get("related", {}).items():
+        _write_delimited(out, related_table, delimiter, name=f"{name}.{relation}" if name else relation)
+
+
+def encode_delimited(records: list[dict[str, Any]], delimiter: str = ",") -> str:
+    out = io.StringIO()
+    _write_delimited(out, encode_columnar(records), delimiter)
+    return out.getvalue()
+
+
+def encode_result(payload: Any, encoding: ResultEncoding = "json") -> Any:
+    "Re-encode a `_table` response. Errors and anything without a `resource` list are returned unchanged."
+    if encoding == "json" or not isinstance(payload, dict) or not isinstance(payload.get("resource"), list):
+        return payload
+    if encoding == "columnar":
+        extra = {k: v for k, v in payload.items() if k != "resource"}
+        return {"format": "columnar", **encode_columnar(payload["resource"]), **extra}
+    text = encode_delimited(payload["resource"], delimiter=DELIMITERS[encoding])
+    if meta := payload.get("meta"):
+        text += f"\n# meta {json.dumps(meta)}\n"
+    return text
@@ -0,0 +1,691 @@
+"""DreamFactory filter strings: parser, typed AST and compilers.
+
+The grammar is the one documented on `df_mcp.get_table_records`:
+
+    expr       := or_expr
+    or_expr    := and_expr (OR and_expr)*
+    and_expr   := not_expr (AND not_expr)*
+    not_expr   := NOT not_expr | '(' expr ')' | comparison
+    comparison := field (= | EQ | != | NE | <> | > | GT | >= | GTE | < | LT | <= | LTE) value
+                | field [NOT] IN '(' value (',' value)* ')' | field NIN '(' ... ')'
+                | field [NOT] LIKE string | field CONTAINS string
+                | field STARTS WITH string | field ENDS WITH string
+                | field IS [NOT] NULL
+
+Keywords are case-insensitive. Equality is case-sensitive and LIKE is not, like SQLite.
+Comparisons against NULL are unknown, and unknown rows never match, like SQL.
+"""
+
+import re
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from enum import StrEnum
+from functools import lru_cache, reduce
+from typing import Any
+
+import pandas as pd
+import polars as pl
+
+PARSE_CACHE_SIZE = 4096
+
+type Scalar = str | int | float | bool | None
+type Record = Mapping[str, Any]
+
+
+class FilterSyntaxError(ValueError):
+    def __init__(self, filter: str, position: int, message: str):
+        super().__init__(f"{message} at position {position} in filter: {filter!r}")
+        self.filter = filter
+        self.position = position
+
+
+class CompareOp(StrEnum):
+    EQ = "="
+    NE = "!="
+    GT = ">"
+    GTE = ">="
+    LT = "<"
+    LTE = "<="
+
+
+@dataclass(frozen=True, slots=True)
+class Comparison:
+    field: str
+    op: CompareOp
+    value: Scalar
+
+
+@dataclass(frozen=True, slots=True)
+class In:
+    field: str
+    values: tuple[Scalar, ...]
+    negated: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class Like:
+    "LIKE, CONTAINS, STARTS WITH and ENDS WITH, all normalized to a `%`/`_` pattern."
+
+    field: str
+    pattern: str
+    negated: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class IsNull:
+    field: str
+    negated: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class And:
+    operands: tuple["Expr", ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Or:
+    operands: tuple["Expr", ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Not:
+    operand: "Expr"
+
+
+type Expr = Comparison | In | Like | IsNull | And | Or | Not
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+      | (?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+      | (?P<op><>|!=|>=|<=|=|>|<)
+      | (?P<punct>[(),])
+      | (?P<word>[A-Za-z_][\w.]*)
+    )
+    """,
+    re.VERBOSE,
+)
+
+_WORD_OPS = {"EQ": CompareOp.EQ, "NE": CompareOp.NE, "GT": CompareOp.GT, "GTE": CompareOp.GTE}
+_WORD_OPS |= {"LT": CompareOp.LT, "LTE": CompareOp.LTE}
+_SYMBOL_OPS = {"=": CompareOp.EQ, "!=": CompareOp.NE, "<>": CompareOp.NE, ">": CompareOp.GT}
+_SYMBOL_OPS |= {">=": CompareOp.GTE, "<": CompareOp.LT, "<=": CompareOp.LTE}
+_KEYWORDS = {"AND", "OR", "NOT", "IN", "NIN", "LIKE", "CONTAINS", "STARTS", "ENDS", "WITH", "IS", "NULL"}
+_KEYWORDS |= set(_WORD_OPS) | {"TRUE", "FALSE"}
+
+
+@dataclass(slots=True)
+class _Token:
+    kind: str
+    text: str
+    position: int
+
+    @property
+    def upper(self) -> str:
+        return self.text.upper()
+
+
+def _tokenize(filter: str) -> list[_Token]:
+    tokens: list[_Token] = []
+    position = 0
+    end = len(filter.rstrip())
+    while position < end:
+        m = _TOKEN.match(filter, position)
+        if m is None or m.lastgroup is None:
+            position += len(filter[position:]) - len(filter[position:].lstrip())
+            raise FilterSyntaxError(filter, position, f"Unexpected character {filter[position]!r}")
+        tokens.append(_Token(kind=m.lastgroup, text=m.group(m.lastgroup), position=m.start(m.lastgroup)))
+        position = m.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, filter: str):
+        self.filter = filter
+        self.tokens = _tokenize(filter)
+        self.i = 0
+
+    def error(self, message: str) -> FilterSyntaxError:
+        position = self.tokens[self.i].position if self.i < len(self.tokens) else len(self.filter)
+        return FilterSyntaxError(self.filter, position, message)
+
+    def peek(self, offset: int = 0) -> _Token | None:
+        i = self.i + offset
+        return self.tokens[i] if i < len(self.tokens) else None
+
+    def is_word(self, *words: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token is not None and token.kind == "word" and token.upper in words
+
+    def is_punct(self, char: str) -> bool:
+        token = self.peek()
+        return token is not None and token.kind == "punct" and token.text == char
+
+    def advance(self) -> _Token:
+        token = self.peek()
+        if token is None:
+            raise self.error("Unexpected end of filter")
+        self.i += 1
+        return token
+
+    def expect_punct(self, char: str) -> None:
+        if not self.is_punct(char):
+            raise self.error(f"Expected {char!r}")
+        self.i += 1
+
+    def expect_word(self, word: str) -> None:
+        if not self.is_word(word):
+            raise self.error(f"Expected {word}")
+        self.i += 1
+
+    def parse(self) -> Expr:
+        if not self.tokens:
+            raise self.error("Empty filter")
+        expr = self.or_expr()
+        if self.peek() is not None:
+            raise self.error(f"Unexpected {self.peek().text!r}")  # type: ignore[union-attr]
+        return expr
+
+    def or_expr(self) -> Expr:
+        operands = [self.and_expr()]
+        while self.is_word("OR"):
+            self.i += 1
+            operands.append(self.and_expr())
+        return operands[0] if len(operands) == 1 else Or(_flatten(Or, operands))
+
+    def and_expr(self) -> Expr:
+        operands = [self.not_expr()]
+        while self.is_word("AND"):
+            self.i += 1
+            operands.append(self.not_expr())
+        return operands[0] if len(operands) == 1 else And(_flatten(And, operands))
+
+    def not_expr(self) -> Expr:
+        if self.is_word("NOT"):
+            self.i += 1
+            return Not(self.not_expr())
+        if self.is_punct("("):
+            self.i += 1
+            expr = self.or_expr()
+            self.expect_punct(")")
+            return expr
+        return self.comparison()
+
+    def field(self) -> str:
+        token = self.advance()
+        if token.kind == "word" and token.upper not in _KEYWORDS:
+            return token.text
+        if token.kind == "string" and token.text[0] == '"':
+            return _unquote(token.text)
+        self.i -= 1
+        raise self.error(f"Expected a field name, got {token.text!r}")
+
+    def value(self) -> Scalar:
+        token = self.advance()
+        if token.kind == "string":
+            return _unquote(token.text)
+        if token.kind == "number":
+            return float(token.text) if "." in token.text else int(token.text)
+        if token.kind == "word" and token.upper in ("TRUE", "FALSE"):
+            return token.upper == "TRUE"
+        if token.kind == "word" and token.upper == "NULL":
+            return None
+        self.i -= 1
+        raise self.error(f"Expected a value, got {token.text!r}")
+
+    def string(self) -> str:
+        value = self.value()
+        if not isinstance(value, str):
+            self.i -= 1
+            raise self.error("Expected a quoted string")
+        return value
+
+    def values(self) -> tuple[Scalar, ...]:
+        self.expect_punct("(")
+        values = [self.value()]
+        while self.is_punct(","):
+            self.i += 1
+            values.append(self.value())
+        self.expect_punct(")")
+        return tuple(values)
+
+    def comparison(self) -> Expr:
+        field = self.field()
+        token = self.peek()
+        if token is None:
+            raise self.error(f"Expected an operator after {field!r}")
+        if token.kind == "op":
+            self.i += 1
+            return _compare(field, _SYMBOL_OPS[token.text], self.value())
+        if token.kind != "word":
+            raise self.error(f"Expected an operator, got {token.text!r}")
+        word = token.upper
+        self.i += 1
+        if word in _WORD_OPS:
+            return _compare(field, _WORD_OPS[word], self.value())
+        if word == "IN":
+            return In(field, self.values())
+        if word == "NIN":
+            return In(field, self.values(), negated=True)
+        if word == "LIKE":
+            return Like(field, self.string())
+        if word == "CONTAINS":
+            return Like(field, f"%{self.string()}%")
+        if word == "STARTS":
+            self.expect_word("WITH")
+            return Like(field, f"{self.string()}%")
+        if word == "ENDS":
+            self.expect_word("WITH")
+            return Like(field, f"%{self.string()}")
+        if word == "IS":
+            negated = self.is_word("NOT")
+            self.i += negated
+            self.expect_word("NULL")
+            return IsNull(field, negated=negated)
+        if word == "NOT" and self.is_word("IN"):
+            self.i += 1
+            return In(field, self.values(), negated=True)
+        if word == "NOT" and self.is_word("LIKE"):
+            self.i += 1
+            return Like(field, self.string(), negated=True)
+        self.i -= 1
+        raise self.error(f"Unknown operator {token.text!r}")
+
+
+def _unquote(text: str) -> str:
+    quote = text[0]
+    return text[1:-1].replace(quote * 2, quote)
+
+
+def _compare(field: str, op: CompareOp, value: Scalar) -> Expr:
+    # DreamFactory accepts `field = null` for IS NULL
+    if value is None and op in (CompareOp.EQ, CompareOp.NE):
+        return IsNull(field, negated=op == CompareOp.NE)
+    return Comparison(field, op, value)
+
+
+def _flatten(kind: type[And] | type[Or], operands: list[Expr]) -> tuple[Expr, ...]:
+    flat: list[Expr] = []
+    for operand in operands:
+        flat.extend(operand.operands if isinstance(operand, kind) else (operand,))
+    return tuple(flat)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_filter(filter: str) -> Expr:
+    "Parse a DreamFactory filter string. Results are cached by string."
+    return _Parser(filter).parse()
+
+
+def fields_in(expr: Expr) -> set[str]:
+    match expr:
+        case And(operands) | Or(operands):
+            return set().union(*(fields_in(o) for o in operands))
+        case Not(operand):
+            return fields_in(operand)
+        case _:
+            return {expr.field}
+
+
+# ---------------------------------------------------------------------------
+# Canonical rendering
+# ---------------------------------------------------------------------------
+
+
+def _render_value(value: Scalar) -> str:
+    match value:
+        case None:
+            return "NULL"
+        case bool():
+            return "TRUE" if value else "FALSE"
+        case str():
+            return "'" + value.replace("'", "''") + "'"
+        case float() if value.is_integer():
+            return str(int(value))
+        case _:
+            return str(value)
+
+
+def render(expr: Expr) -> str:
+    "Canonical filter string: symbol operators, sorted AND/OR operands, every clause parenthesised."
+    match expr:
+        case Comparison(field, op, value):
+            return f"({field} {op} {_render_value(value)})"
+        case In(field, values, negated):
+            rendered = ", ".join(sorted(_render_value(v) for v in values))
+            return f"({field} {'NOT IN' if negated else 'IN'} ({rendered}))"
+        case Like(field, pattern, negated):
+            return f"({field} {'NOT LIKE' if negated else 'LIKE'} {_render_value(pattern)})"
+        case IsNull(field, negated):
+            return f"({field} IS {'NOT NULL' if negated else 'NULL'})"
+        case And(operands):
+            return "(" + " AND ".join(sorted(render(o) for o in operands)) + ")"
+        case Or(operands):
+            return "(" + " OR ".join(sorted(render(o) for o in operands)) + ")"
+        case Not(operand):
+            return f"(NOT {render(operand)})"
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def canonical_filter(filter: str) -> str:
+    "Equivalent filters that only differ in spelling, operand order or parentheses map to the same string."
+    return render(parse_filter(filter)) if filter.strip() else ""
+
+
+def canonical_filter_or_raw(filter: str) -> str:
+    "`canonical_filter`, or the stripped filter if it doesn't parse (DreamFactory will report the error)."
+    try:
+        return canonical_filter(filter)
+    except FilterSyntaxError:
+        return filter.strip()
+
+
+# ---------------------------------------------------------------------------
+# SQL
+# ---------------------------------------------------------------------------
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][\w]*$")
+
+
+def _quote_identifier(field: str) -> str:
+    if not _IDENTIFIER.match(field):
+        raise ValueError(f"Invalid field name: {field!r}")
+    return f'"{field}"'
+
+
+def to_sql(expr: Expr) -> tuple[str, list[Scalar]]:
+    "Parameterized WHERE clause (`?` placeholders) and its parameters."
+    params: list[Scalar] = []
+
+    def compile_(e: Expr) -> str:
+        match e:
+            case Comparison(field, op, value):
+                params.append(value)
+                return f"{_quote_identifier(field)} {op} ?"
+            case In(field, values, negated):
+                params.extend(values)
+                placeholders = ", ".join("?" for _ in values)
+                return f"{_quote_identifier(field)} {'NOT IN' if negated else 'IN'} ({placeholders})"
+            case Like(field, pattern, negated):
+                params.append(pattern)
+                return f"{_quote_identifier(field)} {'NOT LIKE' if negated else 'LIKE'} ?"
+            case IsNull(field, negated):
+                return f"{_quote_identifier(field)} IS {'NOT NULL' if negated else 'NULL'}"
+            case And(operands):
+                return "(" + " AND ".join(compile_(o) for o in operands) + ")"
+            case Or(operands):
+                return "(" + " OR ".join(compile_(o) for o in operands) + ")"
+            case Not(operand):
+                return f"(NOT {compile_(operand)})"
+
+    return compile_(expr), params
+
+
+# ---------------------------------------------------------------------------
+# Python predicates (three-valued, like SQL)
+# ---------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def like_regex(pattern: str) -> re.Pattern[str]:
+    body = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+    return re.compile(f"^{body}$", re.IGNORECASE | re.DOTALL)
+
+
+def coerce(value: Scalar, like: Any) -> Any:
+    "Coerce a filter literal to the type of the record value it's compared with, the way SQL affinity does."
+    if value is None or like is None:
+        return value
+    try:
+        if isinstance(like, bool):
+            if isinstance(value, str):
+                return value.strip().lower() in ("true", "1")
+            return bool(value)
+        if isinstance(like, int | float) and isinstance(value, str):
+            return float(value) if not value.strip().lstrip("-").isdigit() else int(value)
+    except ValueError:
+        return value
+    if isinstance(like, str) and not isinstance(value, str):
+        return _render_value(value).strip("'")
+    return value
+
+
+_PY_OPS: dict[CompareOp, Callable[[Any, Any], bool]] = {
+    CompareOp.EQ: lambda a, b: a == b,
+    CompareOp.NE: lambda a, b: a != b,
+    CompareOp.GT: lambda a, b: a > b,
+    CompareOp.GTE: lambda a, b: a >= b,
+    CompareOp.LT: lambda a, b: a < b,
+    CompareOp.LTE: lambda a, b: a <= b,
+}
+
+type Predicate3 = Callable[[Record], bool | None]
+
+
+def _predicate3(expr: Expr) -> Predicate3:
+    match expr:
+        case Comparison(field, op, value):
+            compare = _PY_OPS[op]
+
+            def comparison(record: Record) -> bool | None:
+                actual = record.get(field)
+                if actual is None:
+                    return None
+                try:
+                    return compare(actual, coerce(value, actual))
+                except TypeError:
+                    return None
+
+            return comparison
+        case In(field, values, negated):
+
+            def in_(record: Record) -> bool | None:
+                actual = record.get(field)
+                if actual is None:
+                    return None
+                return (actual in {coerce(v, actual) for v in values}) != negated
+
+            return in_
+        case Like(field, pattern, negated):
+            regex = like_regex(pattern)
+
+            def like(record: Record) -> bool | None:
+                actual = record.get(field)
+                if actual is None:
+                    return None
+                text = actual if isinstance(actual, str) else coerce(actual, "")
+                return (regex.match(text) is not None) != negated
+
+            return like
+        case IsNull(field, negated):
+            return lambda record: (record.get(field) is None) != negated
+        case And(operands):
+            preds = [_predicate3(o) for o in operands]
+
+            def and_(record: Record) -> bool | None:
+                unknown = False
+                for pred in preds:
+                    result = pred(record)
+                    if result is False:
+                        return False
+                    unknown |= result is None
+                return None if unknown else True
+
+            return and_
+        case Or(operands):
+            preds = [_predicate3(o) for o in operands]
+
+            def or_(record: Record) -> bool | None:
+                unknown = False
+                for pred in preds:
+                    result = pred(record)
+                    if result is True:
+                        return True
+                    unknown |= result is None
+                return None if unknown else False
+
+            return or_
+        case Not(operand):
+            pred = _predicate3(operand)
+
+            def not_(record: Record) -> bool | None:
+                result = pred(record)
+                return None if result is None else not result
+
+            return not_
+
+
+def to_predicate(expr: Expr) -> Callable[[Record], bool]:
+    "A record -> bool predicate. Rows whose result is unknown (NULL) don't match."
+    pred = _predicate3(expr)
+    return lambda record: pred(record) is True
+
+
+# compiled objects are cached by filter string: AST nodes holding 1 and True compare equal
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def filter_predicate(filter: str) -> Callable[[Record], bool]:
+    return to_predicate(parse_filter(filter))
+
+
+def filter_records(records: list[dict[str, Any]], filter: str) -> list[dict[str, Any]]:
+    if not filter.strip():
+        return records
+    predicate = filter_predicate(filter)
+    return [r for r in records if predicate(r)]
+
+
+# ---------------------------------------------------------------------------
+# polars
+# ---------------------------------------------------------------------------
+
+
+def _polars_literal(value: Scalar, dtype: pl.DataType | None) -> Any:
+    if dtype is None or value is None:
+        return value
+    if dtype == pl.Boolean:
+        return coerce(value, True)
+    if dtype.is_numeric():
+        return coerce(value, 0)
+    if dtype == pl.String:
+        return coerce(value, "")
+    return value
+
+
+def to_polars(expr: Expr, schema: Mapping[str, pl.DataType] | None = None) -> pl.Expr:
+    "Vectorized polars expression. Pass the frame's schema to coerce literals to the column types."
+    schema = schema or {}
+    match expr:
+        case Comparison(field, op, value):
+            col, lit = pl.col(field), _polars_literal(value, schema.get(field))
+            match op:
+                case CompareOp.EQ:
+                    return col == lit
+                case CompareOp.NE:
+                    return col != lit
+                case CompareOp.GT:
+                    return col > lit
+                case CompareOp.GTE:
+                    return col >= lit
+                case CompareOp.LT:
+                    return col < lit
+                case CompareOp.LTE:
+                    return col <= lit
+        case In(field, values, negated):
+            lits = [_polars_literal(v, schema.get(field)) for v in values]
+            result = pl.col(field).is_in(lits)
+            # keep NULL rows unknown instead of "not in"
+            result = pl.when(pl.col(field).is_null()).then(None).otherwise(result)
+            return ~result if negated else result
+        case Like(field, pattern, negated):
+            result = pl.col(field).cast(pl.String).str.contains("(?is)" + like_regex(pattern).pattern)
+            return ~result if negated else result
+        case IsNull(field, negated):
+            return pl.col(field).is_not_null() if negated else pl.col(field).is_null()
+        case And(operands):
+            return reduce(lambda a, b: a & b, (to_polars(o, schema) for o in operands))
+        case Or(operands):
+            return reduce(lambda a, b: a | b, (to_polars(o, schema) for o in operands))
+        case Not(operand):
+            return ~to_polars(operand, schema)
+
+
+def filter_polars(df: pl.DataFrame, filter: str) -> pl.DataFrame:
+    if not filter.strip():
+        return df
+    return df.filter(to_polars(parse_filter(filter), df.schema))
+
+
+# ---------------------------------------------------------------------------
+# pandas
+# ---------------------------------------------------------------------------
+
+
+def _pandas_literal(value: Scalar, series: pd.Series) -> Any:
+    if pd.api.types.is_bool_dtype(series):
+        return coerce(value, True)
+    if pd.api.types.is_numeric_dtype(series):
+        return coerce(value, 0)
+    sample = series.dropna()
+    return coerce(value, sample.iloc[0]) if len(sample) else value
+
+
+def _pandas_mask3(expr: Expr, df: pd.DataFrame) -> pd.Series:
+    "Nullable-boolean mask, so NOT/AND/OR follow SQL's three-valued logic."
+    match expr:
+        case Comparison(field, op, value):
+            series = df[field]
+            result = _PANDAS_OPS[op](series, _pandas_literal(value, series))
+            return result.astype("boolean").mask(series.isna())
+        case In(field, values, negated):
+            series = df[field]
+            result = (
+                series.isin([_pandas_literal(v, series) for v in values]).astype("boolean").mask(series.isna())
+            )
+            return ~result if negated else result
+        case Like(field, pattern, negated):
+            series = df[field]
+            result = series.astype("string").str.match(like_regex(pattern)).astype("boolean").mask(series.isna())
+            return ~result if negated else result
+        case IsNull(field, negated):
+            return (df[field].notna() if negated else df[field].isna()).astype("boolean")
+        case And(operands):
+            return reduce(lambda a, b: a & b, (_pandas_mask3(o, df) for o in operands))
+        case Or(operands):
+            return reduce(lambda a, b: a | b, (_pandas_mask3(o, df) for o in operands))
+        case Not(operand):
+            return ~_pandas_mask3(operand, df)
+
+
+_PANDAS_OPS: dict[CompareOp, Callable[[pd.Series, Any], pd.Series]] = {
+    CompareOp.EQ: lambda s, v: s == v,
+    CompareOp.NE: lambda s, v: s != v,
+    CompareOp.GT: lambda s, v: s > v,
+    CompareOp.GTE: lambda s, v: s >= v,
+    CompareOp.LT: lambda s, v: s < v,
+    CompareOp.LTE: lambda s, v: s <= v,
+}
+
+
+def to_pandas_mask(expr: Expr, df: pd.DataFrame) -> pd.Series:
+    "Vectorized boolean mask over `df`; unknown (NULL) rows are False."
+    return _pandas_mask3(expr, df).fillna(False).astype(bool)
+
+
+def filter_pandas(df: pd.DataFrame, filter: str) -> pd.DataFrame:
+    if not filter.strip():
+        return df
+    return df[to_pandas_mask(parse_filter(filter), df)]
+
+
+def is_valid_filter(filter: str) -> bool:
+    try:
+        parse_filter(filter)
+    except FilterSyntaxError:
+        return False
+    return True
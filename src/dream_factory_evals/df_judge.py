@@ -0,0 +1,400 @@
+"""LLM judge for free-text fields: one agent per model, a persistent verdict cache and batched async calls.
+
+The output types' `__eq__` methods call `are_strings_similar` synchronously. `judged_equal` runs such an `==` in two
+passes: the first collects every string pair the comparison needs (each uncached pair counts as similar, so the
+comparison goes on to the later fields), then the uncached pairs are judged, and the second pass answers from the
+cache. Pairs pending at the same time, across all the cases of a run, are sent to the model together in one
+structured call of up to JUDGE_BATCH_SIZE pairs. Every judge call runs on one dedicated event loop thread, so
+the agents' HTTP clients never serve two loops.
+
+Verdicts are cached in memory and appended to STRINGS_SIMILARITY_CACHE, keyed by the sha256 of the model and the two
+normalized strings (in sorted order: the question is symmetric).
+
+Before a pair goes to the model, the local lexical scorer (`df_lexical`) settles it when its score is at least
+JUDGE_LEXICAL_ACCEPT or, if enabled, at most JUDGE_LEXICAL_REJECT. A JUDGE_AUDIT_RATE fraction of those pairs is
+judged by the model anyway, and the model's verdict is used; together with cached verdicts the scorer would have
+settled, they measure how often the fast path agrees with the model.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+from loguru import logger
+from pydantic import BaseModel
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError, UnexpectedModelBehavior
+
+from dream_factory_evals.df_lexical import lexical_verdict
+
+STRINGS_SIMILARITY_CACHE = Path(os.getenv("STRINGS_SIMILARITY_CACHE", "cache/strings_similarity.jsonl"))
+JUDGE_BATCH_SIZE = int(os.getenv("JUDGE_BATCH_SIZE", "20"))
+JUDGE_BATCH_WINDOW = float(os.getenv("JUDGE_BATCH_WINDOW", "0.05"))
+"Seconds a pending pair waits for others to share its call."
+JUDGE_LEXICAL_ACCEPT = float(os.getenv("JUDGE_LEXICAL_ACCEPT", "0.85"))
+JUDGE_LEXICAL_REJECT = float(os.getenv("JUDGE_LEXICAL_REJECT", "-1"))
+"Off (below 0) by default: paraphrases may share no words. Set ACCEPT above 1 to send every pair to the model."
+JUDGE_AUDIT_RATE = float(os.getenv("JUDGE_AUDIT_RATE", "0.05"))
+"Fraction of the lexically settled pairs also judged by the model, to measure agreement."
+MAX_PASSES = 5
+
+JUDGE_INSTRUCTIONS = (
+    "For each numbered pair of strings, decide whether they say the same thing. "
+    "The wording/structure/grammar may be different. Answer with one verdict per pair id."
+)
+
+
+class PairVerdict(BaseModel):
+    id: int
+    same: bool
+
+
+class PairVerdicts(BaseModel):
+    verdicts: list[PairVerdict]
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+type Pair = tuple[str, str]
+"Normalized, sorted."
+
+
+def pair_of(str1: str, str2: str) -> Pair:
+    a, b = sorted((normalize(str1), normalize(str2)))
+    return a, b
+
+
+@dataclass
+class JudgeStats:
+    cached: int = 0
+    judged: int = 0
+    calls: int = 0
+    fast_accepted: int = 0
+    fast_rejected: int = 0
+    audited: int = 0
+    "Lexically settled pairs that were judged anyway; also in `judged`."
+    compared: int = 0
+    agreed: int = 0
+
+    def settled(self, verdict: bool) -> None:
+        if verdict:
+            self.fast_accepted += 1
+        else:
+            self.fast_rejected += 1
+
+    def compare(self, fast: bool, judged: bool) -> None:
+        self.compared += 1
+        self.agreed += fast == judged
+
+    def summary(self, model: str) -> str:
+        fast = self.fast_accepted + self.fast_rejected
+        needed = fast + self.judged - self.audited
+        hit_rate = f"{fast / needed:.0%}" if needed else "n/a"
+        agreement = f"{self.agreed / self.compared:.0%}" if self.compared else "n/a"
+        return (
+            f"Strings similarity judge {model}: {self.judged} pairs judged in {self.calls} calls, "
+            f"{self.cached} answered from the cache; the lexical fast path settled {fast} of {needed} pairs "
+            f"({hit_rate}: {self.fast_accepted} accepted, {self.fast_rejected} rejected) and agreed with the "
+            f"model on {self.agreed} of {self.compared} pairs both decided ({agreement})"
+        )
+
+
+@dataclass
+class _Batch:
+    "Pairs waiting for a judge call on one event loop."
+
+    pending: dict[Pair, asyncio.Future[bool]] = field(default_factory=dict)
+    flush: asyncio.TimerHandle | None = None
+
+
+@dataclass
+class SimilarityJudge:
+    model: str
+    cache_path: Path = STRINGS_SIMILARITY_CACHE
+    stats: JudgeStats = field(default_factory=JudgeStats)
+    _agent: Agent[None, PairVerdicts] | None = None
+    _verdicts: dict[str, bool] | None = None
+    _batches: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Batch] = field(
+        default_factory=weakref.WeakKeyDictionary
+    )
+    _tasks: set[asyncio.Task[None]] = field(default_factory=set)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def agent(self) -> Agent[None, PairVerdicts]:
+        if self._agent is None:
+            self._agent = Agent(
+                model=self.model,
+                name="strings_similarity_agent",
+                output_type=PairVerdicts,
+                instructions=JUDGE_INSTRUCTIONS,
+            )
+        return self._agent
+
+    def key(self, pair: Pair) -> str:
+        return hashlib.sha256(json.dumps([self.model, *pair]).encode()).hexdigest()
+
+    def _load(self) -> dict[str, bool]:
+        if self._verdicts is None:
+            self._verdicts = {}
+            if self.cache_path.exists():
+                for line in self.cache_path.read_text().splitlines():
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._verdicts[entry["key"]] = entry["same"]
+        return self._verdicts
+
+    def cached(self, pair: Pair) -> bool | None:
+        if pair[0] == pair[1]:
+            return True
+        with self._lock:
+            return self._load().get(self.key(pair))
+
+    def fast(self, pair: Pair) -> bool | None:
+        "The lexical verdict; None for pairs it leaves to the model, and for identical ones, which need neither."
+        if pair[0] == pair[1]:
+            return None
+        return lexical_verdict(*pair, accept=JUDGE_LEXICAL_ACCEPT, reject=JUDGE_LEXICAL_REJECT)
+
+    def audit(self, pair: Pair) -> bool:
+        "Whether a lexically settled pair is judged anyway; a hash of the pair, so reruns audit the same pairs."
+        return int(self.key(pair)[:8], 16) < JUDGE_AUDIT_RATE * 0x1_0000_0000
+
+    def compare(self, pair: Pair, fast: bool, judged: bool) -> None:
+        self.stats.compare(fast, judged)
+        if fast != judged:
+            logger.debug(f"Lexical fast path said {fast}, {self.model} said {judged}: {pair}")
+
+    def _store(self, verdicts: dict[Pair, bool]) -> None:
+        # the strings are kept so benchmarks/judge_agreement.py can replay the fast path against the verdicts
+        lines = "".join(
+            json.dumps({"key": self.key(p), "same": same, "model": self.model, "pair": p}) + "\n"
+            for p, same in verdicts.items()
+        )
+        with self._lock:
+            self._load().update({self.key(p): same for p, same in verdicts.items()})
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.cache_path.open("a") as f:
+                f.write(lines)
+
+    def _prompt(self, pairs: list[Pair]) -> str:
+        return "\n\n".join(f"Pair {i}:\nString 1: {a}\nString 2: {b}" for i, (a, b) in enumerate(pairs, start=1))
+
+    def _verdicts_of(self, pairs: list[Pair], output: PairVerdicts) -> dict[Pair, bool]:
+        by_id = {v.id: v.same for v in output.verdicts}
+        if missing := [i for i in range(1, len(pairs) + 1) if i not in by_id]:
+            raise ValueError(f"The judge gave no verdict for pairs {missing}")
+        return {pair: by_id[i] for i, pair in enumerate(pairs, start=1)}
+
+    def call(self, pairs: list[Pair]) -> concurrent.futures.Future[dict[Pair, bool]]:
+        "`judge_now(pairs)` on the judge loop, from any thread or loop."
+        return asyncio.run_coroutine_threadsafe(self.judge_now(pairs), judge_loop())
+
+    async def judge_now(self, pairs: list[Pair]) -> dict[Pair, bool]:
+        "One judge call for `pairs`, bypassing the batcher; runs on the judge loop (see `call`)."
+        self.stats.calls += 1
+        output = (await self.agent.run(self._prompt(pairs))).output
+        verdicts = self._verdicts_of(pairs, output)
+        self.stats.judged += len(pairs)
+        self._store(verdicts)
+        return verdicts
+
+    async def _flush(self, pending: dict[Pair, asyncio.Future[bool]]) -> None:
+        pairs = list(pending)
+        try:
+            for start in range(0, len(pairs), JUDGE_BATCH_SIZE):
+                chunk = pairs[start : start + JUDGE_BATCH_SIZE]
+                try:
+                    verdicts = await asyncio.wrap_future(self.call(chunk))
+                except (ModelHTTPError, UnexpectedModelBehavior, httpx.HTTPError, ValueError) as e:
+                    for pair in chunk:
+                        pending[pair].set_exception(e)
+                    continue
+                for pair in chunk:
+                    pending[pair].set_result(verdicts[pair])
+        finally:
+            # anything else escapes the task; the comparisons waiting on these pairs must not hang
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("The strings similarity judge call failed"))
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop, batch: _Batch) -> None:
+        if batch.flush is not None:
+            batch.flush.cancel()
+        pending, batch.pending, batch.flush = batch.pending, {}, None
+        task = loop.create_task(self._flush(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def similar(self, pair: Pair) -> bool:
+        "Verdict for `pair`, sharing a judge call with the other pairs pending on this loop."
+        if (verdict := self.cached(pair)) is not None:
+            self.stats.cached += 1
+            return verdict
+        loop = asyncio.get_running_loop()
+        batch = self._batches.setdefault(loop, _Batch())
+        if (future := batch.pending.get(pair)) is None:
+            future = batch.pending[pair] = loop.create_future()
+            if len(batch.pending) >= JUDGE_BATCH_SIZE:
+                self._schedule_flush(loop, batch)
+            elif batch.flush is None:
+                batch.flush = loop.call_later(JUDGE_BATCH_WINDOW, self._schedule_flush, loop, batch)
+        return await asyncio.shield(future)
+
+    def settle(self, pair: Pair) -> tuple[bool | None, bool | None]:
+        "(verdict, lexical verdict): the verdict is None when the pair needs the model; counted in the stats."
+        fast = self.fast(pair)
+        if (verdict := self.cached(pair)) is not None:
+            self.stats.cached += 1
+            if fast is not None:
+                self.compare(pair, fast, verdict)
+            return verdict, fast
+        if fast is not None:
+            self.stats.settled(fast)
+            if not self.audit(pair):
+                return fast, fast
+            self.stats.audited += 1
+        return None, fast
+
+    async def verdict(self, pair: Pair) -> bool:
+        "For one pair outside an `==`: the cache, the lexical fast path, then a batched judge call."
+        verdict, fast = self.settle(pair)
+        if verdict is None:
+            verdict = await self.similar(pair)
+            if fast is not None:
+                self.compare(pair, fast, verdict)
+        return verdict
+
+    def similar_sync(self, pair: Pair) -> bool:
+        "For callers outside `judged_equal`; blocks until the verdict is in."
+        verdict, fast = self.settle(pair)
+        if verdict is not None:
+            return verdict
+        # blocks this thread (and its loop, if called from a coroutine) while the judge loop makes the call
+        verdict = self.call([pair]).result()[pair]
+        if fast is not None:
+            self.compare(pair, fast, verdict)
+        return verdict
+
+
+_judge_loop: asyncio.AbstractEventLoop | None = None
+_judge_loop_lock = threading.Lock()
+
+
+def judge_loop() -> asyncio.AbstractEventLoop:
+    "The event loop of every judge call, in its own thread, so the agents' HTTP clients are bound to one loop."
+    global _judge_loop
+    with _judge_loop_lock:
+        if _judge_loop is None:
+            _judge_loop = asyncio.new_event_loop()
+            threading.Thread(target=_judge_loop.run_forever, name="strings-similarity-judge", daemon=True).start()
+        return _judge_loop
+
+
+_judges: dict[str, SimilarityJudge] = {}
+_judges_lock = threading.Lock()
+
+
+def similarity_judge(model: str) -> SimilarityJudge:
+    "The process-wide judge of `model`."
+    with _judges_lock:
+        if model not in _judges:
+            _judges[model] = SimilarityJudge(model=model)
+        return _judges[model]
+
+
+def judge_summaries() -> list[str]:
+    with _judges_lock:
+        return [
+            judge.stats.summary(model)
+            for model, judge in _judges.items()
+            if judge.stats.calls or judge.stats.cached or judge.stats.fast_accepted or judge.stats.fast_rejected
+        ]
+
+
+@dataclass
+class CollectedPairs:
+    pending: dict[tuple[str, Pair], None] = field(default_factory=dict)
+    "(model, pair) for the model to judge, in the order the comparison asked."
+    cached: dict[tuple[str, Pair], bool | None] = field(default_factory=dict)
+    "(model, pair) with a cached verdict -> the lexical verdict."
+    settled: dict[tuple[str, Pair], bool] = field(default_factory=dict)
+    "(model, pair) settled by the lexical fast path, audited ones included."
+    audited: set[tuple[str, Pair]] = field(default_factory=set)
+
+
+_collecting: ContextVar[CollectedPairs | None] = ContextVar("judge_collecting", default=None)
+
+
+@contextmanager
+def collecting_pairs() -> Iterator[CollectedPairs]:
+    "While active, pairs for the model are collected and count as similar instead of being judged."
+    collected = CollectedPairs()
+    token = _collecting.set(collected)
+    try:
+        yield collected
+    finally:
+        _collecting.reset(token)
+
+
+def are_strings_similar(str1: str, str2: str, model: str) -> bool:
+    judge = similarity_judge(model)
+    pair = pair_of(str1, str2)
+    if (collected := _collecting.get()) is None:
+        return judge.similar_sync(pair)
+    fast = judge.fast(pair)
+    if (verdict := judge.cached(pair)) is not None:
+        collected.cached[(model, pair)] = fast
+        return verdict
+    if fast is not None:
+        collected.settled[(model, pair)] = fast
+        if not judge.audit(pair):
+            return fast
+        collected.audited.add((model, pair))
+    collected.pending[(model, pair)] = None
+    return True
+
+
+async def judged_equal(output: Any, expected: Any) -> bool:
+    "`output == expected` with every string pair its `__eq__` methods ask about judged concurrently and batched."
+    for attempt in range(MAX_PASSES):
+        with collecting_pairs() as collected:
+            equal = output == expected
+        if attempt == 0:
+            for (model, pair), fast in collected.cached.items():
+                judge = similarity_judge(model)
+                judge.stats.cached += 1
+                if fast is not None:
+                    judge.compare(pair, fast, judge.cached(pair))  # type: ignore[arg-type]
+            for (model, _), fast in collected.settled.items():
+                similarity_judge(model).stats.settled(fast)
+            for model, _ in collected.audited:
+                similarity_judge(model).stats.audited += 1
+        if not collected.pending:
+            return equal
+        pending = list(collected.pending)
+        verdicts = await asyncio.gather(*(similarity_judge(model).similar(pair) for model, pair in pending))
+        if attempt == 0:
+            for (model, pair), verdict in zip(pending, verdicts):
+                if (model, pair) in collected.audited:
+                    similarity_judge(model).compare(pair, collected.settled[(model, pair)], verdict)
+    # every pass found new pairs, which takes an `__eq__` that isn't monotonic in its string verdicts
+    logger.warning("Strings similarity pairs kept changing between passes; comparing with blocking judge calls")
+    return output == expected
@@ -0,0 +1,95 @@
+"""Local lexical similarity for free-text fields, to settle clear matches and mismatches without the LLM judge.
+
+The score is the mean of the word-token set overlap (Jaccard, without stopwords) and the cosine of character
+trigram counts: the first ignores word order, the second tolerates inflections and typos. A pair scoring at least
+the accept threshold is a match, at most the reject threshold a mismatch, and anything in between is left to the
+judge.
+
+A high score alone never accepts: one word can flip a long text ("should not prioritize", "reduce" for "improve",
+"newer" for "older"). A pair is accepted only when both strings have the same content words (stopwords aside), so
+no negation, antonym or different number can hide in them; word order, case, punctuation and stopwords may differ.
+"""
+
+import math
+import re
+from collections import Counter
+
+STOPWORDS = frozenset(
+    {
+        "a",
+        "an",
+        "and",
+        "are",
+        "as",
+        "at",
+        "be",
+        "by",
+        "for",
+        "from",
+        "has",
+        "have",
+        "in",
+        "is",
+        "it",
+        "its",
+        "of",
+        "on",
+        "or",
+        "that",
+        "the",
+        "their",
+        "this",
+        "to",
+        "was",
+        "were",
+        "which",
+        "with",
+    }
+)
+NEGATIONS = frozenset({"no", "not", "never", "none", "nor", "neither", "nothing", "without", "cannot"})
+"Never stopwords: a pair differing in one of them is never accepted."
+CONTRACTED_NOT = re.compile(r"n['\u2019]t\b")
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def words(text: str) -> set[str]:
+    text = CONTRACTED_NOT.sub(" not", text.casefold())
+    return {w for w in WORD_PATTERN.findall(text) if w not in STOPWORDS or w in NEGATIONS}
+
+
+def numbers(text: str) -> set[str]:
+    return {n.replace(",", "") for n in NUMBER_PATTERN.findall(text)}
+
+
+def trigrams(text: str) -> Counter[str]:
+    text = f"  {' '.join(WORD_PATTERN.findall(text.casefold()))} "
+    return Counter(text[i : i + 3] for i in range(len(text) - 2))
+
+
+def token_set_similarity(a: str, b: str) -> float:
+    words_a, words_b = words(a), words(b)
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def trigram_cosine(a: str, b: str) -> float:
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    dot = sum(count * grams_b[gram] for gram, count in grams_a.items())
+    norm = math.sqrt(sum(c * c for c in grams_a.values())) * math.sqrt(sum(c * c for c in grams_b.values()))
+    return dot / norm if norm else 0.0
+
+
+def lexical_similarity(a: str, b: str) -> float:
+    return (token_set_similarity(a, b) + trigram_cosine(a, b)) / 2
+
+
+def lexical_verdict(a: str, b: str, accept: float, reject: float) -> bool | None:
+    "True or False when the score is past a threshold, None when the pair needs the judge."
+    score = lexical_similarity(a, b)
+    if score >= accept and words(a) == words(b) and numbers(a) == numbers(b):
+        return True
+    if score <= reject:
+        return False
+    return None
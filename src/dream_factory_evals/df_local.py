@@ -0,0 +1,357 @@
+"""Local DreamFactory stand-in serving the `data/` or `new_data/` JSON fixtures.
+
+uv run src/dream_factory_evals/df_local.py --port 8008 [--new]
+
+Then point `DREAM_FACTORY_BASE_URL` (or `NEW_DREAM_FACTORY_BASE_URL`) at http://127.0.0.1:8008/api/v2/local.
+"""
+
+import ast
+import json
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import typer
+import uvicorn
+from dotenv import load_dotenv
+from loguru import logger
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from dream_factory_evals.df_filter import FilterSyntaxError, Scalar, fields_in, parse_filter, to_sql
+
+load_dotenv()
+
+PROJECT_DIR = Path(__file__).parent.parent.parent
+MAX_RECORDS = int(os.getenv("DREAM_FACTORY_LOCAL_MAX_RECORDS", "1000"))
+
+ROLE_TABLE_PREFIXES = {"ceo": "", "hr": "hr_", "finance": "finance_", "ops": "ops_"}
+
+type Record = dict[str, Any]
+
+
+class DreamFactoryError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def data_dir(new: bool = False) -> Path:
+    "The fixtures directory, selected the same way as `TaskConfig.new`."
+    return PROJECT_DIR / ("new_data" if new else "data")
+
+
+def role_api_keys(new: bool = False) -> dict[str, str]:
+    "API key -> role, from the same env vars the evals use, with local defaults so it runs without a .env."
+    prefix = "NEW_DREAM_FACTORY" if new else "DREAM_FACTORY"
+    return {
+        os.getenv(f"{prefix}_{role.upper()}_API_KEY", f"local-{role}-key"): role for role in ROLE_TABLE_PREFIXES
+    }
+
+
+def _lower_schema(table: dict[str, Any]) -> dict[str, Any]:
+    table = json.loads(json.dumps(table))
+    table["name"] = table["name"].lower()
+    for f in table["field"]:
+        if f.get("ref_table"):
+            f["ref_table"] = f["ref_table"].lower()
+    # virtual relations point at other services this stand-in can't serve
+    table["related"] = [
+        r | {"name": r["name"].lower(), "ref_table": r["ref_table"].lower()}
+        for r in table.get("related", [])
+        if not r.get("is_virtual")
+    ]
+    return table
+
+
+SQLITE_TYPES = {
+    "integer": "INTEGER",
+    "reference": "INTEGER",
+    "boolean": "INTEGER",
+    "decimal": "REAL",
+    "float": "REAL",
+}
+
+MD_TYPES = {"int": "integer", "string": "string", "date": "date", "decimal": "decimal", "boolean": "boolean"}
+
+
+def parse_schema_md(text: str) -> dict[str, dict[str, Any]]:
+    "Parse the `data/schema.md` dump into DreamFactory-shaped `/_schema` payloads."
+    schemas: dict[str, dict[str, Any]] = {}
+    for block in re.split(r"^Table: ", text, flags=re.MULTILINE)[1:]:
+        name, _, body = block.partition("\n")
+        fields_part, _, related_part = body.partition("- related: ")
+        fields: list[dict[str, Any]] = []
+        for line in fields_part.strip().splitlines():
+            m = re.match(r"- (\w+): (\w+)(?: \((PK|FK)\))?", line.strip())
+            if m is None:
+                continue
+            col, col_type, key = m.groups()
+            fields.append(
+                {
+                    "name": col,
+                    "type": "reference" if key == "FK" else MD_TYPES.get(col_type, col_type),
+                    "is_primary_key": key == "PK",
+                    "is_foreign_key": key == "FK",
+                    "ref_table": None,
+                    "ref_field": None,
+                    "allow_null": key != "PK",
+                }
+            )
+        related = ast.literal_eval(related_part.strip()) if related_part.strip() else []
+        for r in related:
+            for f in fields:
+                if f["is_foreign_key"] and r["type"] == "belongs_to" and f["name"] == r["field"]:
+                    f["ref_table"], f["ref_field"] = r["ref_table"], r["ref_field"]
+        schemas[name.strip().lower()] = _lower_schema(
+            {
+                "name": name.strip(),
+                "primary_key": [f["name"] for f in fields if f["is_primary_key"]],
+                "field": fields,
+                "related": related,
+            }
+        )
+    return schemas
+
+
+def load_schemas(directory: Path) -> dict[str, dict[str, Any]]:
+    if (directory / "schema.json").exists():
+        raw = json.loads((directory / "schema.json").read_text())
+        return {name.lower(): _lower_schema(table) for name, table in raw.items()}
+    return parse_schema_md((directory / "schema.md").read_text())
+
+
+def split_list(value: str | None) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def is_true(value: str | None) -> bool:
+    return (value or "").lower() in ("1", "true")
+
+
+@dataclass
+class LocalDreamFactory:
+    schemas: dict[str, dict[str, Any]]
+    tables: dict[str, list[Record]]
+    api_keys: dict[str, str]
+    max_records: int = MAX_RECORDS
+    _db: sqlite3.Connection = field(init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        for name, rows in self.tables.items():
+            fields = self.schemas[name]["field"]
+            columns = [f["name"] for f in fields]
+            column_defs = ", ".join(f"{f['name']} {SQLITE_TYPES.get(f['type'], 'TEXT')}" for f in fields)
+            self._db.execute(f"CREATE TABLE {name} ({column_defs})")
+            self._db.executemany(
+                f"INSERT INTO {name} VALUES ({', '.join('?' for _ in columns)})",
+                [tuple(row.get(c) for c in columns) for row in rows],
+            )
+        self._db.execute("PRAGMA query_only = ON")
+
+    @classmethod
+    def from_dir(cls, directory: Path, api_keys: dict[str, str]) -> "LocalDreamFactory":
+        schemas = load_schemas(directory)
+        tables = {name: json.loads((directory / f"{name}.json").read_text()) for name in schemas}
+        return cls(schemas=schemas, tables=tables, api_keys=api_keys)
+
+    def authorize(self, api_key: str | None, table_name: str | None = None) -> str:
+        role = self.api_keys.get(api_key or "")
+        if role is None:
+            raise DreamFactoryError(401, "No session token (JWT) or API Key detected in request.")
+        if table_name is None and role != "ceo":
+            raise DreamFactoryError(403, "Access Forbidden. You do not have permission to list tables.")
+        if table_name is not None and not table_name.lower().startswith(ROLE_TABLE_PREFIXES[role]):
+            raise DreamFactoryError(403, f"Access Forbidden. Role '{role}' can not access table '{table_name}'.")
+        return role
+
+    def table_schema(self, table_name: str) -> dict[str, Any]:
+        try:
+            return self.schemas[table_name.lower()]
+        except KeyError:
+            raise DreamFactoryError(404, f"Table '{table_name}' does not exist in the database.")
+
+    def _decode(self, table_name: str, row: sqlite3.Row) -> Record:
+        record = dict(row)
+        for f in self.schemas[table_name]["field"]:
+            if f["type"] == "boolean" and record.get(f["name"]) is not None:
+                record[f["name"]] = bool(record[f["name"]])
+        return record
+
+    def _select(
+        self, table_name: str, where: str = "", params: tuple[Scalar, ...] = (), order: str = ""
+    ) -> list[Record]:
+        sql = f"SELECT * FROM {table_name}"
+        if where:
+            sql += f" WHERE {where}"
+        if order:
+            sql += f" ORDER BY {order}"
+        try:
+            with self._lock:
+                rows = self._db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            raise DreamFactoryError(400, f"Invalid filter or order: {e}")
+        return [self._decode(table_name, row) for row in rows]
+
+    def _where_clause(self, table_name: str, filter: str) -> tuple[str, tuple[Scalar, ...]]:
+        if not filter.strip():
+            return "", ()
+        try:
+            expr = parse_filter(filter)
+        except FilterSyntaxError as e:
+            raise DreamFactoryError(400, f"Invalid filter: {e}")
+        # SQLite would read an unknown double-quoted column as a string literal
+        if unknown := fields_in(expr) - {f["name"] for f in self.schemas[table_name]["field"]}:
+            raise DreamFactoryError(400, f"Invalid filter: unknown field(s) {', '.join(sorted(unknown))}")
+        where, params = to_sql(expr)
+        return where, tuple(params)
+
+    def _order_clause(self, table_name: str, order: str) -> str:
+        columns = {f["name"] for f in self.schemas[table_name]["field"]}
+        clauses: list[str] = []
+        for part in split_list(order):
+            col, _, direction = part.partition(" ")
+            direction = direction.strip().upper() or "ASC"
+            if col not in columns or direction not in ("ASC", "DESC"):
+                raise DreamFactoryError(400, f"Invalid order field '{part}'.")
+            clauses.append(f"{col} {direction}")
+        return ", ".join(clauses)
+
+    def _attach_related(self, table_name: str, records: list[Record], related: str) -> list[str]:
+        relations = self.schemas[table_name]["related"]
+        names = split_list(related)
+        if names != ["*"]:
+            known = {r["name"] for r in relations}
+            if unknown := [n for n in names if n.lower() not in known]:
+                raise DreamFactoryError(400, f"Invalid relationship(s) requested: {', '.join(unknown)}")
+            relations = [r for r in relations if r["name"] in {n.lower() for n in names}]
+        for relation in relations:
+            ref_rows = self._select(relation["ref_table"])
+            by_ref: dict[Any, list[Record]] = {}
+            for row in ref_rows:
+                by_ref.setdefault(row[relation["ref_field"]], []).append(row)
+            for record in records:
+                matches = by_ref.get(record.get(relation["field"]), [])
+                if relation["type"] == "belongs_to":
+                    record[relation["name"]] = matches[0] if matches else None
+                else:
+                    record[relation["name"]] = matches
+        return [r["name"] for r in relations]
+
+    def count(self, table_name: str, params: dict[str, str]) -> int:
+        "Records matching `filter`, for `count_only`."
+        table_name = self.table_schema(table_name)["name"]
+        where, where_params = self._where_clause(table_name, params.get("filter", ""))
+        sql = f"SELECT COUNT(*) FROM {table_name}" + (f" WHERE {where}" if where else "")
+        try:
+            with self._lock:
+                return self._db.execute(sql, where_params).fetchone()[0]
+        except sqlite3.Error as e:
+            raise DreamFactoryError(400, f"Invalid filter: {e}")
+
+    def records(self, table_name: str, params: dict[str, str]) -> dict[str, Any]:
+        table_name = self.table_schema(table_name)["name"]
+        total = None
+        if ids := params.get("ids"):
+            pk = self.schemas[table_name]["primary_key"][0]
+            id_list = split_list(ids)
+            records = self._select(
+                table_name, where=f"{pk} IN ({', '.join('?' for _ in id_list)})", params=tuple(id_list)
+            )
+        else:
+            order = self._order_clause(table_name, params.get("order", ""))
+            where, where_params = self._where_clause(table_name, params.get("filter", ""))
+            records = self._select(table_name, where=where, params=where_params, order=order)
+            total = len(records)
+            offset = int(params.get("offset") or 0)
+            limit = min(int(params.get("limit") or self.max_records), self.max_records)
+            records = records[offset : offset + limit]
+        attached = self._attach_related(table_name, records, related) if (related := params.get("related")) else []
+        fields = split_list(params.get("fields", "*"))
+        if fields and fields != ["*"]:
+            keep = set(fields) | set(attached)
+            records = [{k: v for k, v in r.items() if k in keep} for r in records]
+        if group := split_list(params.get("group")):
+            groups: dict[str, Record] = {}
+            for record in records:
+                groups.setdefault(json.dumps([record.get(g) for g in group], default=str), record)
+            records = list(groups.values())
+        if is_true(params.get("include_count")):
+            return {"resource": records, "meta": {"count": len(records) if total is None else total}}
+        return {"resource": records}
+
+
+def create_app(local_df: LocalDreamFactory) -> Starlette:
+    def error_response(e: DreamFactoryError) -> JSONResponse:
+        return JSONResponse({"error": {"code": e.code, "message": e.message}}, status_code=e.code)
+
+    def api_key(request: Request) -> str | None:
+        return request.headers.get("X-DreamFactory-API-Key") or request.query_params.get("api_key")
+
+    async def list_tables(request: Request) -> JSONResponse:
+        try:
+            local_df.authorize(api_key(request))
+        except DreamFactoryError as e:
+            return error_response(e)
+        return JSONResponse({"resource": [{"name": name} for name in local_df.schemas]})
+
+    async def get_records(request: Request) -> JSONResponse:
+        table_name = request.path_params["table_name"]
+        try:
+            local_df.authorize(api_key(request), table_name)
+            params = dict(request.query_params)
+            if is_true(params.get("count_only")):
+                return JSONResponse(local_df.count(table_name, params))
+            return JSONResponse(local_df.records(table_name, params))
+        except DreamFactoryError as e:
+            return error_response(e)
+        except ValueError as e:
+            return error_response(DreamFactoryError(400, str(e)))
+
+    async def get_schema(request: Request) -> JSONResponse:
+        table_name = request.path_params["table_name"]
+        try:
+            local_df.authorize(api_key(request), table_name)
+            return JSONResponse(local_df.table_schema(table_name))
+        except DreamFactoryError as e:
+            return error_response(e)
+
+    routes = [
+        Route("/_table", list_tables),
+        Route("/_table/{table_name}", get_records),
+        Route("/_schema/{table_name}", get_schema),
+    ]
+    return Starlette(routes=[Mount("/api/v2/{service}", routes=routes)])
+
+
+app = typer.Typer()
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", help="Host to bind"),
+    port: int = typer.Option(8008, help="Port to bind"),
+    new: bool = typer.Option(False, help="Serve new_data/ instead of data/"),
+):
+    """Serve the JSON fixtures through a DreamFactory-compatible API."""
+    api_keys = role_api_keys(new=new)
+    local_df = LocalDreamFactory.from_dir(data_dir(new=new), api_keys=api_keys)
+    prefix = "NEW_DREAM_FACTORY" if new else "DREAM_FACTORY"
+    logger.info(f"Serving {data_dir(new=new)}; set {prefix}_BASE_URL=http://{host}:{port}/api/v2/local")
+    for key, role in api_keys.items():
+        logger.info(f"{prefix}_{role.upper()}_API_KEY={key}")
+    uvicorn.run(create_app(local_df), host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    app()
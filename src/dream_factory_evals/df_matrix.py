@@ -0,0 +1,309 @@
+"""Run many models x roles x levels (x prompts x think) in one process, under one event loop.
+
+A plan file (JSON or TOML) lists the axes and the limits:
+
+    name = "leaderboard-2025-07"
+    models = ["openai:gpt-4.1-mini", "anthropic:claude-sonnet-4-0"]
+    roles = ["hr", "finance", "ops"]
+    levels = [1, 2, 3, 4]
+    prompts = ["basic_prompt.txt"]
+    think = [false, true]
+    provider_concurrency = { openai = 8, anthropic = 4 }
+    host_concurrency = { "127.0.0.1:8008" = 16 }
+    [config]
+    mcp_transport = "in_process"
+
+Every case of every run is scheduled at once; a case starts when both its model provider and its DreamFactory host
+have a free slot. Model clients, the table catalog, schema snapshots, the result cache and the MCP pool are shared
+by the whole matrix. Scores of every case are written to one CSV, with the columns of the per-report score files.
+"""
+
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import sys
+import tomllib
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+from urllib.parse import urlparse
+
+import httpx
+import pandas as pd
+from loguru import logger
+from pydantic import BaseModel
+from pydantic_ai.exceptions import ModelHTTPError, UnexpectedModelBehavior
+from pydantic_evals import Dataset
+from pydantic_evals.reporting import EvaluationReport
+
+from dream_factory_evals.df_agent import (
+    Query,
+    QueryResult,
+    Role,
+    TaskConfig,
+    checkpointed,
+    df_credentials,
+    prepare_evaluation,
+    task,
+)
+from dream_factory_evals.df_checkpoint import Checkpoint, data_version, record_metric
+from dream_factory_evals.df_completions import completion_summaries
+from dream_factory_evals.df_judge import judge_summaries
+from dream_factory_evals.df_mcp import aclose_http_client, record_stats, result_cache
+from dream_factory_evals.df_oracle import ORACLE_MODEL, register_oracle_cases
+from dream_factory_evals.df_ratelimit import limiter_summaries, provider_of
+from dream_factory_evals.mcp_pool import mcp_server_pool
+
+PROJECT_DIR = Path(__file__).parent.parent.parent
+SCORES_DIR = Path(os.getenv("SCORES_DIR", "scores"))
+PROVIDER_CONCURRENCY = int(os.getenv("MATRIX_PROVIDER_CONCURRENCY", "4"))
+HOST_CONCURRENCY = int(os.getenv("MATRIX_HOST_CONCURRENCY", "8"))
+EVALUATION_ERRORS = (ModelHTTPError, UnexpectedModelBehavior, httpx.HTTPError, OSError, RuntimeError, ValueError)
+"Expected failures of one evaluation: model or judge calls, DreamFactory, MCP servers, checkpoints."
+
+
+def load_dataset(role: str, level: int) -> Dataset[Query[Any], QueryResult[Any]]:
+    "`{role}_dataset` from `evals/level{level}/{role}/evals.py`."
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    module = importlib.import_module(f"evals.level{level}.{role}.evals")
+    return getattr(module, f"{role}_dataset")
+
+
+@dataclass(frozen=True, slots=True)
+class MatrixEntry:
+    model: str
+    role: Role
+    level: int
+    prompt_name: str
+    think: bool
+
+    def report_name(self, plan_name: str, prompts: int) -> str:
+        name = f"{plan_name}-{self.model}-{self.role.value}-level-{self.level}"
+        if prompts > 1:
+            name += f"-{Path(self.prompt_name).stem}"
+        return (name + "-think" if self.think else name).replace(" ", "-")
+
+
+class MatrixPlan(BaseModel):
+    name: str = "matrix"
+    models: list[str]
+    roles: list[Role]
+    levels: list[int] = [1, 2, 3, 4]
+    prompts: list[str] = ["basic_prompt.txt"]
+    think: list[bool] = [False]
+    provider_concurrency: dict[str, int] = {}
+    "Concurrent cases per model provider; providers not listed get MATRIX_PROVIDER_CONCURRENCY."
+    host_concurrency: dict[str, int] = {}
+    "Concurrent cases per DreamFactory host (host:port); hosts not listed get MATRIX_HOST_CONCURRENCY."
+    config: dict[str, Any] = {}
+    "Other TaskConfig fields shared by every run, such as mcp_transport or result_encoding."
+
+    @classmethod
+    def from_file(cls, path: Path) -> "MatrixPlan":
+        text = path.read_text()
+        return cls.model_validate(tomllib.loads(text) if path.suffix == ".toml" else json.loads(text))
+
+    def entries(self) -> list[MatrixEntry]:
+        return [
+            MatrixEntry(model=model.replace("/", ":"), role=role, level=level, prompt_name=prompt, think=think)
+            for model, role, level, prompt, think in itertools.product(
+                self.models, self.roles, self.levels, self.prompts, self.think
+            )
+        ]
+
+    def task_config(self, entry: MatrixEntry) -> TaskConfig:
+        return TaskConfig.model_validate(
+            self.config
+            | {
+                "user_role": entry.role,
+                "model": entry.model,
+                "prompt_name": entry.prompt_name,
+                "think": entry.think,
+            }
+        )
+
+
+@dataclass
+class ConcurrencyLimits:
+    "One semaphore per model provider and per DreamFactory host, shared by every case of the matrix."
+
+    provider_limits: dict[str, int] = field(default_factory=dict)
+    host_limits: dict[str, int] = field(default_factory=dict)
+    _providers: dict[str, asyncio.Semaphore] = field(default_factory=dict)
+    _hosts: dict[str, asyncio.Semaphore] = field(default_factory=dict)
+
+    def _provider(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self._providers:
+            self._providers[provider] = asyncio.Semaphore(self.provider_limits.get(provider, PROVIDER_CONCURRENCY))
+        return self._providers[provider]
+
+    def _host(self, host: str) -> asyncio.Semaphore:
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.host_limits.get(host, HOST_CONCURRENCY))
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, model: str, base_url: str) -> AsyncIterator[None]:
+        # always provider first, then host, so two cases can't each hold the slot the other waits for
+        async with self._provider(provider_of(model)), self._host(urlparse(base_url).netloc):
+            yield
+
+
+def entry_columns(entry: MatrixEntry, evaluation_name: str) -> dict[str, Any]:
+    return {
+        "evaluation_name": evaluation_name,
+        "model": entry.model,
+        "role": entry.role.value,
+        "level": entry.level,
+        "prompt_name": entry.prompt_name,
+        "think": entry.think,
+    }
+
+
+def error_message(error: BaseException) -> str:
+    "`Type: message` of an error, or of the distinct errors in an exception group."
+    if isinstance(error, BaseExceptionGroup):
+        return "; ".join(dict.fromkeys(error_message(e) for e in error.exceptions))
+    return f"{type(error).__name__}: {error}"
+
+
+def failed_entry_row(entry: MatrixEntry, evaluation_name: str, error: str) -> dict[str, Any]:
+    "The row of an evaluation that failed: the matrix axes and the error, no case or scores."
+    return entry_columns(entry, evaluation_name) | {"error": error}
+
+
+def case_scores(report: EvaluationReport, entry: MatrixEntry) -> list[dict[str, Any]]:
+    "One row per case, with the columns of `create_leaderboard.save_scores` plus the matrix axes and metrics."
+    rows: list[dict[str, Any]] = []
+    for case in report.cases:
+        accuracy = 2 * int(case.assertions["EvaluateResult"].value)
+        tool_calls = case.assertions["EvaluateToolCalls"]
+        tool_results = case.assertions.get("EvaluateToolCallResults")
+        correct_tool_results = int(tool_results.value) if tool_results else int(tool_calls.value)
+        output, expected_output = case.output, case.expected_output
+        rows.append(
+            {
+                **entry_columns(entry, report.name),
+                "case_name": case.name,
+                "duration": case.metrics.get("resumed_task_duration", case.task_duration)
+                - case.metrics.get("queue_seconds", 0),
+                "accuracy": accuracy,
+                "expected_output": getattr(expected_output, "result", ""),
+                "output": getattr(output, "result", ""),
+                "correct_tool_calls": int(tool_calls.value),
+                "incorrect_tool_calls_reason": tool_calls.reason,
+                "correct_tool_results": correct_tool_results,
+                "incorrect_tool_results_reason": tool_results.reason if tool_results else None,
+                "score": accuracy + correct_tool_results,
+                "error": None,
+                **case.metrics,
+            }
+        )
+    return rows
+
+
+async def run_matrix(plan: MatrixPlan, pool_mcp: bool = True, resume: bool = False) -> pd.DataFrame:
+    """Evaluate every entry of `plan` concurrently and write the combined scores to `SCORES_DIR/{plan.name}.csv`.
+
+    Finished cases are checkpointed per entry; with `resume`, they are reused instead of run again.
+    """
+    entries = plan.entries()
+    configs = {entry: plan.task_config(entry) for entry in entries}
+    datasets: dict[tuple[Role, int], Dataset[Query[Any], QueryResult[Any]]] = {}
+    for role, level in dict.fromkeys((e.role, e.level) for e in entries):
+        datasets[(role, level)] = load_dataset(role.value, level)
+    cases = sum(len(datasets[(e.role, e.level)].cases) for e in entries)
+    logger.info(f"Running {len(entries)} evaluations, {cases} cases")
+
+    result_cache.clear()
+    record_stats.clear()
+    # one config per role is enough to warm the role's catalog, schemas and MCP settings
+    role_configs = {config.user_role: config for config in configs.values()}
+    role_settings = dict(
+        zip(role_configs, await asyncio.gather(*(prepare_evaluation(c) for c in role_configs.values())))
+    )
+    limits = ConcurrencyLimits(provider_limits=plan.provider_concurrency, host_limits=plan.host_concurrency)
+
+    async def run_entry(entry: MatrixEntry) -> list[dict[str, Any]]:
+        config = configs[entry]
+        base_url, _ = df_credentials(config)
+
+        async def limited_task(inputs: Query[Any]) -> QueryResult[Any]:
+            start = perf_counter()
+            async with limits.slot(entry.model, base_url):
+                # task_duration includes the wait for a slot; report it so it can be taken out
+                record_metric("queue_seconds", perf_counter() - start)
+                return await task(inputs, config)
+
+        name = entry.report_name(plan.name, prompts=len(plan.prompts))
+        dataset = datasets[(entry.role, entry.level)]
+        if entry.model == ORACLE_MODEL:
+            register_oracle_cases(dataset)
+        checkpoint = Checkpoint(report_name=name, model=entry.model, data_version=data_version(config.new))
+        error: str | None = None
+        try:
+            # several datasets run at once, so no progress bars: rich allows one live display
+            report = await dataset.evaluate(
+                task=checkpointed(limited_task, dataset, config, checkpoint, resume=resume),
+                name=name,
+                progress=False,
+            )
+        # evaluators run in task groups, so their errors arrive wrapped in exception groups
+        except* EVALUATION_ERRORS as group:
+            logger.exception(f"Evaluation {name} failed")
+            error = error_message(group)
+        if error is not None:
+            return [failed_entry_row(entry, name, error)]
+        logger.success(f"Evaluation completed: {name}")
+        return case_scores(report, entry)
+
+    async with mcp_server_pool(enabled=pool_mcp) as pool:
+        stdio_roles = {role: c for role, c in role_configs.items() if c.mcp_transport == "stdio"}
+        await asyncio.gather(
+            *(pool.start(*df_credentials(c), env=role_settings[role]) for role, c in stdio_roles.items())
+        )
+        outcomes = await asyncio.gather(*(run_entry(entry) for entry in entries), return_exceptions=True)
+    await aclose_http_client()
+    results: list[list[dict[str, Any]]] = []
+    for entry, outcome in zip(entries, outcomes):
+        if isinstance(outcome, BaseException):
+            if not isinstance(outcome, Exception):
+                raise outcome
+            # an unexpected error of one entry still leaves the scores of the others, and its own failed row
+            name = entry.report_name(plan.name, prompts=len(plan.prompts))
+            logger.opt(exception=outcome).error(f"Evaluation {name} failed")
+            outcome = [failed_entry_row(entry, name, error_message(outcome))]
+        results.append(outcome)
+    logger.info(pool.timings.summary())
+    logger.info(result_cache.stats.summary())
+    logger.info(record_stats.summary())
+    for summary in limiter_summaries() + completion_summaries() + judge_summaries():
+        logger.info(summary)
+
+    scores = pd.DataFrame([row for rows in results for row in rows])
+    if failed := [rows[0]["evaluation_name"] for rows in results if rows and rows[0]["error"] is not None]:
+        logger.error(f"{len(failed)} of {len(entries)} evaluations failed: {', '.join(failed)}")
+    SCORES_DIR.mkdir(parents=True, exist_ok=True)
+    scores_path = SCORES_DIR / f"{plan.name}.csv"
+    scores.to_csv(scores_path, index=False)
+    logger.success(f"Saved {len(scores)} case scores to {scores_path}")
+    return scores
+
+
+def matrix_summary(scores: pd.DataFrame) -> pd.DataFrame:
+    "Mean score, accuracy and duration per model x role x level (x prompt x think), and whether the run failed."
+    if scores.empty:
+        return scores
+    axes = ["model", "role", "level", "prompt_name", "think"]
+    grouped = scores.groupby(axes)
+    summary = (
+        grouped[["score", "accuracy", "correct_tool_calls", "correct_tool_results", "duration"]].mean().round(3)
+    )
+    summary["failed"] = grouped["error"].count() > 0
+    return summary.reset_index()
@@ -1,11 +1,191 @@
+import asyncio
+import hashlib
+import importlib.util
+import json
+import math
 import os
-from typing import Any, TypedDict
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Mapping
+from contextlib import aclosing, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import monotonic
+from typing import Any, TypedDict, cast, get_args
 
 import httpx
 from loguru import logger
 from mcp.server.fastmcp import FastMCP
 
-server = FastMCP(name="dream_factory_mcp")
+from dream_factory_evals.df_aggregate import aggregate_records, parse_aggregations, source_fields, split_names
+from dream_factory_evals.df_calculator import calculate
+from dream_factory_evals.df_cassette import (
+    Cassette,
+    CassetteMode,
+    CassetteTransport,
+    current_cassette,
+    use_cassette,
+)
+from dream_factory_evals.df_encoding import ResultEncoding, encode_result
+from dream_factory_evals.df_filter import canonical_filter_or_raw
+from dream_factory_evals.df_paging import (
+    ResultBudget,
+    SummaryStats,
+    decode_continuation,
+    encode_continuation,
+    resource_of,
+    stream_pages,
+    total_of,
+)
+from dream_factory_evals.df_query import (
+    Join,
+    JoinHow,
+    hash_join,
+    needed_columns,
+    order_rows,
+    project,
+    resolve_join,
+)
+
+HTTP_TIMEOUT = float(os.getenv("DREAM_FACTORY_HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("DREAM_FACTORY_HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("DREAM_FACTORY_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DREAM_FACTORY_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("DREAM_FACTORY_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2 = os.getenv("DREAM_FACTORY_HTTP2", "false").lower() in ("1", "true", "yes")
+CATALOG_TTL = float(os.getenv("DREAM_FACTORY_CATALOG_TTL", "600"))
+RESULT_CACHE_SIZE = int(os.getenv("DREAM_FACTORY_RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("DREAM_FACTORY_RESULT_CACHE_TTL", "300"))
+SCHEMA_WARM_TABLES = os.getenv("DREAM_FACTORY_SCHEMA_WARM_TABLES", "")
+SCHEMA_DIR = os.getenv("DREAM_FACTORY_SCHEMA_DIR", "")
+SCHEMA_SHA256 = os.getenv("DREAM_FACTORY_SCHEMA_SHA256", "")
+RESULT_ENCODING = cast(ResultEncoding, os.getenv("DREAM_FACTORY_RESULT_ENCODING", "json"))
+MAX_RESULT_ROWS = int(os.getenv("DREAM_FACTORY_MAX_RESULT_ROWS", "500"))
+MAX_RESULT_BYTES = int(os.getenv("DREAM_FACTORY_MAX_RESULT_BYTES", "100000"))
+# at most DreamFactory's max records per request (1000 by default)
+PAGE_SIZE = int(os.getenv("DREAM_FACTORY_PAGE_SIZE", "500"))
+SUMMARY_SCAN = os.getenv("DREAM_FACTORY_SUMMARY_SCAN", "false").lower() in ("1", "true", "yes")
+"Read every remaining page of a truncated result for its summary, instead of only the pages already read."
+SUMMARY_MAX_ROWS = int(os.getenv("DREAM_FACTORY_SUMMARY_MAX_ROWS", "100000"))
+SCAN_MAX_ROWS = int(os.getenv("DREAM_FACTORY_SCAN_MAX_ROWS", "100000"))
+"Records the aggregate, distinct values and join tools read at most before refusing with a truncation error."
+CASSETTE = os.getenv("DREAM_FACTORY_CASSETTE", "")
+CASSETTE_MODE = cast(CassetteMode, os.getenv("DREAM_FACTORY_CASSETTE_MODE", "replay"))
+
+# one client per event loop: the stdio server has a single loop, in-process callers may run several
+_http_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    http2 = HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("DREAM_FACTORY_HTTP2 is set but `h2` is not installed, falling back to HTTP/1.1")
+        http2 = False
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+    )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT), transport=CassetteTransport(transport)
+    )
+
+
+def http_client() -> httpx.AsyncClient:
+    "The shared keep-alive client for the running event loop."
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _http_clients[loop] = create_http_client()
+    return client
+
+
+async def aclose_http_client() -> None:
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+@asynccontextmanager
+async def lifespan(_: FastMCP) -> AsyncIterator[None]:
+    if SCHEMA_WARM_TABLES:
+        await warm_schema_snapshot(
+            table_names=SCHEMA_WARM_TABLES.split(","), schema_dir=SCHEMA_DIR or None, expected_hash=SCHEMA_SHA256
+        )
+    try:
+        yield
+    finally:
+        logger.info(result_cache.stats.summary())
+        logger.info(record_stats.summary())
+        for snapshot in _schema_snapshots.values():
+            logger.info(snapshot.summary())
+        if (cassette := current_cassette()) is not None:
+            logger.info(cassette.stats.summary(cassette))
+        await aclose_http_client()
+
+
+server = FastMCP(name="dream_factory_mcp", lifespan=lifespan)
+
+_credentials: ContextVar[tuple[str, str] | None] = ContextVar("dream_factory_credentials", default=None)
+
+
+@contextmanager
+def dream_factory_credentials(base_url: str, dream_factory_api_key: str) -> Iterator[None]:
+    "Bind the base URL and API key used by the tools when they run in-process instead of behind stdio."
+    token = _credentials.set((base_url, dream_factory_api_key))
+    try:
+        yield
+    finally:
+        _credentials.reset(token)
+
+
+_result_encoding: ContextVar[ResultEncoding | None] = ContextVar("dream_factory_result_encoding", default=None)
+
+
+@contextmanager
+def result_encoding(encoding: ResultEncoding) -> Iterator[None]:
+    "Bind the encoding of record results for in-process tools; stdio servers use DREAM_FACTORY_RESULT_ENCODING."
+    token = _result_encoding.set(encoding)
+    try:
+        yield
+    finally:
+        _result_encoding.reset(token)
+
+
+def current_result_encoding() -> ResultEncoding:
+    return _result_encoding.get() or RESULT_ENCODING
+
+
+_result_budget: ContextVar[ResultBudget | None] = ContextVar("dream_factory_result_budget", default=None)
+
+
+@contextmanager
+def result_budget(budget: ResultBudget) -> Iterator[None]:
+    "Bind the per-call row/byte budget for in-process tools; stdio servers use DREAM_FACTORY_MAX_RESULT_*."
+    token = _result_budget.set(budget)
+    try:
+        yield
+    finally:
+        _result_budget.reset(token)
+
+
+def current_result_budget() -> ResultBudget:
+    return _result_budget.get() or ResultBudget(max_rows=MAX_RESULT_ROWS, max_bytes=MAX_RESULT_BYTES)
+
+
+def resolve_credentials(base_url: str | None = None, dream_factory_api_key: str | None = None) -> tuple[str, str]:
+    bound_base_url, bound_api_key = _credentials.get() or (None, None)
+    return (
+        base_url or bound_base_url or os.environ["DREAM_FACTORY_BASE_URL"],
+        dream_factory_api_key or bound_api_key or os.environ["DREAM_FACTORY_API_KEY"],
+    )
 
 
 def get_params(
@@ -40,8 +220,9 @@ class TableUrlWithHeaders(TypedDict):
 def table_url_with_headers(
     table_name: str, base_url: str | None = None, dream_factory_api_key: str | None = None
 ) -> TableUrlWithHeaders:
-    base_url = base_url or os.environ["DREAM_FACTORY_BASE_URL"]
-    dream_factory_api_key = dream_factory_api_key or os.environ["DREAM_FACTORY_API_KEY"]
+    base_url, dream_factory_api_key = resolve_credentials(
+        base_url=base_url, dream_factory_api_key=dream_factory_api_key
+    )
     return {"url": f"{base_url}/_table/{table_name}", "headers": {"X-DreamFactory-API-Key": dream_factory_api_key}}
 
 
@@ -62,11 +243,341 @@ def list_table_names(base_url: str | None = None, dream_factory_api_key: str | N
     """
     base_url = base_url or os.environ["DREAM_FACTORY_BASE_URL"]
     dream_factory_api_key = dream_factory_api_key or os.environ["DREAM_FACTORY_API_KEY"]
-    return httpx.get(url=f"{base_url}/_table", headers={"X-DreamFactory-API-Key": dream_factory_api_key}).json()
+    with httpx.Client(transport=CassetteTransport(httpx.HTTPTransport())) as client:
+        return client.get(
+            url=f"{base_url}/_table", headers={"X-DreamFactory-API-Key": dream_factory_api_key}
+        ).json()
+
+
+@dataclass
+class TableCatalog:
+    table_names: list[str]
+    fetched_at: float
+    _by_prefix: dict[str, list[str]] = field(default_factory=dict)
+
+    def tables_with_prefix(self, prefix: str) -> list[str]:
+        if prefix not in self._by_prefix:
+            self._by_prefix[prefix] = [t for t in self.table_names if t.startswith(prefix)]
+        return list(self._by_prefix[prefix])
+
+
+_catalogs: dict[str, TableCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def table_catalog(
+    base_url: str | None = None, dream_factory_api_key: str | None = None, ttl: float = CATALOG_TTL
+) -> TableCatalog:
+    "Process-wide `list_table_names` cache keyed by base URL."
+    base_url = base_url or os.environ["DREAM_FACTORY_BASE_URL"]
+    with _catalogs_lock:
+        catalog = _catalogs.get(base_url)
+        if catalog is None or monotonic() - catalog.fetched_at > ttl:
+            logger.info(f"Fetching table catalog for {base_url}")
+            resource = list_table_names(base_url=base_url, dream_factory_api_key=dream_factory_api_key)["resource"]
+            catalog = _catalogs[base_url] = TableCatalog(
+                table_names=[t["name"] for t in resource], fetched_at=monotonic()
+            )
+        return catalog
+
+
+def invalidate_table_catalog(base_url: str | None = None) -> None:
+    "Drop the cached catalog for `base_url`, or every cached catalog if it's None."
+    with _catalogs_lock:
+        if base_url is None:
+            _catalogs.clear()
+        else:
+            _catalogs.pop(base_url, None)
+
+
+type ResultKey = tuple[str, str, tuple[tuple[str, str], ...]]
+"(URL, API key, canonical params)"
+
+LIST_PARAMS = ("fields", "related", "ids", "group")
+
+
+def canonical_params(params: Mapping[str, str | int | None]) -> tuple[tuple[str, str], ...]:
+    "Query params that ask for the same data map to the same tuple: filters canonicalized, lists as sorted sets."
+    canonical: list[tuple[str, str]] = []
+    for name, value in params.items():
+        if value is None or value == "":
+            continue
+        value = str(value)
+        if name == "filter":
+            value = canonical_filter_or_raw(value)
+        elif name in LIST_PARAMS:
+            value = ",".join(sorted({v.strip() for v in value.split(",") if v.strip()}))
+        canonical.append((name, value))
+    return tuple(sorted(canonical))
+
+
+def dream_factory_cassette(directory: str | Path, mode: CassetteMode) -> Cassette:
+    "A cassette keyed by the same canonical params as the result cache."
+    return Cassette(directory=Path(directory), mode=mode, canonicalize=canonical_params)
+
+
+if CASSETTE:
+    use_cassette(dream_factory_cassette(CASSETTE, CASSETTE_MODE))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    "Requests that waited on an identical in-flight request instead of making their own."
+    evictions: int = 0
+
+    @property
+    def round_trips_saved(self) -> int:
+        return self.hits + self.coalesced
+
+    def summary(self) -> str:
+        requests = self.hits + self.misses + self.coalesced
+        return (
+            f"DreamFactory result cache: {self.hits} hits, {self.misses} misses, {self.coalesced} coalesced, "
+            f"{self.evictions} evictions; {self.round_trips_saved}/{requests} round trips avoided"
+        )
+
+
+@dataclass
+class ResultCache:
+    """LRU + TTL cache of DreamFactory GET responses with single-flight coalescing.
+
+    Only successful responses are cached. Cached values are shared between callers and must not be mutated.
+    """
+
+    max_entries: int = RESULT_CACHE_SIZE
+    ttl: float = RESULT_CACHE_TTL
+    stats: CacheStats = field(default_factory=CacheStats)
+    _entries: OrderedDict[ResultKey, tuple[float, Any]] = field(default_factory=OrderedDict)
+    # futures belong to a loop, so only requests on the same loop are coalesced
+    _in_flight: dict[tuple[asyncio.AbstractEventLoop, ResultKey], asyncio.Future[Any]] = field(
+        default_factory=dict
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _get(self, key: ResultKey) -> tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return True, entry[1]
+
+    def _put(self, key: ResultKey, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    async def get(self, url: str, dream_factory_api_key: str, params: Mapping[str, str | int | None]) -> Any:
+        "GET `url` as JSON, from the cache or by joining an identical in-flight request when possible."
+        headers = {"X-DreamFactory-API-Key": dream_factory_api_key}
+        if self.max_entries <= 0:
+            self.stats.misses += 1
+            return (await http_client().get(url=url, headers=headers, params=dict(params))).json()
+        key: ResultKey = (url, dream_factory_api_key, canonical_params(params))
+        found, value = self._get(key)
+        if found:
+            return value
+        flight_key = (asyncio.get_running_loop(), key)
+        if (in_flight := self._in_flight.get(flight_key)) is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(in_flight)
+        self.stats.misses += 1
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = future
+        try:
+            response = await http_client().get(url=url, headers=headers, params=dict(params))
+            value = response.json()
+            if response.is_success:
+                self._put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # waiters get the exception; don't warn about it when there are none
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[flight_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self.stats = CacheStats()
+
+
+result_cache = ResultCache()
+"Process-wide: shared by every case, retry and model that calls the tools in this process."
+
+
+@dataclass
+class SchemaSnapshot:
+    """Table schemas for one (base URL, API key), fetched at most once each and then served from memory.
+
+    Only tables the key could fetch end up in the snapshot, so RBAC errors still come from DreamFactory.
+    """
+
+    base_url: str
+    dream_factory_api_key: str
+    schemas: dict[str, dict[str, Any]] = field(default_factory=dict)
+    fetches: int = 0
+    hits: int = 0
+    _in_flight: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Future[Any]] = field(default_factory=dict)
+
+    @property
+    def content_hash(self) -> str:
+        "sha256 of the schemas, so runs can tell whether they saw the same database."
+        return hashlib.sha256(json.dumps(self.schemas, sort_keys=True).encode()).hexdigest()
+
+    def summary(self) -> str:
+        return (
+            f"Schema snapshot for {self.base_url}: {len(self.schemas)} tables, sha256 {self.content_hash[:12]}, "
+            f"{self.hits} served from memory, {self.fetches} fetched"
+        )
+
+    async def fetch(self, table_name: str) -> Any:
+        self.fetches += 1
+        logger.info(f"Fetching schema for table {table_name}")
+        response = await http_client().get(
+            url=f"{self.base_url}/_schema/{table_name}",
+            headers={"X-DreamFactory-API-Key": self.dream_factory_api_key},
+        )
+        schema = response.json()
+        if response.is_success:
+            self.schemas[table_name.lower()] = schema
+        return schema
+
+    async def get(self, table_name: str) -> Any:
+        if (schema := self.schemas.get(table_name.lower())) is not None:
+            self.hits += 1
+            return schema
+        flight_key = (asyncio.get_running_loop(), table_name.lower())
+        if (in_flight := self._in_flight.get(flight_key)) is not None:
+            self.hits += 1
+            return await asyncio.shield(in_flight)
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = future
+        try:
+            schema = await self.fetch(table_name)
+            future.set_result(schema)
+            return schema
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[flight_key]
+
+
+_schema_snapshots: dict[tuple[str, str], SchemaSnapshot] = {}
+
+
+def schema_snapshot(base_url: str | None = None, dream_factory_api_key: str | None = None) -> SchemaSnapshot:
+    base_url, dream_factory_api_key = resolve_credentials(
+        base_url=base_url, dream_factory_api_key=dream_factory_api_key
+    )
+    key = (base_url, dream_factory_api_key)
+    if key not in _schema_snapshots:
+        _schema_snapshots[key] = SchemaSnapshot(base_url=base_url, dream_factory_api_key=dream_factory_api_key)
+    return _schema_snapshots[key]
+
+
+def schema_file(schema_dir: str | Path) -> Path:
+    schema_dir = Path(schema_dir)
+    return schema_dir / "schema.json" if (schema_dir / "schema.json").exists() else schema_dir / "schema.md"
+
+
+def schema_file_hash(schema_dir: str | Path) -> str:
+    return hashlib.sha256(schema_file(schema_dir).read_bytes()).hexdigest()
+
+
+def load_schema_file(schema_dir: str | Path, expected_hash: str = "") -> dict[str, dict[str, Any]] | None:
+    "Schemas from `schema.json`/`schema.md` in `schema_dir`, or None if the file doesn't match `expected_hash`."
+    content_hash = schema_file_hash(schema_dir)
+    if expected_hash and content_hash != expected_hash:
+        logger.warning(
+            f"{schema_file(schema_dir)} has sha256 {content_hash}, expected {expected_hash}; fetching schemas instead"
+        )
+        return None
+    # the stand-in's parsers; imported here so the stdio server only loads them when a schema dir is used
+    from dream_factory_evals.df_local import load_schemas
+
+    return load_schemas(Path(schema_dir))
+
+
+async def warm_schema_snapshot(
+    table_names: list[str],
+    base_url: str | None = None,
+    dream_factory_api_key: str | None = None,
+    schema_dir: str | Path | None = None,
+    expected_hash: str = "",
+) -> SchemaSnapshot:
+    "Fill the snapshot for `table_names` (a role's available tables) from `schema_dir`, fetching the rest in parallel."
+    snapshot = schema_snapshot(base_url=base_url, dream_factory_api_key=dream_factory_api_key)
+    from_file = load_schema_file(schema_dir, expected_hash=expected_hash) if schema_dir else None
+    missing: list[str] = []
+    for table_name in filter(None, (t.strip() for t in table_names)):
+        if from_file is not None and table_name.lower() in from_file:
+            snapshot.schemas[table_name.lower()] = from_file[table_name.lower()]
+        elif table_name.lower() not in snapshot.schemas:
+            missing.append(table_name)
+    await asyncio.gather(*(snapshot.get(t) for t in missing))
+    logger.info(snapshot.summary())
+    return snapshot
+
+
+@dataclass
+class RecordStats:
+    "Records the tools read from DreamFactory responses vs records they returned to the model, per tool."
+
+    read: Counter[str] = field(default_factory=Counter)
+    returned: Counter[str] = field(default_factory=Counter)
+
+    def summary(self) -> str:
+        per_tool = ", ".join(
+            f"{tool} {self.read[tool]} read/{self.returned[tool]} returned" for tool in sorted(self.read)
+        )
+        return f"Records: {sum(self.read.values())} read, {sum(self.returned.values())} returned to the model" + (
+            f" ({per_tool})" if per_tool else ""
+        )
+
+    def clear(self) -> None:
+        self.read.clear()
+        self.returned.clear()
+
+
+record_stats = RecordStats()
+
+
+async def fetch_records(tool_name: str, table_name: str, params: Mapping[str, str | int | None]) -> Any:
+    "GET `_table/{table_name}` through the result cache with the bound credentials, counting the records read."
+    base_url, dream_factory_api_key = resolve_credentials()
+    payload = await result_cache.get(
+        url=f"{base_url}/_table/{table_name}", dream_factory_api_key=dream_factory_api_key, params=params
+    )
+    if (resource := resource_of(payload)) is not None:
+        record_stats.read[tool_name] += len(resource)
+    return payload
+
+
+def records_result(tool_name: str, payload: Any) -> Any:
+    "Count the records returned to the model and apply the result encoding."
+    if (resource := resource_of(payload)) is not None:
+        record_stats.returned[tool_name] += len(resource)
+    return encode_result(payload, current_result_encoding())
 
 
 @server.tool()
-def get_table_schema(
+async def get_table_schema(
     table_name: str, base_url: str | None = None, dream_factory_api_key: str | None = None
 ) -> dict[str, Any]:
     """Get the schema of a table.
@@ -85,16 +596,15 @@ def get_table_schema(
     dict
         The schema of the table
     """
-    base_url = base_url or os.environ["DREAM_FACTORY_BASE_URL"]
-    dream_factory_api_key = dream_factory_api_key or os.environ["DREAM_FACTORY_API_KEY"]
+    base_url, dream_factory_api_key = resolve_credentials(
+        base_url=base_url, dream_factory_api_key=dream_factory_api_key
+    )
     logger.info(f"Accessing schema for table {table_name} with API key {dream_factory_api_key}")
-    return httpx.get(
-        url=f"{base_url}/_schema/{table_name}", headers={"X-DreamFactory-API-Key": dream_factory_api_key}
-    ).json()
+    return await schema_snapshot(base_url=base_url, dream_factory_api_key=dream_factory_api_key).get(table_name)
 
 
 @server.tool()
-def get_table_records(
+async def get_table_records(
     table_name: str,
     filter: str = "",
     fields: str | list[str] = "*",
@@ -102,7 +612,8 @@ def get_table_records(
     offset: int = 0,
     order_field: str = "",
     related: str | list[str] = "",
-) -> dict[str, Any]:
+    continuation: str = "",
+) -> dict[str, Any] | str:
     """Get the records of a table.
 
     Parameters
@@ -126,11 +637,19 @@ def get_table_records(
         Names of related tables to join via foreign keys based on the schema
         (e.g. hr_employees_by_department_id). Can be a single table name as string,
         a list of table names, or '*' to include all related tables. Default is ''
+    continuation : str, optional
+        The `meta.next` token of a truncated result, to get its next page. The other
+        parameters are taken from the token. Default is ''
 
     Returns
     -------
-    dict
-        The records of the table
+    dict or str
+        The records of the table: `{"resource": [...]}`, or with a compact encoding
+        `{"format": "columnar", "columns": [...], "rows": [[...]], "related": {...}}` or CSV/TSV text.
+        Related objects appear once under `related` and rows refer to them by row number.
+        A result too large for one call is truncated and gets a `meta` entry with `truncated`,
+        `returned`, `count` (matching records from this offset on), `next` (the continuation token),
+        `summary` (min/max/mean of each numeric field) and `summary_rows` (the records the summary covers)
 
     Notes
     -----
@@ -171,18 +690,115 @@ def get_table_records(
     >>> # Range filtering
     >>> (Age >= 30) AND (Age < 40)
     """
-    return httpx.get(
-        **table_url_with_headers(table_name=table_name),
-        params=get_params(
-            filter=filter, fields=fields, limit=limit, offset=offset, order_field=order_field, related=related
+    if continuation:
+        try:
+            table_name, params, offset, stop = decode_continuation(continuation)
+        except ValueError as e:
+            return {"error": {"code": 400, "message": str(e)}}
+    else:
+        params = get_params(filter=filter, fields=fields, order_field=order_field, related=related)
+        stop = offset + limit if limit else None
+    return records_result("get_table_records", await read_pages(table_name, params, start=offset, stop=stop))
+
+
+def page_fetcher(
+    tool_name: str, table_name: str, params: Mapping[str, str | int | None], start: int
+) -> Callable[[int, int], Awaitable[Any]]:
+    "`fetch_page` for `stream_pages`; the first page asks for the total, so pages capped by the server keep going."
+
+    def fetch_page(offset: int, limit: int) -> Awaitable[Any]:
+        page_params = {**params, "limit": limit, "offset": offset}
+        if offset == start:
+            page_params["include_count"] = "true"
+        return fetch_records(tool_name, table_name, params=page_params)
+
+    return fetch_page
+
+
+async def read_pages(
+    table_name: str, params: Mapping[str, str | int | None], start: int, stop: int | None
+) -> dict[str, Any]:
+    """Stream the records from `start` to `stop` page by page and keep those that fit the bound budget.
+
+    Reading stops at the page that doesn't fit, unless SUMMARY_SCAN asks for the rest for the summary stats.
+    """
+    budget = current_result_budget()
+    fetch_page = page_fetcher("get_table_records", table_name, params, start)
+    max_rows = SUMMARY_MAX_ROWS if SUMMARY_SCAN else None
+    rows: list[Any] = []
+    size = 0
+    next_offset: int | None = None
+    total: int | None = None
+    summary = SummaryStats()
+    # closed on every early exit, so the page being prefetched is cancelled right away
+    async with aclosing(stream_pages(fetch_page, start, stop, page_size=PAGE_SIZE, max_rows=max_rows)) as pages:
+        async for payload in pages:
+            if (resource := resource_of(payload)) is None:
+                if next_offset is None:
+                    return payload
+                break
+            if total is None:
+                total = total_of(payload)
+            summary.add(resource)
+            if next_offset is not None:
+                continue
+            for record in resource:
+                record_size = len(json.dumps(record, separators=(",", ":"), default=str))
+                # always return at least one row, or a continuation could never make progress
+                if rows and (len(rows) >= budget.max_rows or size + record_size > budget.max_bytes):
+                    next_offset = start + len(rows)
+                    break
+                rows.append(record)
+                size += record_size
+            if next_offset is not None and not SUMMARY_SCAN:
+                break
+    if next_offset is None:
+        return {"resource": rows}
+    meta = {
+        "truncated": True,
+        "returned": len(rows),
+        "count": summary.rows,
+        "next": encode_continuation(table_name, params, next_offset, stop),
+        "summary": summary.to_json(),
+        "summary_rows": summary.rows,
+        "note": (
+            "Result too large for one call. Pass continuation=next for the next page, or narrow filter/fields, "
+            "or use count_table_records/aggregate_table_records."
         ),
-    ).json()
+    }
+    if total is not None:
+        meta["count"] = max((total if stop is None else min(total, stop)) - start, summary.rows)
+    elif not SUMMARY_SCAN or summary.rows >= SUMMARY_MAX_ROWS:
+        meta["count_is_lower_bound"] = True
+    return {"resource": rows, "meta": meta}
+
+
+async def scan_records(tool_name: str, table_name: str, params: Mapping[str, str | int | None]) -> dict[str, Any]:
+    "Every record matching `params`, page by page: `{'resource': [...]}`, a truncation error or the error payload."
+    rows: list[Any] = []
+    total: int | None = None
+    fetch_page = page_fetcher(tool_name, table_name, params, start=0)
+    async with aclosing(stream_pages(fetch_page, 0, None, page_size=PAGE_SIZE, max_rows=SCAN_MAX_ROWS)) as pages:
+        async for payload in pages:
+            if (resource := resource_of(payload)) is None:
+                return payload
+            if total is None:
+                total = total_of(payload)
+            rows.extend(resource)
+    if (total is not None and total > len(rows)) or (total is None and len(rows) >= SCAN_MAX_ROWS):
+        matching = f"{total} records" if total is not None else f"more than {SCAN_MAX_ROWS} records"
+        message = (
+            f"{table_name} has {matching} matching the filter and {tool_name} reads at most {SCAN_MAX_ROWS}; "
+            "narrow the filter"
+        )
+        return {"error": {"code": 413, "message": message, "truncated": True}}
+    return {"resource": rows}
 
 
 @server.tool()
-def get_table_records_by_ids(
+async def get_table_records_by_ids(
     table_name: str, ids: str | list[str], fields: str | list[str] = "*", related: str | list[str] = ""
-) -> dict[str, Any]:
+) -> dict[str, Any] | str:
     """Get one or more records from a table by their IDs.
 
     Parameters
@@ -200,12 +816,226 @@ def get_table_records_by_ids(
 
     Returns
     -------
-    dict
-        The records of the table
+    dict or str
+        The records of the table, encoded like `get_table_records`
     """
     params: dict[str, str | int | None] = {"ids": ids if isinstance(ids, str) else ",".join(ids)}
     params.update(get_params(fields=fields, related=related))
-    return httpx.get(**table_url_with_headers(table_name=table_name), params=params).json()
+    payload = await fetch_records("get_table_records_by_ids", table_name, params=params)
+    return records_result("get_table_records_by_ids", payload)
+
+
+@server.tool()
+async def count_table_records(table_name: str, filter: str = "") -> dict[str, Any]:
+    """Count the records of a table that match a filter, without fetching them.
+
+    Use this for "how many ..." questions instead of get_table_records.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table
+    filter : str, optional
+        The filter to apply, with the same syntax as get_table_records. Default is ''
+
+    Returns
+    -------
+    dict
+        {"count": n}
+
+    Examples
+    --------
+    >>> count_table_records("ops_machines", filter="status='Active'")
+    """
+    payload = await fetch_records(
+        "count_table_records", table_name, params={**get_params(filter=filter, fields=""), "count_only": "true"}
+    )
+    if isinstance(payload, int):
+        return {"count": payload}
+    # servers that ignore count_only still honor include_count
+    if isinstance(payload, dict) and isinstance(payload.get("meta"), dict) and "count" in payload["meta"]:
+        return {"count": payload["meta"]["count"]}
+    return payload
+
+
+@server.tool()
+async def get_distinct_values(table_name: str, field: str, filter: str = "") -> dict[str, Any]:
+    """Get the distinct values of one field of a table, without fetching whole records.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table
+    field : str
+        The field to get the distinct values of
+    filter : str, optional
+        The filter to apply first, with the same syntax as get_table_records. Default is ''
+
+    Returns
+    -------
+    dict
+        {"field": field, "values": [...], "count": number of distinct values}, values sorted. Every
+        matching record is read; a table over the scan limit gets an error with `truncated`
+
+    Examples
+    --------
+    >>> get_distinct_values("hr_employees", "department_id", filter="role='Manager'")
+    """
+    # every page of the one field, deduplicated here: with group= some services dedupe each page separately,
+    # so offsets over the grouped rows would skip or repeat records
+    payload = await scan_records(
+        "get_distinct_values", table_name, params=get_params(filter=filter, fields=field, order_field=field)
+    )
+    if (resource := resource_of(payload)) is None:
+        return payload
+    if resource and not any(field in r for r in resource):
+        return {"error": {"code": 400, "message": f"Unknown field {field!r}"}}
+    values = list(dict.fromkeys(r.get(field) for r in resource))
+    record_stats.returned["get_distinct_values"] += len(values)
+    return {"field": field, "values": values, "count": len(values)}
+
+
+@server.tool()
+async def aggregate_table_records(
+    table_name: str,
+    aggregations: str | list[str] = "count",
+    group_by: str | list[str] = "",
+    filter: str = "",
+) -> dict[str, Any] | str:
+    """Group the records of a table and aggregate them on the server, returning only the aggregated rows.
+
+    Use this instead of fetching records and passing their values to the calculate tools.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table to aggregate
+    aggregations : str or list[str], optional
+        Aggregations written as fn(column), where fn is one of count, sum, mean, min, max,
+        distinct_count. count or count(*) counts records. A comma separated string or a list.
+        Default is 'count'
+    group_by : str or list[str], optional
+        Fields to group by, as a comma separated string or a list. If empty, the whole
+        (filtered) table is one group. Default is ''
+    filter : str, optional
+        The filter to apply before aggregating, with the same syntax as get_table_records. Default is ''
+
+    Returns
+    -------
+    dict or str
+        One record per group with the group_by fields and one field per aggregation, named
+        fn_column (or count), encoded like get_table_records. Every matching record is read; a table
+        with more than the scan limit matching gets an error with `truncated`, never a partial aggregate
+
+    Examples
+    --------
+    >>> aggregate_table_records("finance_revenues", ["sum(revenue_amount)", "count"], group_by=["year", "quarter"])
+    >>> aggregate_table_records("ops_machines", "count", filter="status='Active'")
+    """
+    try:
+        parsed = parse_aggregations(aggregations)
+    except ValueError as e:
+        return {"error": {"code": 400, "message": str(e)}}
+    keys = split_names(group_by)
+    payload = await scan_records(
+        "aggregate_table_records",
+        table_name,
+        params=get_params(filter=filter, fields=source_fields(keys, parsed) or "*"),
+    )
+    if "resource" not in payload:
+        return payload
+    try:
+        rows = aggregate_records(payload["resource"], group_by=keys, aggregations=parsed)
+    except ValueError as e:
+        return {"error": {"code": 400, "message": str(e)}}
+    return records_result("aggregate_table_records", {"resource": rows})
+
+
+@server.tool()
+async def query_tables(
+    table_name: str,
+    joins: str | list[str] = "",
+    filter: str = "",
+    fields: str | list[str] = "*",
+    order_field: str = "",
+    limit: int | None = None,
+    how: str = "left",
+) -> dict[str, Any] | str:
+    """Query a table joined with related tables in one call, returning flat records.
+
+    Parameters
+    ----------
+    table_name : str
+        The base table
+    joins : str or list[str], optional
+        Relations to join, by their names in the `related` list of the base table's schema or of a
+        table joined before them (e.g. hr_departments_by_department_id). Default is ''
+    filter : str, optional
+        Filter on the base table, with the same syntax as get_table_records. Default is ''
+    fields : str or list[str], optional
+        Fields to return. Base table fields keep their names, joined fields are named
+        table.field (e.g. hr_departments.name). If *, all fields are returned. Default is '*'
+    order_field : str, optional
+        Field(s) to order by, with optional ASC or DESC, such as 'hr_departments.name DESC'. Default is ''
+    limit : int or None, optional
+        Max number of records to return, after ordering. Default is None
+    how : str, optional
+        'left' keeps base records without a match, 'inner' drops them. Default is 'left'
+
+    Returns
+    -------
+    dict or str
+        One flat record per (base record, match) pair, encoded like get_table_records. Every record of
+        each table is read; a table over the scan limit gets an error with `truncated`, never a partial join
+
+    Examples
+    --------
+    >>> query_tables("hr_employees", joins="hr_departments_by_department_id",
+    ...     fields=["first_name", "email", "hr_departments.name"], filter="role='Manager'")
+    """
+    if how not in get_args(JoinHow.__value__):
+        return {"error": {"code": 400, "message": f"Invalid join type {how!r}, expected left or inner"}}
+    snapshot = schema_snapshot()
+    schemas = {"": await snapshot.get(table_name)}
+    if "error" in schemas[""]:
+        return schemas[""]
+    aliases = {"": table_name.lower()}
+    joins_to_run: list[Join] = []
+    try:
+        for relation in split_names(joins):
+            join = resolve_join(relation, schemas=schemas, aliases=aliases)
+            joins_to_run.append(join)
+            aliases[join.alias] = join.ref_table
+            schemas[join.alias] = await snapshot.get(join.ref_table)
+            if "error" in schemas[join.alias]:
+                return schemas[join.alias]
+    except ValueError as e:
+        return {"error": {"code": 400, "message": str(e)}}
+
+    columns = needed_columns(split_names(fields), joins_to_run, order_field=order_field)
+
+    def fields_of(alias: str) -> str:
+        return "*" if columns is None else ",".join(columns.get(alias, []))
+
+    base, *joined = await asyncio.gather(
+        scan_records("query_tables", table_name, params=get_params(filter=filter, fields=fields_of(""))),
+        *(
+            scan_records("query_tables", join.ref_table, params=get_params(fields=fields_of(join.alias)))
+            for join in joins_to_run
+        ),
+    )
+    for payload in (base, *joined):
+        if "resource" not in payload:
+            return payload
+    rows = base["resource"]
+    try:
+        for join, payload in zip(joins_to_run, joined):
+            rows = hash_join(rows, join, payload["resource"], how=cast(JoinHow, how))
+        rows = order_rows(rows, order_field)[:limit] if limit else order_rows(rows, order_field)
+        rows = project(rows, split_names(fields))
+    except ValueError as e:
+        return {"error": {"code": 400, "message": str(e)}}
+    return records_result("query_tables", {"resource": rows})
 
 
 @server.tool()
@@ -222,7 +1052,7 @@ def calculate_sum(values: list[float]) -> float:
     float
         Sum of the input values
     """
-    return sum(values)
+    return math.fsum(values)
 
 
 @server.tool()
@@ -258,7 +1088,59 @@ def calculate_mean(values: list[float]) -> float:
     float
         Arithmetic mean of the input values
     """
-    return sum(values) / len(values)
+    if not values:
+        raise ValueError("Can't take the mean of an empty list")
+    return math.fsum(values) / len(values)
+
+
+@server.tool()
+def calculate_batch(
+    expressions: dict[str, str], arrays: dict[str, list[float | str]] | None = None
+) -> dict[str, Any]:
+    """Evaluate several named calculations over named arrays in one call.
+
+    Prefer this over several calculate_sum/calculate_difference/calculate_mean calls.
+
+    Parameters
+    ----------
+    expressions : dict[str, str]
+        Result name -> expression, evaluated in order. Expressions can use numbers, array names,
+        earlier result names, + - * / and parentheses, and these functions:
+        sum(x), mean(x), median(x), percentile(x, q), min(x), max(x), count(x),
+        ratio(a, b), percent_change(old, new), difference(a, b) (b - a),
+        date_diff(start, end) (days, from ISO dates). Arithmetic on arrays is element-wise.
+    arrays : dict[str, list[float | str]], optional
+        Array name -> values (numbers, or ISO dates for date_diff). Default is None
+
+    Returns
+    -------
+    dict
+        {"results": {name: value}}, plus {"errors": {name: message}} for expressions that failed
+
+    Examples
+    --------
+    >>> calculate_batch(
+    ...     expressions={"q3": "sum(q3_revenue)", "q4": "sum(q4_revenue)", "growth": "percent_change(q3, q4)"},
+    ...     arrays={"q3_revenue": [1200.5, 980.25], "q4_revenue": [1500.0, 1010.75]},
+    ... )
+    """
+    return calculate(expressions, arrays)
+
+
+DF_TOOLS: list[Callable[..., Any]] = [
+    get_table_schema,
+    get_table_records,
+    get_table_records_by_ids,
+    count_table_records,
+    get_distinct_values,
+    aggregate_table_records,
+    query_tables,
+    calculate_sum,
+    calculate_difference,
+    calculate_mean,
+    calculate_batch,
+]
+"The tools registered on `server`, for agents that call them in-process."
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+"""The "oracle" model: answers every case with its expected trajectory, to measure the harness without a model.
+
+Each request is matched to its case by the `<query>` in the user prompt. The oracle makes the case's expected tool
+calls in order, one per turn, then calls the output tool with the expected result, so a run costs only the harness:
+agent construction, df_mcp sessions, tool calls, evaluators and reporting. Cases whose expected trajectory no longer
+reproduces the expected answer show up as failed assertions.
+
+`evaluate` and `run_matrix` register the dataset's cases when the model is `oracle`.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any
+
+from pydantic import TypeAdapter
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_evals import Dataset
+
+ORACLE_MODEL = "oracle"
+
+QUERY_PATTERN = re.compile(r"<query>\n(.*?)\n</query>", re.DOTALL)
+
+
+@dataclass
+class OracleStats:
+    requests: int = 0
+    unknown_queries: int = 0
+    seconds: float = 0.0
+    "Time spent building responses, i.e. the 'model latency' of an oracle run."
+
+    def summary(self) -> str:
+        return (
+            f"Oracle: {self.requests} requests in {self.seconds * 1000:.1f}ms, "
+            f"{self.unknown_queries} for queries with no registered case"
+        )
+
+
+oracle_stats = OracleStats()
+
+_expected: dict[str, Any] = {}
+_expected_lock = threading.Lock()
+
+
+def register_oracle_cases(dataset: Dataset[Any, Any]) -> None:
+    "Make the expected outputs of `dataset` available to the oracle, keyed by query."
+    with _expected_lock:
+        for case in dataset.cases:
+            if case.expected_output is not None:
+                _expected[case.inputs.query] = case.expected_output
+
+
+def query_of(messages: list[ModelMessage]) -> str | None:
+    for message in messages:
+        if not isinstance(message, ModelRequest):
+            continue
+        for part in message.parts:
+            if (
+                isinstance(part, UserPromptPart)
+                and isinstance(part.content, str)
+                and (match := QUERY_PATTERN.search(part.content))
+            ):
+                return match.group(1)
+    return None
+
+
+def oracle_response(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    start = perf_counter()
+    try:
+        oracle_stats.requests += 1
+        query = query_of(messages)
+        with _expected_lock:
+            expected = _expected.get(query or "")
+        if expected is None:
+            oracle_stats.unknown_queries += 1
+            return ModelResponse(parts=[TextPart(content="The oracle has no expected output for this query.")])
+        turn = sum(isinstance(m, ModelResponse) for m in messages)
+        if turn < len(expected.tool_calls):
+            call = expected.tool_calls[turn]
+            return ModelResponse(
+                parts=[
+                    ToolCallPart(tool_name=call.tool_name, args=dict(call.params), tool_call_id=f"oracle-{turn}")
+                ]
+            )
+        output_tool = info.output_tools[0]
+        args = TypeAdapter(type(expected.result)).dump_python(expected.result, mode="json")
+        if output_tool.outer_typed_dict_key:
+            args = {output_tool.outer_typed_dict_key: args}
+        return ModelResponse(
+            parts=[ToolCallPart(tool_name=output_tool.name, args=args, tool_call_id=f"oracle-{turn}")]
+        )
+    finally:
+        oracle_stats.seconds += perf_counter() - start
+
+
+def oracle_model() -> FunctionModel:
+    return FunctionModel(oracle_response, model_name=ORACLE_MODEL)
@@ -0,0 +1,155 @@
+"""Paged reads for `df_mcp.get_table_records`: row/byte budgets, continuation tokens and streamed summary stats.
+
+Pages are fetched one ahead of the consumer, so the next request is in flight while the current page is processed
+and only one or two pages are held at a time. A result over budget is cut at the last row that fits; the count comes
+from the server and the per-column numeric min/max/mean from the rows read so far.
+"""
+
+import asyncio
+import base64
+import json
+import math
+from collections.abc import AsyncIterator, Awaitable, Callable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+type Params = dict[str, str | int | None]
+
+
+@dataclass(frozen=True, slots=True)
+class ResultBudget:
+    max_rows: int
+    max_bytes: int
+    "Size of the rows as compact JSON, a proxy for what the model will read."
+
+
+@dataclass(slots=True)
+class ColumnStats:
+    count: int = 0
+    min: float = math.inf
+    max: float = -math.inf
+    partial_sums: list[float] = field(default_factory=list)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.partial_sums.append(value)
+        if len(self.partial_sums) >= 1024:
+            self.partial_sums = [math.fsum(self.partial_sums)]
+
+    def to_json(self) -> dict[str, float]:
+        return {"min": self.min, "max": self.max, "mean": math.fsum(self.partial_sums) / self.count}
+
+
+def _number(value: Any) -> float | None:
+    "None for values that aren't numbers; DreamFactory returns some decimals as strings."
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int | float):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+@dataclass
+class SummaryStats:
+    "Row count and numeric min/max/mean per column, accumulated page by page."
+
+    rows: int = 0
+    columns: dict[str, ColumnStats] = field(default_factory=dict)
+    non_numeric: set[str] = field(default_factory=set)
+
+    def add(self, records: list[dict[str, Any]]) -> None:
+        self.rows += len(records)
+        for record in records:
+            for column, value in record.items():
+                if value is None or column in self.non_numeric:
+                    continue
+                if (number := _number(value)) is None:
+                    self.non_numeric.add(column)
+                    self.columns.pop(column, None)
+                    continue
+                self.columns.setdefault(column, ColumnStats()).add(number)
+
+    def to_json(self) -> dict[str, dict[str, float]]:
+        return {column: stats.to_json() for column, stats in self.columns.items()}
+
+
+def encode_continuation(
+    table_name: str, params: Mapping[str, str | int | None], offset: int, stop: int | None
+) -> str:
+    state = {"t": table_name, "p": dict(params), "o": offset, "s": stop}
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_continuation(token: str) -> tuple[str, Params, int, int | None]:
+    "The table, params (without limit/offset), next offset and end offset (None: to the end) of a token."
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return str(state["t"]), dict(state["p"]), int(state["o"]), None if state["s"] is None else int(state["s"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid continuation token: {e}")
+
+
+def total_of(payload: Any) -> int | None:
+    "`meta.count` of a page fetched with `include_count`: the records matching the filter, from offset 0."
+    meta = payload.get("meta") if isinstance(payload, dict) else None
+    count = meta.get("count") if isinstance(meta, dict) else None
+    return count if isinstance(count, int) else None
+
+
+def resource_of(payload: Any) -> list[Any] | None:
+    "The `resource` list of a `_table` response; None for errors and anything else."
+    return (
+        payload.get("resource")
+        if isinstance(payload, dict) and isinstance(payload.get("resource"), list)
+        else None
+    )
+
+
+async def stream_pages(
+    fetch_page: Callable[[int, int], Awaitable[Any]],
+    start: int,
+    stop: int | None,
+    page_size: int,
+    max_rows: int | None = None,
+) -> AsyncIterator[Any]:
+    """Yield `fetch_page(offset, limit)` payloads from `start` to `stop`, prefetching the next page.
+
+    Stops after an error payload, `stop`, `max_rows` rows, or a short page. When the first page carries a total
+    (`include_count`), a page short of `page_size` ends the stream only once the total is reached, so pages capped
+    by the server's maximum records per request don't look like the last one.
+    """
+
+    def limit_at(offset: int) -> int:
+        return page_size if stop is None else min(page_size, stop - offset)
+
+    if limit_at(start) <= 0:
+        return
+    offset = start
+    total: int | None = None
+    next_page: asyncio.Future[Any] | None = asyncio.ensure_future(fetch_page(offset, limit_at(offset)))
+    try:
+        while next_page is not None:
+            limit = limit_at(offset)
+            payload = await next_page
+            resource = resource_of(payload)
+            if offset == start:
+                total = total_of(payload)
+            offset += len(resource) if resource is not None else limit
+            more = bool(
+                resource
+                and (len(resource) == limit or (total is not None and offset < total))
+                and limit_at(offset) > 0
+                and (max_rows is None or offset - start < max_rows)
+            )
+            next_page = asyncio.ensure_future(fetch_page(offset, limit_at(offset))) if more else None
+            yield payload
+    finally:
+        if next_page is not None and not next_page.done():
+            next_page.cancel()
@@ -0,0 +1,125 @@
+"""Declarative cross-table queries for `df_mcp.query_tables`: joins through the schema's `related` relationships.
+
+Joined columns are named `table.column` (or `relation.column` when a table is joined twice), base columns keep
+their names. Joins are hash joins over the fetched records, so each table is fetched once, concurrently.
+"""
+
+from collections import defaultdict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, Literal
+
+type JoinHow = Literal["left", "inner"]
+type Record = dict[str, Any]
+
+JOIN_TYPES = ("belongs_to", "has_many")
+
+
+@dataclass(frozen=True, slots=True)
+class Join:
+    relation: str
+    from_alias: str
+    "Alias of the table the relation belongs to: '' for the base table."
+    field: str
+    ref_table: str
+    ref_field: str
+    alias: str
+
+
+def _column(alias: str, column: str) -> str:
+    return f"{alias}.{column}" if alias else column
+
+
+def find_relation(schema: Mapping[str, Any], relation: str) -> dict[str, Any] | None:
+    return next((r for r in schema.get("related", []) if r["name"].lower() == relation.lower()), None)
+
+
+def resolve_join(relation: str, schemas: Mapping[str, Mapping[str, Any]], aliases: Mapping[str, str]) -> Join:
+    """Find `relation` on the base table or a table joined so far.
+
+    `schemas` is keyed by alias ('' for the base table), `aliases` maps each alias to its table name.
+    """
+    for from_alias, schema in schemas.items():
+        if (related := find_relation(schema, relation)) is None:
+            continue
+        if related.get("is_virtual"):
+            raise ValueError(f"{relation} is on another service; use related={relation!r} in get_table_records")
+        if related["type"] not in JOIN_TYPES:
+            raise ValueError(
+                f"{relation} is a {related['type']} relation, only {', '.join(JOIN_TYPES)} are supported"
+            )
+        ref_table = related["ref_table"].lower()
+        alias = ref_table if ref_table not in aliases.values() else related["name"].lower()
+        return Join(
+            relation=related["name"],
+            from_alias=from_alias,
+            field=related["field"][0] if isinstance(related["field"], list) else related["field"],
+            ref_table=ref_table,
+            ref_field=related["ref_field"][0] if isinstance(related["ref_field"], list) else related["ref_field"],
+            alias=alias,
+        )
+    raise ValueError(f"Unknown relation {relation!r}; it must be in the `related` list of a table in the query")
+
+
+def _key(value: Any) -> Any:
+    # DreamFactory may return a key as an int on one side and a string on the other
+    return None if value is None else str(value)
+
+
+def hash_join(rows: list[Record], join: Join, right: list[Record], how: JoinHow = "left") -> list[Record]:
+    index: dict[Any, list[Record]] = defaultdict(list)
+    for record in right:
+        index[_key(record.get(join.ref_field))].append(record)
+    right_columns = list(dict.fromkeys(c for r in right for c in r))
+    left_key = _column(join.from_alias, join.field)
+    joined: list[Record] = []
+    for row in rows:
+        key = _key(row.get(left_key))
+        matches = index.get(key, []) if key is not None else []
+        if not matches and how == "left":
+            joined.append(row | {_column(join.alias, c): None for c in right_columns})
+        for match in matches:
+            joined.append(row | {_column(join.alias, c): v for c, v in match.items()})
+    return joined
+
+
+def order_rows(rows: list[Record], order_field: str) -> list[Record]:
+    "Sort by 'col [ASC|DESC], ...' with nulls last, like DreamFactory's `order`."
+    clauses = [c.strip().rsplit(" ", 1) for c in order_field.split(",") if c.strip()]
+    for clause in reversed(clauses):
+        column = clause[0].strip()
+        descending = len(clause) == 2 and clause[1].upper() == "DESC"
+        if len(clause) == 2 and clause[1].upper() not in ("ASC", "DESC"):
+            column = " ".join(clause)
+        if rows and not any(column in r for r in rows):
+            raise ValueError(f"Unknown order field {column!r}")
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        rows = sorted(present, key=lambda r: r[column], reverse=descending) + missing
+    return rows
+
+
+def project(rows: list[Record], fields: Sequence[str]) -> list[Record]:
+    if not fields or "*" in fields:
+        return rows
+    if rows and (unknown := [f for f in fields if not any(f in r for r in rows)]):
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return [{f: r.get(f) for f in fields} for r in rows]
+
+
+def needed_columns(
+    fields: Sequence[str], joins: Sequence[Join], order_field: str = ""
+) -> dict[str, list[str]] | None:
+    "Columns to fetch per alias, or None when every column is needed."
+    if not fields or "*" in fields:
+        return None
+    needed: dict[str, list[str]] = defaultdict(list)
+    aliases = {"", *(j.alias for j in joins)}
+    order_columns = [c.strip().split(" ")[0] for c in order_field.split(",") if c.strip()]
+    for name in [*fields, *order_columns]:
+        alias, _, column = name.rpartition(".")
+        needed[alias if alias in aliases else ""].append(column if alias in aliases else name)
+    for join in joins:
+        needed[join.from_alias].append(join.field)
+        needed[join.alias].append(join.ref_field)
+    return {alias: list(dict.fromkeys(columns)) for alias, columns in needed.items()}
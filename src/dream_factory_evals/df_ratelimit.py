@@ -0,0 +1,287 @@
+"""Per-provider rate limiting for model requests: RPM/TPM token buckets and AIMD concurrency.
+
+`setup_model` wraps each model in a `RateLimitedModel` keyed by its provider (openrouter, openai, anthropic,
+google-gla, sglang, ...). Limiters are process-wide, so every case, run and chat session that talks to a provider
+shares its budget. Limits come from the environment, per provider first:
+
+    RATE_LIMIT_RPM_OPENROUTER=120 RATE_LIMIT_TPM_OPENROUTER=400000 RATE_LIMIT_CONCURRENCY_OPENROUTER=16
+    RATE_LIMIT_RPM=0 (0: no limit) RATE_LIMIT_TPM=0 RATE_LIMIT_CONCURRENCY=8
+
+Concurrency starts at RATE_LIMIT_INITIAL_CONCURRENCY and adapts AIMD-style: +1/limit per successful request,
+halved on a 429/503/529 (at most once per cooldown), and x0.9 when a request is much slower than the recent average.
+Throttled requests are retried here with exponential backoff before the error reaches the caller.
+
+State is guarded by a threading lock and waits are plain sleeps, so it works across event loops (Streamlit runs
+each chat message with its own `asyncio.run`).
+"""
+
+import asyncio
+import os
+import random
+import threading
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from time import monotonic
+
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import KnownModelName, Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from dream_factory_evals.df_tokens import estimate_tokens
+
+INITIAL_CONCURRENCY = int(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "2"))
+BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+DECREASE_COOLDOWN = 2.0
+SLOW_REQUEST_FACTOR = 3.0
+POLL_INTERVAL = 0.05
+THROTTLE_STATUS_CODES = (429, 503, 529)
+
+
+def provider_setting(name: str, provider: str, default: str) -> str:
+    "RATE_LIMIT_{name}_{PROVIDER}, else RATE_LIMIT_{name}, else `default`."
+    key = provider.upper().replace("-", "_")
+    return os.getenv(f"RATE_LIMIT_{name}_{key}") or os.getenv(f"RATE_LIMIT_{name}", default)
+
+
+def provider_of(model: str) -> str:
+    "The provider prefix of a model name ('openai' for 'openai:gpt-4.1'), or 'sglang' for self-hosted models."
+    provider, _, name = model.partition(":")
+    return provider if name else "sglang"
+
+
+def is_throttle(error: BaseException) -> bool:
+    return isinstance(error, ModelHTTPError) and error.status_code in THROTTLE_STATUS_CODES
+
+
+@dataclass
+class TokenBucket:
+    """Refills `per_minute` units per minute up to `per_minute`; 0 means unlimited.
+
+    `reserve` takes the units right away (the balance may go negative) and says how long to wait, so callers are
+    served in order without polling.
+    """
+
+    per_minute: float
+    _balance: float = field(init=False)
+    _updated: float = field(default_factory=monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        self._balance = self.per_minute
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._balance = min(self.per_minute, self._balance + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        "Seconds to wait before using `amount`."
+        if self.per_minute <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._balance -= amount
+            return max(0.0, -self._balance * 60 / self.per_minute)
+
+    def adjust(self, amount: float) -> None:
+        "Take `amount` more (or give back a negative amount) once the real usage is known."
+        if self.per_minute <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._balance = min(self.per_minute, self._balance - amount)
+
+
+@dataclass
+class AdaptiveConcurrency:
+    "AIMD limit on in-flight requests, between 1 and `max_limit`."
+
+    max_limit: int
+    limit: float = 0.0
+    in_flight: int = 0
+    latency: float | None = None
+    "Exponentially weighted average of request latency, in seconds."
+    _last_decrease: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        self.limit = self.limit or float(min(INITIAL_CONCURRENCY, self.max_limit))
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= max(1, int(self.limit)):
+                return False
+            self.in_flight += 1
+            return True
+
+    async def acquire(self) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _decrease(self, factor: float) -> None:
+        now = monotonic()
+        # one decrease per cooldown: a burst of 429s from the same window is one congestion signal
+        if now - self._last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(1.0, self.limit * factor)
+            self._last_decrease = now
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            if self.latency is not None and latency > SLOW_REQUEST_FACTOR * self.latency:
+                self._decrease(0.9)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self._decrease(0.5)
+
+
+@dataclass
+class LimiterStats:
+    requests: int = 0
+    throttled: int = 0
+    retries: int = 0
+    wait_seconds: float = 0.0
+
+
+@dataclass
+class RequestSlot:
+    estimated_tokens: int
+    total_tokens: int | None = None
+    "Set from the response usage, to correct the TPM bucket."
+
+
+@dataclass
+class ProviderLimiter:
+    provider: str
+    requests_per_minute: TokenBucket
+    tokens_per_minute: TokenBucket
+    concurrency: AdaptiveConcurrency
+    stats: LimiterStats = field(default_factory=LimiterStats)
+
+    @classmethod
+    def from_env(cls, provider: str) -> "ProviderLimiter":
+        return cls(
+            provider=provider,
+            requests_per_minute=TokenBucket(float(provider_setting("RPM", provider, "0"))),
+            tokens_per_minute=TokenBucket(float(provider_setting("TPM", provider, "0"))),
+            concurrency=AdaptiveConcurrency(max_limit=int(provider_setting("CONCURRENCY", provider, "8"))),
+        )
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator[RequestSlot]:
+        waited = monotonic()
+        await self.concurrency.acquire()
+        try:
+            delay = max(self.requests_per_minute.reserve(1), self.tokens_per_minute.reserve(estimated_tokens))
+            if delay:
+                await asyncio.sleep(delay)
+            self.stats.wait_seconds += monotonic() - waited
+            self.stats.requests += 1
+            slot = RequestSlot(estimated_tokens=estimated_tokens)
+            start = monotonic()
+            try:
+                yield slot
+            except BaseException as e:
+                if is_throttle(e):
+                    self.stats.throttled += 1
+                    self.concurrency.on_throttle()
+                raise
+            self.concurrency.on_success(monotonic() - start)
+            if slot.total_tokens is not None:
+                self.tokens_per_minute.adjust(slot.total_tokens - estimated_tokens)
+        finally:
+            self.concurrency.release()
+
+    def summary(self) -> str:
+        return (
+            f"Rate limiter {self.provider}: {self.stats.requests} requests, {self.stats.throttled} throttled, "
+            f"{self.stats.retries} retried, {self.stats.wait_seconds:.1f}s waiting; "
+            f"concurrency limit {self.concurrency.limit:.1f}/{self.concurrency.max_limit}"
+        )
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def provider_limiter(provider: str) -> ProviderLimiter:
+    "The process-wide limiter of `provider`."
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter.from_env(provider)
+        return _limiters[provider]
+
+
+def limiter_summaries() -> list[str]:
+    with _limiters_lock:
+        return [limiter.summary() for limiter in _limiters.values()]
+
+
+def estimate_request_tokens(messages: list[ModelMessage], model_settings: ModelSettings | None) -> int:
+    "Prompt tokens of `messages` plus the output allowance, for the TPM bucket until the real usage is known."
+    text = "".join(
+        str(getattr(part, "content", "") or getattr(part, "args", "")) for m in messages for part in m.parts
+    )
+    return estimate_tokens(text) + int((model_settings or {}).get("max_tokens", 0))
+
+
+def backoff(attempt: int) -> float:
+    "Exponential backoff with full jitter."
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE ** (attempt + 1)))
+
+
+class RateLimitedModel(WrapperModel):
+    "Sends every request of the wrapped model through its provider's limiter and retries throttled requests."
+
+    def __init__(self, wrapped: Model | KnownModelName, provider: str):
+        super().__init__(wrapped)
+        self.limiter = provider_limiter(provider)
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        estimated = estimate_request_tokens(messages, model_settings)
+        attempt = 0
+        while True:
+            try:
+                async with self.limiter.slot(estimated) as slot:
+                    response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+                    slot.total_tokens = response.usage.total_tokens
+                    return response
+            except ModelHTTPError as e:
+                if not is_throttle(e) or attempt >= MAX_RETRIES:
+                    raise
+                self.limiter.stats.retries += 1
+                await asyncio.sleep(backoff(attempt))
+                attempt += 1
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        # a stream can't be retried once it has been handed out
+        async with self.limiter.slot(estimate_request_tokens(messages, model_settings)) as slot:
+            async with self.wrapped.request_stream(messages, model_settings, model_request_parameters) as stream:
+                yield stream
+            slot.total_tokens = stream.usage().total_tokens
+
+    def __repr__(self) -> str:
+        return f"RateLimitedModel({self.wrapped!r}, provider={self.limiter.provider!r})"
@@ -0,0 +1,33 @@
+"""Compact schema digests inlined into the task prompt, so models can skip `get_table_schema` round trips.
+
+hr_employees(employee_id integer PK, email string, department_id reference FK->hr_departments.department_id)
+  related: hr_departments_by_department_id
+"""
+
+from functools import lru_cache
+from typing import Any
+
+from dream_factory_evals.df_local import data_dir, load_schemas
+
+
+def column_digest(field: dict[str, Any]) -> str:
+    parts = [field["name"], field["type"]]
+    if field.get("is_primary_key"):
+        parts.append("PK")
+    if field.get("is_foreign_key") and field.get("ref_table"):
+        parts.append(f"FK->{field['ref_table']}.{field['ref_field']}")
+    return " ".join(parts)
+
+
+def table_digest(schema: dict[str, Any]) -> str:
+    digest = f"{schema['name']}({', '.join(column_digest(f) for f in schema['field'])})"
+    if related := [r["name"] for r in schema.get("related", [])]:
+        digest += f"\n  related: {', '.join(related)}"
+    return digest
+
+
+@lru_cache(maxsize=16)
+def schema_digest(table_names: tuple[str, ...], new: bool = False) -> str:
+    "Digest of `table_names` from the `data/` or `new_data/` schema, computed once per table set and data version."
+    schemas = load_schemas(data_dir(new=new))
+    return "\n".join(table_digest(schemas[t.lower()]) for t in table_names if t.lower() in schemas)
@@ -0,0 +1,23 @@
+import importlib.util
+import math
+from functools import lru_cache
+from typing import Any
+
+CHARS_PER_TOKEN = 4.0
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    if importlib.util.find_spec("tiktoken") is None:
+        return None
+    import tiktoken
+
+    return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    "Tokens in `text`: exact with `tiktoken` installed, otherwise ~4 characters per token."
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,214 @@
+import asyncio
+import statistics
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Self
+
+import anyio
+from loguru import logger
+from mcp.shared.exceptions import McpError
+from pydantic_ai.mcp import MCPServerStdio
+
+MODULE_DIR = Path(__file__).parent
+
+HEALTH_CHECK_TIMEOUT = 5.0
+HEALTH_CHECK_INTERVAL = 30.0
+SERVER_ERRORS = (TimeoutError, McpError, OSError, anyio.BrokenResourceError, anyio.ClosedResourceError)
+"How a df_mcp server fails to start or answer: it times out, reports an MCP error, can't be spawned, or exits."
+
+type PoolKey = tuple[str, str]
+"(base URL, role API key)"
+
+
+def df_mcp_server(base_url: str, dream_factory_api_key: str, env: dict[str, str] | None = None) -> MCPServerStdio:
+    "`env` adds df_mcp settings such as DREAM_FACTORY_SCHEMA_WARM_TABLES."
+    return MCPServerStdio(
+        command="uv",
+        args=["run", str(MODULE_DIR / "df_mcp.py")],
+        env={"DREAM_FACTORY_BASE_URL": base_url, "DREAM_FACTORY_API_KEY": dream_factory_api_key} | (env or {}),
+    )
+
+
+async def is_healthy(server: MCPServerStdio, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+    try:
+        async with asyncio.timeout(timeout):
+            await server.list_tools()
+        return True
+    except SERVER_ERRORS as e:
+        logger.warning(f"MCP server health check failed: {e}")
+        return False
+
+
+@dataclass
+class StartupTimings:
+    "Seconds spent getting a ready MCP session, per lease and per server start."
+
+    lease_seconds: list[float] = field(default_factory=list)
+    start_seconds: list[float] = field(default_factory=list)
+
+    def summary(self) -> str:
+        if not self.lease_seconds:
+            return "MCP startup: no sessions leased"
+        return (
+            f"MCP startup per case: mean {statistics.fmean(self.lease_seconds):.3f}s, "
+            f"max {max(self.lease_seconds):.3f}s over {len(self.lease_seconds)} leases; "
+            f"{len(self.start_seconds)} server starts totalling {sum(self.start_seconds):.3f}s"
+        )
+
+
+@dataclass
+class _PooledServer:
+    key: PoolKey
+    server: MCPServerStdio | None = None
+    error: BaseException | None = None
+    last_checked: float = 0.0
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    restart: asyncio.Event = field(default_factory=asyncio.Event)
+    supervisor: asyncio.Task[None] | None = None
+
+
+@dataclass
+class MCPServerPool:
+    """Long-lived df_mcp sessions keyed by (base URL, role API key), leased to cases and retries.
+
+    Each server is entered and exited by its own supervisor task, so leases from any task are safe.
+    With `enabled=False` every lease spawns a fresh server, which is how startup cost was measured before pooling.
+    """
+
+    enabled: bool = True
+    health_check_interval: float = HEALTH_CHECK_INTERVAL
+    server_env: dict[str, str] = field(default_factory=dict)
+    key_env: dict[PoolKey, dict[str, str]] = field(default_factory=dict)
+    "Settings for one key on top of `server_env`, e.g. the role's tables to warm."
+    timings: StartupTimings = field(default_factory=StartupTimings)
+    _slots: dict[PoolKey, _PooledServer] = field(default_factory=dict)
+    _closing: bool = False
+
+    async def _supervise(self, slot: _PooledServer) -> None:
+        try:
+            while not self._closing:
+                start = perf_counter()
+                try:
+                    async with df_mcp_server(*slot.key, env=self._env(slot.key)) as server:
+                        self.timings.start_seconds.append(perf_counter() - start)
+                        slot.server, slot.error, slot.last_checked = server, None, perf_counter()
+                        slot.ready.set()
+                        await slot.restart.wait()
+                except SERVER_ERRORS as e:
+                    logger.exception(f"MCP server for {slot.key[0]} failed")
+                    slot.server, slot.error = None, e
+                    slot.ready.set()
+                    await slot.restart.wait()
+                finally:
+                    slot.server = None
+                    slot.restart.clear()
+                    if not self._closing:
+                        slot.ready.clear()
+        except Exception as e:  # noqa: BLE001 - any error ends the supervisor; leases must get it, not wait forever
+            logger.exception(f"MCP server supervisor for {slot.key[0]} failed")
+            slot.server, slot.error = None, e
+            slot.ready.set()
+
+    def _env(self, key: PoolKey) -> dict[str, str]:
+        return self.server_env | self.key_env.get(key, {})
+
+    async def start(self, base_url: str, dream_factory_api_key: str, env: dict[str, str] | None = None) -> None:
+        key = (base_url, dream_factory_api_key)
+        if env is not None:
+            self.key_env[key] = env
+        if not self.enabled or key in self._slots:
+            return
+        slot = _PooledServer(key=key)
+        slot.supervisor = asyncio.create_task(self._supervise(slot), name=f"mcp_pool:{base_url}")
+        self._slots[key] = slot
+        await slot.ready.wait()
+
+    async def _ready_server(self, key: PoolKey) -> MCPServerStdio:
+        await self.start(*key)
+        slot = self._slots[key]
+        await slot.ready.wait()
+        if slot.server is not None and perf_counter() - slot.last_checked > self.health_check_interval:
+            if await is_healthy(slot.server):
+                slot.last_checked = perf_counter()
+            else:
+                logger.warning(f"Restarting unhealthy MCP server for {key[0]}")
+                slot.ready.clear()
+                slot.restart.set()
+                await slot.ready.wait()
+        if slot.server is None:
+            # give the next lease a fresh attempt instead of failing forever
+            if slot.supervisor is not None and slot.supervisor.done():
+                del self._slots[key]
+            elif slot.error is not None:
+                slot.ready.clear()
+                slot.restart.set()
+            raise RuntimeError(f"MCP server for {key[0]} is unavailable: {slot.error}") from slot.error
+        return slot.server
+
+    @asynccontextmanager
+    async def lease(self, base_url: str, dream_factory_api_key: str) -> AsyncIterator[MCPServerStdio]:
+        start = perf_counter()
+        if not self.enabled:
+            async with df_mcp_server(
+                base_url=base_url,
+                dream_factory_api_key=dream_factory_api_key,
+                env=self._env((base_url, dream_factory_api_key)),
+            ) as server:
+                elapsed = perf_counter() - start
+                self.timings.start_seconds.append(elapsed)
+                self.timings.lease_seconds.append(elapsed)
+                yield server
+            return
+        server = await self._ready_server((base_url, dream_factory_api_key))
+        self.timings.lease_seconds.append(perf_counter() - start)
+        yield server
+
+    async def close(self) -> None:
+        self._closing = True
+        for slot in self._slots.values():
+            slot.restart.set()
+        await asyncio.gather(*(s.supervisor for s in self._slots.values() if s.supervisor), return_exceptions=True)
+        self._slots.clear()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+
+_current_pool: ContextVar[MCPServerPool | None] = ContextVar("current_mcp_pool", default=None)
+
+
+def current_pool() -> MCPServerPool | None:
+    return _current_pool.get()
+
+
+@asynccontextmanager
+async def mcp_server_pool(
+    keys: list[PoolKey] | None = None, enabled: bool = True, server_env: dict[str, str] | None = None
+) -> AsyncIterator[MCPServerPool]:
+    "Start a pool for the given keys and make it the current pool for every task spawned inside the block."
+    async with MCPServerPool(enabled=enabled, server_env=server_env or {}) as pool:
+        await asyncio.gather(*(pool.start(*key) for key in keys or []))
+        token = _current_pool.set(pool)
+        try:
+            yield pool
+        finally:
+            _current_pool.reset(token)
+
+
+@asynccontextmanager
+async def mcp_session(base_url: str, dream_factory_api_key: str) -> AsyncIterator[MCPServerStdio]:
+    "Lease from the current pool, or run a one-off server when there is no pool (e.g. chat)."
+    pool = current_pool()
+    if pool is None:
+        async with df_mcp_server(base_url=base_url, dream_factory_api_key=dream_factory_api_key) as server:
+            yield server
+        return
+    async with pool.lease(base_url=base_url, dream_factory_api_key=dream_factory_api_key) as server:
+        yield server
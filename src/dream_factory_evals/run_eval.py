@@ -2,18 +2,22 @@
 from __future__ import annotations
 
 import asyncio
-import importlib
 import os
-import sys
 from pathlib import Path
-from typing import get_args
+from typing import cast, get_args
 
 import typer
 from dotenv import load_dotenv
 from loguru import logger
 from pydantic_ai.models import KnownModelName
 
-from dream_factory_evals.df_agent import ReportInfo, Role, TaskConfig, evaluate
+from dream_factory_evals.df_agent import MCPTransport, ReportInfo, Role, TaskConfig, evaluate
+from dream_factory_evals.df_cassette import CassetteMode
+from dream_factory_evals.df_completions import CompletionsMode
+from dream_factory_evals.df_encoding import ResultEncoding
+from dream_factory_evals.df_matrix import MatrixPlan, load_dataset, matrix_summary
+from dream_factory_evals.df_matrix import run_matrix as run_plan
+from dream_factory_evals.df_mcp import MAX_RESULT_BYTES, MAX_RESULT_ROWS
 
 load_dotenv()
 
@@ -56,6 +60,37 @@ def run(
     #     [], help="MCP servers to use (e.g., @modelcontextprotocol/server-sequential-thinking)"
     # ),
     think: bool = typer.Option(False, help="Enable think tool"),
+    pool_mcp: bool = typer.Option(True, help="Reuse long-lived df_mcp servers across cases and retries"),
+    mcp_transport: str = typer.Option("stdio", help="How the agent reaches the df_mcp tools: stdio or in_process"),
+    warm_schemas: bool = typer.Option(False, help="Load every available table's schema in parallel at startup"),
+    schemas_from_fixtures: bool = typer.Option(
+        False, help="With --warm-schemas, read schemas from data/ (or new_data/) instead of DreamFactory"
+    ),
+    inline_schemas: bool = typer.Option(
+        False, help="Inline a schema digest of the available tables in the prompt"
+    ),
+    result_encoding: str = typer.Option(
+        "json", help="Record results sent to the model: json, columnar, csv or tsv"
+    ),
+    max_result_rows: int = typer.Option(
+        MAX_RESULT_ROWS,
+        help="Rows per get_table_records call before it truncates and returns a continuation token",
+    ),
+    max_result_bytes: int = typer.Option(
+        MAX_RESULT_BYTES, help="Bytes (as JSON) per get_table_records call before it truncates"
+    ),
+    max_concurrency: int | None = typer.Option(
+        None, help="Cases run at once (default: all; model requests are still rate limited per provider)"
+    ),
+    resume: bool = typer.Option(False, help="Reuse cases already finished in this report's checkpoint"),
+    cassette: str = typer.Option("", help="Directory to record DreamFactory responses to or replay them from"),
+    cassette_mode: str = typer.Option(
+        "replay", help="record: call DreamFactory and save responses; replay: serve them with no network"
+    ),
+    completions: str = typer.Option("", help="Directory to record model completions to or replay them from"),
+    completions_mode: str = typer.Option(
+        "replay", help="record: call the model and save its responses; replay: serve them without calling it"
+    ),
 ):
     """Run evaluations for a specific model, role, and level."""
 
@@ -74,10 +109,53 @@ def run(
         logger.error(f"Invalid level: {level}. Valid levels: 1, 2, 3, 4")
         raise typer.Exit(1)
 
+    valid_transports = get_args(MCPTransport.__value__)
+    if mcp_transport not in valid_transports:
+        logger.error(f"Invalid MCP transport: {mcp_transport}. Valid transports: {', '.join(valid_transports)}")
+        raise typer.Exit(1)
+
+    valid_encodings = get_args(ResultEncoding.__value__)
+    if result_encoding not in valid_encodings:
+        logger.error(f"Invalid result encoding: {result_encoding}. Valid encodings: {', '.join(valid_encodings)}")
+        raise typer.Exit(1)
+
+    valid_cassette_modes = get_args(CassetteMode.__value__)
+    if cassette_mode not in valid_cassette_modes:
+        logger.error(f"Invalid cassette mode: {cassette_mode}. Valid modes: {', '.join(valid_cassette_modes)}")
+        raise typer.Exit(1)
+
+    valid_completions_modes = get_args(CompletionsMode.__value__)
+    if completions_mode not in valid_completions_modes:
+        logger.error(
+            f"Invalid completions mode: {completions_mode}. Valid modes: {', '.join(valid_completions_modes)}"
+        )
+        raise typer.Exit(1)
+
     # Run evaluation
     asyncio.run(
         _run_evaluation(
-            model.replace("/", ":"), role, level, report_name, prompt_name, max_tool_calls, retries, think
+            model.replace("/", ":"),
+            role,
+            level,
+            report_name,
+            prompt_name,
+            max_tool_calls,
+            retries,
+            think,
+            pool_mcp,
+            cast(MCPTransport, mcp_transport),
+            warm_schemas,
+            schemas_from_fixtures,
+            inline_schemas,
+            cast(ResultEncoding, result_encoding),
+            max_result_rows,
+            max_result_bytes,
+            max_concurrency,
+            resume,
+            cassette,
+            cast(CassetteMode, cassette_mode),
+            completions,
+            cast(CompletionsMode, completions_mode),
         )
     )
 
@@ -92,6 +170,20 @@ async def _run_evaluation(
     retries: int,
     # mcp_servers: list[str],
     think: bool,
+    pool_mcp: bool,
+    mcp_transport: MCPTransport,
+    warm_schemas: bool,
+    schemas_from_fixtures: bool,
+    inline_schemas: bool,
+    result_encoding: ResultEncoding,
+    max_result_rows: int,
+    max_result_bytes: int,
+    max_concurrency: int | None,
+    resume: bool,
+    cassette: str,
+    cassette_mode: CassetteMode,
+    completions: str,
+    completions_mode: CompletionsMode,
 ):
     """Run the actual evaluation."""
     # Dynamic import of the dataset
@@ -100,14 +192,7 @@ async def _run_evaluation(
 
     try:
         logger.info(f"Importing {dataset_name} from {module_path}")
-
-        # Add project root to Python path so we can import from evals
-        project_root = Path(__file__).parent.parent.parent
-        if str(project_root) not in sys.path:
-            sys.path.insert(0, str(project_root))
-
-        module = importlib.import_module(module_path)
-        dataset = getattr(module, dataset_name)
+        dataset = load_dataset(role, level)
 
         # Convert role string to Role enum
         user_role = Role(role)
@@ -126,6 +211,19 @@ async def _run_evaluation(
             retries=retries,
             # mcp_servers=mcp_server_objects if mcp_server_objects else None,
             think=think,
+            pool_mcp_servers=pool_mcp,
+            mcp_transport=mcp_transport,
+            warm_schemas=warm_schemas,
+            schemas_from_fixtures=schemas_from_fixtures,
+            inline_schemas=inline_schemas,
+            result_encoding=result_encoding,
+            max_result_rows=max_result_rows,
+            max_result_bytes=max_result_bytes,
+            max_concurrency=max_concurrency,
+            cassette=cassette,
+            cassette_mode=cassette_mode,
+            completions=completions,
+            completions_mode=completions_mode,
         )
 
         # Create report info
@@ -139,7 +237,7 @@ async def _run_evaluation(
 
         # Run evaluation
         logger.info(f"Running evaluation: {report_info.name}")
-        _ = await evaluate(report_info=report_info, dataset=dataset, task_config=task_config)
+        _ = await evaluate(report_info=report_info, dataset=dataset, task_config=task_config, resume=resume)
 
         logger.success(f"Evaluation completed successfully: {report_info.name}")
 
@@ -155,6 +253,32 @@ async def _run_evaluation(
         raise typer.Exit(1)
 
 
+@app.command()
+def run_matrix(
+    plan_file: Path = typer.Argument(
+        help="Plan file (.json or .toml) with models, roles, levels, prompts and think"
+    ),
+    pool_mcp: bool = typer.Option(True, help="Reuse long-lived df_mcp servers across the whole matrix"),
+    resume: bool = typer.Option(False, help="Reuse cases already finished in each run's checkpoint"),
+):
+    """Run every model x role x level (x prompt x think) of a plan in one process and write one combined report."""
+    try:
+        plan = MatrixPlan.from_file(plan_file)
+    except (OSError, ValueError) as e:
+        logger.error(f"Invalid plan file {plan_file}: {e}")
+        raise typer.Exit(1)
+    if invalid_levels := [level for level in plan.levels if level not in [1, 2, 3, 4]]:
+        logger.error(f"Invalid levels: {invalid_levels}. Valid levels: 1, 2, 3, 4")
+        raise typer.Exit(1)
+    valid_roles = get_valid_roles()
+    if invalid_roles := [role.value for role in plan.roles if role.value not in valid_roles]:
+        logger.error(f"Invalid roles: {invalid_roles}. Valid roles: {', '.join(valid_roles)}")
+        raise typer.Exit(1)
+
+    scores = asyncio.run(run_plan(plan, pool_mcp=pool_mcp, resume=resume))
+    typer.echo(matrix_summary(scores).to_string(index=False))
+
+
 @app.command()
 def list_models():
     """List all available models."""
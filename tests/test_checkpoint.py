@@ -0,0 +1,19 @@
+from pathlib import Path
+
+from dream_factory_evals.df_checkpoint import Checkpoint
+
+
+def test_append_after_torn_line(tmp_path: Path) -> None:
+    checkpoint = Checkpoint(report_name="report", model="model", data_version="data:0", directory=tmp_path)
+    checkpoint.append("first", case_name="q1", output={"result": 1}, task_duration=1.0, metrics={})
+    with checkpoint.path.open("a") as f:
+        f.write('{"key": "torn", "case_na')
+
+    resumed = Checkpoint(report_name="report", model="model", data_version="data:0", directory=tmp_path)
+    resumed.append("second", case_name="q2", output={"result": 2}, task_duration=2.0, metrics={})
+
+    reloaded = Checkpoint(report_name="report", model="model", data_version="data:0", directory=tmp_path)
+    assert len(reloaded) == 2
+    assert reloaded.get("first")["output"] == {"result": 1}
+    assert reloaded.get("second")["output"] == {"result": 2}
+    assert reloaded.get("torn") is None